@@ -0,0 +1,66 @@
+"""Benchmarks the all-pairs comparison of a corpus of mc4r phenopackets.
+
+Maps a synthetic registry to phenopackets, duplicates some of them to get
+near-duplicates and times `compare_corpus` without pruning, with a maximum distance,
+with top-k and with blocking by sex.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_corpus [--size 20] [--workers 1]
+"""
+import argparse
+import copy
+import time
+
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import make_synthetic_registry
+from ERKER2Phenopackets.src.analysis.tree_comparison.corpus import compare_corpus
+from ERKER2Phenopackets.src.mc4r import map_chunk
+from ERKER2Phenopackets.src.mc4r.pipeline import preprocess
+from ERKER2Phenopackets.src.utils.io import phenopacket2dict
+from ERKER2Phenopackets.src.settings import load_settings
+
+
+def bench_corpus(size: int, workers: int):
+    """Times `compare_corpus` on a corpus of `size` phenopackets per variant"""
+    settings = load_settings()
+
+    logger.remove()
+    # small samples may drop columns that are required by the mapping
+    df = preprocess(make_synthetic_registry(max(50, size)), settings)
+    dicts = [phenopacket2dict(p) for p in map_chunk(df, '2023-10-01')][:size]
+    # every fourth phenopacket gets a near-duplicate with a different id
+    for d in dicts[::4]:
+        duplicate = copy.deepcopy(d)
+        duplicate['id'] = d['id'] + '-duplicate'
+        dicts.append(duplicate)
+    print(f'{len(dicts)} phenopackets, {len(dicts) * (len(dicts) - 1) // 2} pairs')
+    print(f'{"variant":<24}{"seconds":>10}{"pairs":>10}')
+
+    variants = (
+        ('all pairs', {}),
+        ('max distance 5', {'max_distance': 5}),
+        ('top 10', {'top_k': 10}),
+        ('blocked by sex', {'block_key': lambda d: d['subject'].get('sex')}),
+    )
+    for name, kwargs in variants:
+        start = time.perf_counter()
+        result = compare_corpus(dicts, num_workers=workers, executor='process',
+                                **kwargs)
+        seconds = time.perf_counter() - start
+        print(f'{name:<24}{seconds:>10.2f}{len(result):>10}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_corpus')
+    arg_parser.add_argument('--size', type=int, default=20,
+                            help='Number of phenopackets, defaults to 20')
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker processes, defaults to 1')
+    args = arg_parser.parse_args()
+
+    bench_corpus(args.size, args.workers)
+
+
+if __name__ == '__main__':
+    main()
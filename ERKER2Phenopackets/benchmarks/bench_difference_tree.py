@@ -0,0 +1,58 @@
+"""Benchmarks the difference tree of deep and wide synthetic trees.
+
+Times `create_difference_tree` and `list_differences` for growing sizes, so that the
+time per node shows whether the construction is linear: deep chains that only differ
+at the bottom and wide trees whose leaves all differ.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_difference_tree [--size 20000]
+"""
+import argparse
+import time
+from typing import Dict
+
+from ERKER2Phenopackets.src.analysis.tree_comparison.structure import \
+    create_difference_tree, list_differences
+
+
+def deep_tree(size: int, leaf: int) -> Dict:
+    """A chain of `size` nested dictionaries"""
+    d = {'leaf': leaf}
+    for i in range(size):
+        d = {'child': d, 'index': i}
+    return d
+
+
+def wide_tree(size: int, leaf: int) -> Dict:
+    """A dictionary of `size` small dictionaries"""
+    return {f'key{i}': {'index': i, 'nested': {'leaf': leaf}} for i in range(size)}
+
+
+def bench_difference_tree(size: int):
+    """Times both outputs on deep and wide trees of up to `size` nested or sibling
+    dictionaries"""
+    print(f'{"tree":<8}{"size":>8}{"output":>8}{"ms":>10}{"us/node":>10}')
+    for shape, make_tree in (('deep', deep_tree), ('wide', wide_tree)):
+        for n in (size // 4, size // 2, size):
+            d1, d2 = make_tree(n, 0), make_tree(n, 1)
+            for name, difference in (('tree', create_difference_tree),
+                                     ('flat', list_differences)):
+                start = time.perf_counter()
+                difference(d1, d2)
+                seconds = time.perf_counter() - start
+                print(f'{shape:<8}{n:>8}{name:>8}{seconds * 1e3:>10.1f}'
+                      f'{seconds / n * 1e6:>10.2f}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_difference_tree')
+    arg_parser.add_argument('--size', type=int, default=20_000,
+                            help='Largest number of nested or sibling dictionaries, '
+                                 'defaults to 20000')
+    args = arg_parser.parse_args()
+
+    bench_difference_tree(args.size)
+
+
+if __name__ == '__main__':
+    main()
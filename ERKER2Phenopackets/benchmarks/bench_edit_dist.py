@@ -0,0 +1,62 @@
+"""Benchmarks the tree edit distance on pairs of mc4r phenopackets.
+
+Maps a synthetic registry to phenopackets and times `edit_distance` on pairs of
+identical phenopackets (fast path) and on pairs of different phenopackets, with and
+without the subtree substitution cost.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_edit_dist [--pairs 20]
+"""
+import argparse
+import time
+
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import make_synthetic_registry
+from ERKER2Phenopackets.src.analysis.tree_comparison.edit_dist import edit_distance, \
+    dict2tree
+from ERKER2Phenopackets.src.mc4r import map_chunk
+from ERKER2Phenopackets.src.mc4r.pipeline import preprocess
+from ERKER2Phenopackets.src.utils.io import phenopacket2dict
+from ERKER2Phenopackets.src.settings import load_settings
+
+
+def bench_edit_dist(pairs: int):
+    """Times `edit_distance` on `pairs` pairs of phenopackets per variant"""
+    settings = load_settings()
+
+    logger.remove()
+    # small samples may drop columns that are required by the mapping
+    df = preprocess(make_synthetic_registry(max(50, 2 * pairs)), settings)
+    dicts = [phenopacket2dict(p) for p in map_chunk(df, '2023-10-01')]
+    sizes = [len(dict2tree(d).labels) for d in dicts]
+    print(f'{len(dicts)} phenopackets with {min(sizes)} to {max(sizes)} nodes')
+    print(f'{"variant":<36}{"ms/pair":>10}{"mean distance":>16}')
+
+    variants = (
+        ('identical', [(d, d) for d in dicts[:pairs]], {}),
+        ('different', list(zip(dicts[:pairs], dicts[pairs:2 * pairs])), {}),
+        ('different, no subtree substitution',
+         list(zip(dicts[:pairs], dicts[pairs:2 * pairs])),
+         {'subtree_substitution_cost': 0}),
+    )
+    for name, pair_list, kwargs in variants:
+        start = time.perf_counter()
+        distances = [edit_distance(d1, d2, **kwargs) for d1, d2 in pair_list]
+        seconds = time.perf_counter() - start
+        print(f'{name:<36}{seconds / len(pair_list) * 1e3:>10.2f}'
+              f'{sum(distances) / len(distances):>16.1f}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_edit_dist')
+    arg_parser.add_argument('--pairs', type=int, default=20,
+                            help='Number of pairs of phenopackets per variant, '
+                                 'defaults to 20')
+    args = arg_parser.parse_args()
+
+    bench_edit_dist(args.pairs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmarks the logging overhead of mapping mc4r data to phenopackets.
+
+Maps the same chunk with an INFO sink, once with the guarded trace calls skipped (as
+`setup_logging(level='INFO')` does), once with them formatted and dropped by loguru
+(as before the guard) and once with logging of the package disabled completely.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_logging [--factor 20]
+"""
+import argparse
+import time
+
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import make_synthetic_registry
+from ERKER2Phenopackets.src.logging_ import set_trace_enabled
+from ERKER2Phenopackets.src.mc4r import map_chunk
+from ERKER2Phenopackets.src.mc4r.pipeline import preprocess
+from ERKER2Phenopackets.src.settings import load_settings
+
+
+def bench_logging(factor: int, repeat: int):
+    """Times `map_chunk` at INFO level with and without the trace guard"""
+    settings = load_settings()
+
+    logger.remove()
+    df = preprocess(make_synthetic_registry(50 * factor), settings)
+    logger.add(lambda msg: None, level='INFO')
+    print(f'Mapping {df.height} rows ({factor}x synthetic registry)')
+    print(f'{"logging":<28}{"seconds":>10}{"rows/s":>12}{"overhead":>10}')
+
+    def no_logging():
+        logger.disable('ERKER2Phenopackets')
+        set_trace_enabled(False)
+
+    def info_guarded():
+        logger.enable('ERKER2Phenopackets')
+        set_trace_enabled(False)
+
+    def info_unguarded():
+        logger.enable('ERKER2Phenopackets')
+        set_trace_enabled(True)
+
+    variants = (('disabled', no_logging),
+                ('INFO, trace guarded', info_guarded),
+                ('INFO, trace formatted', info_unguarded))
+    map_chunk(df.head(10), '2023-10-01')  # warm up the caches
+    # the variants take turns, so a drift of the machine affects all of them
+    best = {name: float('inf') for name, _ in variants}
+    for _ in range(repeat):
+        for name, configure in variants:
+            configure()
+            start = time.perf_counter()
+            map_chunk(df, '2023-10-01')
+            best[name] = min(best[name], time.perf_counter() - start)
+
+    baseline = best['disabled']
+    for name, seconds in best.items():
+        print(f'{name:<28}{seconds:>10.3f}{df.height / seconds:>12.0f}'
+              f'{(seconds / baseline - 1) * 100:>9.1f}%')
+
+    logger.enable('ERKER2Phenopackets')
+    set_trace_enabled(False)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_logging')
+    arg_parser.add_argument('--factor', type=int, default=20,
+                            help='Size of the registry as a multiple of the synthetic '
+                                 'data, defaults to 20')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    bench_logging(args.factor, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Benchmarks the mapping of preprocessed mc4r data to phenopackets.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_mapping [--factor 100]
+"""
+import argparse
+import os
+import time
+
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import make_synthetic_registry
+from ERKER2Phenopackets.src.mc4r import map_mc4r2phenopackets, \
+    map_mc4r2serialized_phenopackets
+from ERKER2Phenopackets.src.mc4r.pipeline import preprocess
+from ERKER2Phenopackets.src.settings import load_settings
+
+
+def bench_executors(factor: int, worker_counts, repeat: int):
+    """Times the thread and process executors for different numbers of workers"""
+    settings = load_settings()
+
+    df = preprocess(make_synthetic_registry(50 * factor), settings)
+    print(f'Mapping {df.height} rows ({factor}x synthetic registry), '
+          f'{os.cpu_count()} CPUs available')
+    print(f'{"executor":<22}{"workers":>8}{"seconds":>10}{"rows/s":>12}')
+
+    runs = [
+        ('thread', lambda n: map_mc4r2phenopackets(df, '2023-10-01', n, 'thread')),
+        ('process', lambda n: map_mc4r2phenopackets(df, '2023-10-01', n, 'process')),
+        ('process (serialized)',
+         lambda n: map_mc4r2serialized_phenopackets(df, '2023-10-01', n)),
+    ]
+    for name, run in runs:
+        for num_workers in worker_counts:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run(num_workers)
+                best = min(best, time.perf_counter() - start)
+            print(f'{name:<22}{num_workers:>8}{best:>10.3f}{df.height / best:>12.0f}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_mapping')
+    arg_parser.add_argument('--factor', type=int, default=100,
+                            help='Size of the registry as a multiple of the synthetic '
+                                 'data, defaults to 100')
+    arg_parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, 8, 16, 32, os.cpu_count()}),
+                            help='Worker counts to benchmark')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    bench_executors(args.factor, args.workers, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
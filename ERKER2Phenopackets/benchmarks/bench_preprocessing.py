@@ -0,0 +1,202 @@
+"""Benchmarks the column-spec driven parsing of mc4r data against the sequence of
+eager `map_col` and `fill_null_vals` calls it replaced.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_preprocessing [--rows 1000000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import write_synthetic_registry
+from ERKER2Phenopackets.src.mc4r.mapping_dicts import \
+    sex_map_erker2phenopackets, zygosity_map_erker2phenopackets, \
+    allele_label_map_erker2phenopackets, phenotype_label_map_erker2phenopackets, \
+    phenotype_status_map_erker2phenopackets
+from ERKER2Phenopackets.src.mc4r.parse_mc4r import parse_date_of_diagnosis_expr, \
+    parse_year_of_birth_expr, parse_phenotyping_date_expr, parse_omim_cols, \
+    collect_invalid_omims, raise_on_invalid_omims, raise_on_invalid_years_of_birth
+from ERKER2Phenopackets.src.mc4r.pipeline import parse
+from ERKER2Phenopackets.src.utils import polars_utils, raise_on_invalid_date_strings
+from ERKER2Phenopackets.src.settings import Settings, load_settings
+
+
+def parse_sequential(df: pl.DataFrame, settings: Settings) -> pl.DataFrame:
+    """The parsing step as a sequence of eager calls, as it was before
+    `mc4r_column_specs`"""
+    no_mutation = settings.no_value.mutation
+    no_phenotype = settings.no_value.phenotype
+    no_date = settings.no_value.date
+    no_omim = settings.no_value.omim
+
+    # sct_184099003_y (year of birth)
+    df = df.with_columns(
+        parse_year_of_birth_expr('sct_184099003_y').alias('parsed_year_of_birth')
+    )
+    raise_on_invalid_years_of_birth(df, 'sct_184099003_y')
+
+    # sct_281053000 (sex)
+    df = polars_utils.map_col(df, map_from='sct_281053000', map_to='parsed_sex',
+                              mapping=sex_map_erker2phenopackets)
+
+    # sct_432213005 (date of diagnosis)
+    df = df.with_columns(
+        parse_date_of_diagnosis_expr('sct_432213005').alias('parsed_date_of_diagnosis')
+    )
+    raise_on_invalid_date_strings(df, 'sct_432213005', 'parsed_date_of_diagnosis')
+    df = polars_utils.fill_null_vals(df, 'parsed_date_of_diagnosis', no_date)
+
+    # ln_48007_9_1, ln_48007_9_2, ln_48007_9_3 (zygosity)
+    df = polars_utils.map_col(df, map_from='ln_48007_9_1', map_to='parsed_zygosity_1',
+                              mapping=zygosity_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='ln_48007_9_1', map_to='allele_label_1',
+                              mapping=allele_label_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='ln_48007_9_2', map_to='parsed_zygosity_2',
+                              mapping=zygosity_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='ln_48007_9_2', map_to='allele_label_2',
+                              mapping=allele_label_map_erker2phenopackets)
+    if 'ln_48007_9_3' in df.columns:
+        df = polars_utils.map_col(
+            df,
+            map_from='ln_48007_9_3',
+            map_to='parsed_zygosity_3',
+            mapping=zygosity_map_erker2phenopackets
+        )
+        df = polars_utils.map_col(
+            df,
+            map_from='ln_48007_9_3',
+            map_to='allele_label_3',
+            mapping=allele_label_map_erker2phenopackets
+        )
+
+    # sct_439401001_orpha (diagnosis (ORPHA))
+    # does not require mapping
+
+    # sct_439401001_omim_g_1, sct_439401001_omim_g_2, sct_439401001_omim_g_3 \
+    # (Primärdiagnose OMIM)
+    omim_cols = {'sct_439401001_omim_g_1': 'parsed_omim_1',
+                 'sct_439401001_omim_g_2': 'parsed_omim_2'}
+    df = parse_omim_cols(df, omim_cols, no_omim)
+    raise_on_invalid_omims(collect_invalid_omims(df, omim_cols))
+
+    # ln_48005_3_1, ln_48005_3_2, ln_48005_3_3 (mutation p.HGVS)
+    df = polars_utils.fill_null_vals(df, 'ln_48005_3_1', no_mutation)
+    df = polars_utils.fill_null_vals(df, 'ln_48005_3_2', no_mutation)
+    if 'ln_48005_3_3' in df.columns:
+        df = polars_utils.fill_null_vals(df, 'ln_48005_3_3', no_mutation)
+
+    # ln_48004_6_1, ln_48004_6_2, ln_48004_6_3 (mutation c.HGVS)
+    df = polars_utils.fill_null_vals(df, 'ln_48004_6_1', no_mutation)
+    df = polars_utils.fill_null_vals(df, 'ln_48004_6_2', no_mutation)
+    if 'ln_48004_6_3' in df.columns:
+        df = polars_utils.fill_null_vals(df, 'ln_48004_6_3', no_mutation)
+
+    # ln_48018_6_1 (gene HGNC)
+    # does not require mapping
+
+    # sct_8116006_1, sct_8116006_2, sct_8116006_3, sct_8116006_4, \
+    # sct_8116006_5 (phenotype classification)
+    df = polars_utils.fill_null_vals(df, 'sct_8116006_1', no_phenotype)
+    df = polars_utils.fill_null_vals(df, 'sct_8116006_2', no_phenotype)
+    df = polars_utils.fill_null_vals(df, 'sct_8116006_3', no_phenotype)
+    df = polars_utils.fill_null_vals(df, 'sct_8116006_4', no_phenotype)
+    df = polars_utils.fill_null_vals(df, 'sct_8116006_5', no_phenotype)
+
+    # sct_8116006_1_date, sct_8116006_2_date, sct_8116006_3_date, sct_8116006_4_date, \
+    # sct_8116006_5_date (dates of phenotype determination)
+    phenotyping_date_cols = {
+        f'sct_8116006_{i}_date': f'parsed_date_of_phenotyping{i}'
+        for i in range(1, 6)
+        # the dates of the phenotypes 3 to 5 are optional
+        if i <= 2 or f'sct_8116006_{i}_date' in df.columns
+    }
+    df = df.with_columns(
+        parse_phenotyping_date_expr(date_col).alias(parsed_col)
+        for date_col, parsed_col in phenotyping_date_cols.items()
+    )
+    for date_col, parsed_col in phenotyping_date_cols.items():
+        raise_on_invalid_date_strings(df, date_col, parsed_col)
+        df = polars_utils.fill_null_vals(df, parsed_col, no_date)
+
+    # sct_8116006_1_status, sct_8116006_2_status, sct_8116006_3_status,\
+    # sct_8116006_4_status, sct_8116006_5_status (status of phenotype determination)
+    df = polars_utils.map_col(df, map_from='sct_8116006_1_status',
+                              map_to='parsed_phenotype_status1',
+                              mapping=phenotype_status_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_2_status',
+                              map_to='parsed_phenotype_status2',
+                              mapping=phenotype_status_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_3_status',
+                              map_to='parsed_phenotype_status3',
+                              mapping=phenotype_status_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_4_status',
+                              map_to='parsed_phenotype_status4',
+                              mapping=phenotype_status_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_5_status',
+                              map_to='parsed_phenotype_status5',
+                              mapping=phenotype_status_map_erker2phenopackets)
+
+    # sct_8116006_1, sct_8116006_2, sct_8116006_3, sct_8116006_4, sct_8116006_5 
+    # phenotypic feature
+    df = polars_utils.map_col(df, map_from='sct_8116006_1',
+                              map_to='parsed_phenotype_label1',
+                              mapping=phenotype_label_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_2',
+                              map_to='parsed_phenotype_label2',
+                              mapping=phenotype_label_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_3',
+                              map_to='parsed_phenotype_label3',
+                              mapping=phenotype_label_map_erker2phenopackets)
+    df = polars_utils.map_col(df, map_from='sct_8116006_4',
+                              map_to='parsed_phenotype_label4',
+                              mapping=phenotype_label_map_erker2phenopackets)
+    if 'sct_8116006_5' in df.columns:
+        df = polars_utils.map_col(df, map_from='sct_8116006_5',
+                                  map_to='parsed_phenotype_label5',
+                                  mapping=phenotype_label_map_erker2phenopackets)
+    return df
+
+
+def bench_parsing(num_rows: int, repeat: int):
+    """Times the sequential and the column-spec driven parsing"""
+    settings = load_settings()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = write_synthetic_registry(num_rows, Path(tmp_dir) / 'registry.csv')
+        df = pl.read_csv(csv_path)
+    df = polars_utils.drop_null_cols(df, remove_all_null=True, remove_any_null=False)
+    print(f'Parsing {df.height} rows')
+    print(f'{"variant":<14}{"seconds":>10}{"rows/s":>14}')
+
+    results = {}
+    for name, run in (('sequential', parse_sequential), ('column specs', parse)):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[name] = run(df, settings)
+            best = min(best, time.perf_counter() - start)
+        print(f'{name:<14}{best:>10.3f}{df.height / best:>14.0f}')
+
+    sequential, specs = results['sequential'], results['column specs']
+    assert sequential.select(sorted(sequential.columns)).frame_equal(
+        specs.select(sorted(specs.columns)), null_equal=True)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_preprocessing')
+    arg_parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Number of rows of the synthetic registry, defaults '
+                                 'to 1000000')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    bench_parsing(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
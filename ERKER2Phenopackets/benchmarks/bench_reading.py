@@ -0,0 +1,61 @@
+"""Benchmarks reading mc4r data with `read_erker()` from `.csv`, Parquet and Arrow
+IPC files against reading and inferring all columns of the `.csv` file.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_reading [--rows 200000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import make_synthetic_registry
+from ERKER2Phenopackets.src.mc4r.read_erker import read_erker
+
+
+def bench_reading(num_rows: int, repeat: int):
+    """Times reading the same registry in every format"""
+    df = make_synthetic_registry(num_rows)
+    print(f'Reading {df.height} rows of {df.width} columns')
+    print(f'{"variant":<22}{"seconds":>10}{"rows/s":>14}')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = Path(tmp_dir) / 'registry.csv'
+        parquet_path = Path(tmp_dir) / 'registry.parquet'
+        ipc_path = Path(tmp_dir) / 'registry.arrow'
+        df.write_csv(csv_path)
+        df.write_parquet(parquet_path)
+        df.write_ipc(ipc_path)
+        del df
+
+        for name, run in (
+                ('read_csv (all cols)', lambda: pl.read_csv(csv_path)),
+                ('read_erker csv', lambda: read_erker(csv_path)),
+                ('read_erker parquet', lambda: read_erker(parquet_path)),
+                ('read_erker ipc', lambda: read_erker(ipc_path)),
+        ):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            print(f'{name:<22}{best:>10.3f}{num_rows / best:>14.0f}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_reading')
+    arg_parser.add_argument('--rows', type=int, default=200_000,
+                            help='Number of rows of the synthetic registry, defaults '
+                                 'to 200000')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    bench_reading(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
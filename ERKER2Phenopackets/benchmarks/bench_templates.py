@@ -0,0 +1,74 @@
+"""Micro-benchmark of the per-phenopacket cost of the metadata block.
+
+Compares rebuilding the metadata block (as `map_chunk` did per chunk) and assigning
+it in the constructor with copying the shared template and with appending the
+serialized template to a serialized phenopacket.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_templates [--n 20000]
+"""
+import argparse
+import time
+
+from loguru import logger
+from phenopackets import Phenopacket, Individual
+
+from ERKER2Phenopackets.src.mc4r.map_mc4r import TAXONOMY_TEMPLATE, \
+    meta_data_template, serialized_meta_data_field
+
+CUR_TIME = '2023-10-01'
+
+
+def _rebuild(i: int) -> bytes:
+    meta_data_template.cache_clear()
+    subject = Individual(id=str(i), taxonomy=TAXONOMY_TEMPLATE)
+    return Phenopacket(id=str(i), subject=subject,
+                       meta_data=meta_data_template(CUR_TIME)).SerializeToString()
+
+
+def _copy_template(i: int) -> bytes:
+    subject = Individual(id=str(i), taxonomy=TAXONOMY_TEMPLATE)
+    phenopacket = Phenopacket(id=str(i), subject=subject)
+    phenopacket.meta_data.CopyFrom(meta_data_template(CUR_TIME))
+    return phenopacket.SerializeToString()
+
+
+def _merge_template_bytes(i: int) -> bytes:
+    subject = Individual(id=str(i), taxonomy=TAXONOMY_TEMPLATE)
+    phenopacket = Phenopacket(id=str(i), subject=subject)
+    phenopacket.MergeFromString(serialized_meta_data_field(CUR_TIME))
+    return phenopacket.SerializeToString()
+
+
+def _append_template_bytes(i: int) -> bytes:
+    subject = Individual(id=str(i), taxonomy=TAXONOMY_TEMPLATE)
+    return Phenopacket(id=str(i), subject=subject).SerializeToString() + \
+        serialized_meta_data_field(CUR_TIME)
+
+
+def bench_templates(n: int):
+    """Times building and serializing `n` phenopackets with each variant"""
+    print(f'{"variant":<24}{"us/phenopacket":>16}')
+    for name, build in (('rebuild per packet', _rebuild),
+                        ('copy template', _copy_template),
+                        ('merge template bytes', _merge_template_bytes),
+                        ('append template bytes', _append_template_bytes)):
+        build(0)  # warm up the caches
+        start = time.perf_counter()
+        for i in range(n):
+            build(i)
+        print(f'{name:<24}{(time.perf_counter() - start) / n * 1e6:>16.1f}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_templates')
+    arg_parser.add_argument('--n', type=int, default=20000,
+                            help='Number of phenopackets, defaults to 20000')
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    bench_templates(args.n)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmarks the structure comparison of deep and wide synthetic trees.
+
+Compares pairs of equal trees and pairs of trees that differ early with the
+materialized traversals (`traverse()` in both orders, as `compare_structure` used to)
+and with the lockstep `first_mismatch()`, and reports the time and the peak memory
+allocated by the comparison.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_traverse [--size 100000]
+"""
+import argparse
+import copy
+import time
+import tracemalloc
+from typing import Dict
+
+from ERKER2Phenopackets.src.analysis.tree_comparison.traverse import \
+    first_mismatch, traverse
+
+
+def deep_tree(size: int) -> Dict:
+    """A chain of `size` nested dictionaries"""
+    d = {'leaf': 0}
+    for i in range(size):
+        d = {'child': d, 'index': i}
+    return d
+
+
+def wide_tree(size: int) -> Dict:
+    """A dictionary of `size` small dictionaries"""
+    return {f'key{i}': {'index': i, 'values': [i, i + 1]} for i in range(size)}
+
+
+def compare_lists(d1: Dict, d2: Dict) -> bool:
+    return traverse(d1, 'bfs', False) == traverse(d2, 'bfs', False) and \
+        traverse(d1, 'dfs', False) == traverse(d2, 'dfs', False)
+
+
+def compare_lockstep(d1: Dict, d2: Dict) -> bool:
+    return first_mismatch(d1, d2) is None
+
+
+def bench_traverse(size: int):
+    """Times both comparisons on deep and wide trees of `size` nodes"""
+    print(f'{"tree":<20}{"comparison":<12}{"ms":>10}{"peak KiB":>12}{"equal":>8}')
+    for shape, make_tree in (('deep', deep_tree), ('wide', wide_tree)):
+        d1 = make_tree(size)
+        # the first key of the copy differs
+        early = copy.deepcopy(d1) if shape == 'wide' else make_tree(size)
+        early[f'{next(iter(early))}-changed'] = early.pop(next(iter(early)))
+        for pair_name, d2 in (('equal', make_tree(size)), ('differs early', early)):
+            for name, compare in (('lists', compare_lists),
+                                  ('lockstep', compare_lockstep)):
+                start = time.perf_counter()
+                equal = compare(d1, d2)
+                seconds = time.perf_counter() - start
+                # tracemalloc slows the comparison down, it is measured separately
+                tracemalloc.start()
+                compare(d1, d2)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f'{shape + ", " + pair_name:<20}{name:<12}'
+                      f'{seconds * 1e3:>10.1f}{peak / 1024:>12.1f}{equal!s:>8}')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_traverse')
+    arg_parser.add_argument('--size', type=int, default=100_000,
+                            help='Number of nested or sibling dictionaries, '
+                                 'defaults to 100000')
+    args = arg_parser.parse_args()
+
+    bench_traverse(args.size)
+
+
+if __name__ == '__main__':
+    main()
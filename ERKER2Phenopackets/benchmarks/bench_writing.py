@@ -0,0 +1,65 @@
+"""Benchmarks writing phenopackets to JSON files.
+
+Run from the repository root:
+    python -m ERKER2Phenopackets.benchmarks.bench_writing [--factor 100]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from loguru import logger
+
+from ERKER2Phenopackets.benchmarks.synthetic import make_synthetic_registry
+from ERKER2Phenopackets.src.mc4r import map_mc4r2phenopackets
+from ERKER2Phenopackets.src.mc4r.pipeline import preprocess
+from ERKER2Phenopackets.src.utils import write_files
+from ERKER2Phenopackets.src.settings import load_settings
+
+
+def bench_writing(factor: int, worker_counts, repeat: int):
+    """Times the thread and process executors of the JSON writer"""
+    settings = load_settings()
+
+    df = preprocess(make_synthetic_registry(50 * factor), settings)
+    phenopackets = map_mc4r2phenopackets(df, '2023-10-01', executor='process')
+    print(f'Writing {len(phenopackets)} phenopackets, {os.cpu_count()} CPUs available')
+    print(f'{"executor":<12}{"workers":>8}{"fsync":>7}{"seconds":>10}{"files/s":>12}')
+
+    out_root = tempfile.mkdtemp(prefix='bench_writing_')
+    try:
+        for executor in ('thread', 'process'):
+            for num_workers in worker_counts:
+                for fsync in (False, True):
+                    best = float('inf')
+                    for i in range(repeat):
+                        out_dir = os.path.join(out_root, f'{executor}{num_workers}{i}')
+                        start = time.perf_counter()
+                        write_files(phenopackets, out_dir, num_workers=num_workers,
+                                    executor=executor, fsync=fsync)
+                        best = min(best, time.perf_counter() - start)
+                        shutil.rmtree(out_dir)
+                    print(f'{executor:<12}{num_workers:>8}{str(fsync):>7}{best:>10.3f}'
+                          f'{len(phenopackets) / best:>12.0f}')
+    finally:
+        shutil.rmtree(out_root)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog='bench_writing')
+    arg_parser.add_argument('--factor', type=int, default=100,
+                            help='Size of the registry as a multiple of the synthetic '
+                                 'data, defaults to 100')
+    arg_parser.add_argument('--workers', type=int, nargs='+',
+                            default=sorted({1, 2, 4, os.cpu_count()}),
+                            help='Worker counts to benchmark')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    logger.remove()
+    bench_writing(args.factor, args.workers, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
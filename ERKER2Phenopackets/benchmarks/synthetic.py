@@ -0,0 +1,40 @@
+from pathlib import Path
+from typing import Union
+
+import polars as pl
+
+SYNTHETIC_DATA_PATH = Path(__file__).parent.parent / 'data' / 'sdv_synthetic_data.csv'
+
+
+def make_synthetic_registry(num_rows: int, seed: int = 42) -> pl.DataFrame:
+    """Creates a synthetic registry in ERKER format of arbitrary size
+
+    Samples rows (with replacement) from `data/sdv_synthetic_data.csv`.
+
+    :param num_rows: Number of rows of the synthetic registry
+    :type num_rows: int
+    :param seed: Seed of the random sampling, defaults to 42
+    :type seed: int, optional
+    :return: Synthetic registry
+    :rtype: pl.DataFrame
+    """
+    df = pl.read_csv(SYNTHETIC_DATA_PATH)
+    return df.sample(n=num_rows, with_replacement=True, seed=seed)
+
+
+def write_synthetic_registry(num_rows: int, out_path: Union[str, Path],
+                             seed: int = 42) -> Path:
+    """Writes a synthetic registry created by `make_synthetic_registry()` to a `.csv`
+
+    :param num_rows: Number of rows of the synthetic registry
+    :type num_rows: int
+    :param out_path: Path of the `.csv` file to write
+    :type out_path: Union[str, Path]
+    :param seed: Seed of the random sampling, defaults to 42
+    :type seed: int, optional
+    :return: Path of the written file
+    :rtype: Path
+    """
+    out_path = Path(out_path)
+    make_synthetic_registry(num_rows, seed=seed).write_csv(out_path)
+    return out_path
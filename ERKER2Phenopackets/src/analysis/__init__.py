@@ -1,5 +1,9 @@
 from .mc4r_analysis import analyze
+from .cohort_tables import CohortTables, flatten_phenopackets, write_cohort_tables, \
+    scan_cohort_tables, phenotypic_feature_counts
 
 __all__ = [
-    'analyze'
+    'analyze',
+    'CohortTables', 'flatten_phenopackets', 'write_cohort_tables',
+    'scan_cohort_tables', 'phenotypic_feature_counts',
 ]
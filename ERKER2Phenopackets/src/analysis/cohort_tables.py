@@ -0,0 +1,413 @@
+import argparse
+import itertools
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import polars as pl
+from google.protobuf.message import Message
+from loguru import logger
+from phenopackets import Phenopacket
+
+from ..logging_ import setup_logging
+from ..utils import last_phenopackets_dir, iter_files, atomic_output_dir, \
+    BUNDLE_FORMATS, bundle_file_name
+from ..utils.io import iter_bundle
+
+# hive partition column of every table, a hash bucket of the phenopacket id, so that
+# the rows of a phenopacket are in the same partition of every table
+BUCKET = 'bucket'
+
+_ONSET_COLUMNS = {
+    'onset_timestamp': pl.Datetime('us', 'UTC'),
+    'onset_age': pl.Utf8,
+}
+
+SCHEMAS: Dict[str, Dict[str, pl.PolarsDataType]] = {
+    'subjects': {
+        'phenopacket_id': pl.Utf8,
+        'subject_id': pl.Utf8,
+        'sex': pl.Utf8,
+        'karyotypic_sex': pl.Utf8,
+        'date_of_birth': pl.Datetime('us', 'UTC'),
+        'taxonomy_id': pl.Utf8,
+    },
+    'phenotypic_features': {
+        'phenopacket_id': pl.Utf8,
+        'type_id': pl.Utf8,
+        'type_label': pl.Utf8,
+        'excluded': pl.Boolean,
+        **_ONSET_COLUMNS,
+    },
+    'diseases': {
+        'phenopacket_id': pl.Utf8,
+        # null for the diseases of the phenopacket, set for the diagnosis of an
+        # interpretation
+        'interpretation_id': pl.Utf8,
+        'disease_id': pl.Utf8,
+        'disease_label': pl.Utf8,
+        'excluded': pl.Boolean,
+        **_ONSET_COLUMNS,
+    },
+    'variants': {
+        'phenopacket_id': pl.Utf8,
+        'interpretation_id': pl.Utf8,
+        'progress_status': pl.Utf8,
+        'subject_or_biosample_id': pl.Utf8,
+        'interpretation_status': pl.Utf8,
+        'gene_symbol': pl.Utf8,
+        'variant_id': pl.Utf8,
+        'hgvs': pl.List(pl.Utf8),
+        'allelic_state_id': pl.Utf8,
+        'allelic_state_label': pl.Utf8,
+        'acmg_pathogenicity_classification': pl.Utf8,
+        'therapeutic_actionability': pl.Utf8,
+    },
+}
+TABLES = list(SCHEMAS)
+
+
+class CohortTables(NamedTuple):
+    """Normalized tables of a phenopacket corpus, keyed by `phenopacket_id`
+
+    :ivar subjects: One row per phenopacket
+    :ivar phenotypic_features: One row per phenotypic feature
+    :ivar diseases: One row per disease and per diagnosis of an interpretation
+    :ivar variants: One row per genomic interpretation
+    """
+    subjects: Union[pl.DataFrame, pl.LazyFrame]
+    phenotypic_features: Union[pl.DataFrame, pl.LazyFrame]
+    diseases: Union[pl.DataFrame, pl.LazyFrame]
+    variants: Union[pl.DataFrame, pl.LazyFrame]
+
+
+def flatten_phenopackets(phenopackets: Iterable[Phenopacket]) -> CohortTables:
+    """Flattens phenopackets into normalized tables
+
+    The messages are read field by field, without converting them to JSON or to
+    dictionaries. Enums are stored by name, timestamps as UTC datetimes and ages as
+    ISO 8601 durations.
+
+    :param phenopackets: The phenopackets
+    :type phenopackets: Iterable[Phenopacket]
+    :return: The tables
+    :rtype: CohortTables
+    """
+    rows = {table: [] for table in TABLES}
+    for phenopacket in phenopackets:
+        for table, table_rows in _phenopacket_rows(phenopacket):
+            rows[table].extend(table_rows)
+
+    return CohortTables(**{
+        table: pl.DataFrame(rows[table], schema=_row_schema(table), orient='row')
+        .with_columns(_timestamp_columns(table))
+        for table in TABLES
+    })
+
+
+def write_cohort_tables(
+        phenopackets: Iterable[Phenopacket],
+        out_dir: Union[str, Path],
+        num_buckets: int = 8,
+        chunk_size: int = 10_000,
+) -> int:
+    """Flattens phenopackets into normalized tables and writes them as partitioned
+    Parquet
+
+    Every table is written to `out_dir/<table>/bucket=<n>/part-<chunk>.parquet`. The
+    bucket is a stable hash of the phenopacket id, so all rows of a phenopacket are
+    in the same bucket of every table. The phenopackets are flattened in chunks of
+    `chunk_size`, so only one chunk is held in memory. The directory is replaced
+    once all tables are written, see `atomic_output_dir()`.
+
+    Example:
+        >>> write_cohort_tables(iter_files('data/out/phenopackets'), 'cohort')
+        >>> tables = scan_cohort_tables('cohort')
+        >>> tables.subjects.group_by('sex').len().collect()
+
+    :param phenopackets: The phenopackets, e.g. read lazily by `iter_files()`
+    :type phenopackets: Iterable[Phenopacket]
+    :param out_dir: The output directory
+    :type out_dir: Union[str, Path]
+    :param num_buckets: Number of hash buckets of the phenopacket ids, defaults to 8
+    :type num_buckets: int, optional
+    :param chunk_size: Number of phenopackets flattened at once, defaults to 10000
+    :type chunk_size: int, optional
+    :return: The number of phenopackets
+    :rtype: int
+    :raises ValueError: If num_buckets or chunk_size is smaller than 1
+    """
+    if num_buckets < 1 or chunk_size < 1:
+        logger.error(f'num_buckets {num_buckets} and chunk_size {chunk_size} must be '
+                     f'at least 1')
+        raise ValueError(f'num_buckets {num_buckets} and chunk_size {chunk_size} '
+                         f'must be at least 1')
+
+    num_phenopackets = 0
+    written = set()
+    with atomic_output_dir(out_dir) as tmp_dir:
+        for chunk_index, chunk in enumerate(_chunks(phenopackets, chunk_size)):
+            num_phenopackets += len(chunk)
+            tables = flatten_phenopackets(chunk)
+            for table in TABLES:
+                df = getattr(tables, table)
+                if df.is_empty():
+                    continue
+                df = df.with_columns(_bucket(df['phenopacket_id'], num_buckets))
+                for part in df.partition_by(BUCKET):
+                    _write_part(part.drop(BUCKET), tmp_dir, table, part[BUCKET][0],
+                                chunk_index)
+                written.add(table)
+
+        # empty tables still have a schema when they are scanned
+        for table in set(TABLES) - written:
+            _write_part(getattr(flatten_phenopackets([]), table), tmp_dir, table, 0, 0)
+
+    logger.info(f'Wrote the cohort tables of {num_phenopackets} phenopackets to '
+                f'{out_dir}')
+    return num_phenopackets
+
+
+def scan_cohort_tables(out_dir: Union[str, Path]) -> CohortTables:
+    """Lazily scans the tables written by `write_cohort_tables()`
+
+    Filters on the `bucket` column skip the other partitions, filters on other
+    columns are pushed down to the Parquet files.
+
+    :param out_dir: The directory of the tables
+    :type out_dir: Union[str, Path]
+    :return: The tables as lazy frames, with the partition column `bucket`
+    :rtype: CohortTables
+    """
+    out_dir = Path(out_dir)
+    return CohortTables(**{
+        table: pl.scan_parquet(out_dir / table / '**' / '*.parquet',
+                               hive_partitioning=True)
+        for table in TABLES
+    })
+
+
+def phenotypic_feature_counts(tables: CohortTables) -> pl.LazyFrame:
+    """Counts the observed and excluded phenotypic features per sex
+
+    :param tables: The cohort tables
+    :type tables: CohortTables
+    :return: The columns `type_id`, `type_label`, `sex`, `observed` and `excluded`
+    :rtype: pl.LazyFrame
+    """
+    subjects = tables.subjects.lazy().select('phenopacket_id', 'sex')
+    return (
+        tables.phenotypic_features.lazy()
+        .join(subjects, on='phenopacket_id', how='left', coalesce=True)
+        .group_by('type_id', 'type_label', 'sex')
+        .agg(
+            observed=(~pl.col('excluded')).sum(),
+            excluded=pl.col('excluded').sum(),
+        )
+        .sort('type_id', 'sex')
+    )
+
+
+def _phenopacket_rows(phenopacket: Phenopacket
+                      ) -> Iterator[Tuple[str, List[Tuple]]]:
+    """Yields the rows of a phenopacket per table"""
+    phenopacket_id = phenopacket.id
+    subject = phenopacket.subject
+    yield 'subjects', [(
+        phenopacket_id,
+        subject.id or None,
+        _enum_name(subject, 'sex'),
+        _enum_name(subject, 'karyotypic_sex'),
+        _timestamp(subject, 'date_of_birth'),
+        _term_id(subject, 'taxonomy'),
+    )]
+
+    yield 'phenotypic_features', [
+        (phenopacket_id, *_term(feature, 'type'), feature.excluded,
+         *_time_element(feature, 'onset'))
+        for feature in phenopacket.phenotypic_features
+    ]
+
+    yield 'diseases', [
+        (phenopacket_id, None, *_term(disease, 'term'), disease.excluded,
+         *_time_element(disease, 'onset'))
+        for disease in phenopacket.diseases
+    ] + [
+        (phenopacket_id, interpretation.id or None,
+         *_term(interpretation.diagnosis, 'disease'), None, None, None)
+        for interpretation in phenopacket.interpretations
+        if interpretation.HasField('diagnosis')
+    ]
+
+    yield 'variants', [
+        (phenopacket_id, interpretation.id or None,
+         _enum_name(interpretation, 'progress_status'),
+         *_genomic_interpretation_row(genomic_interpretation))
+        for interpretation in phenopacket.interpretations
+        for genomic_interpretation
+        in interpretation.diagnosis.genomic_interpretations
+    ]
+
+
+def _genomic_interpretation_row(genomic_interpretation: Message) -> Tuple:
+    variant_interpretation = genomic_interpretation.variant_interpretation
+    descriptor = variant_interpretation.variation_descriptor
+    if genomic_interpretation.HasField('gene'):
+        gene_symbol = genomic_interpretation.gene.symbol
+    else:
+        gene_symbol = descriptor.gene_context.symbol
+    return (
+        genomic_interpretation.subject_or_biosample_id or None,
+        _enum_name(genomic_interpretation, 'interpretation_status'),
+        gene_symbol or None,
+        descriptor.id or None,
+        [expression.value for expression in descriptor.expressions
+         if expression.syntax == 'hgvs'],
+        *_term(descriptor, 'allelic_state'),
+        _enum_name(variant_interpretation, 'acmg_pathogenicity_classification')
+        if genomic_interpretation.HasField('variant_interpretation') else None,
+        _enum_name(variant_interpretation, 'therapeutic_actionability')
+        if genomic_interpretation.HasField('variant_interpretation') else None,
+    )
+
+
+def _enum_name(message: Message, field_name: str) -> str:
+    field = message.DESCRIPTOR.fields_by_name[field_name]
+    value = getattr(message, field_name)
+    enum_value = field.enum_type.values_by_number.get(value)
+    return enum_value.name if enum_value is not None else str(value)
+
+
+def _term(message: Message, field_name: str) -> Tuple[Optional[str], Optional[str]]:
+    """Returns the id and the label of an ontology class field, if it is set"""
+    if not message.HasField(field_name):
+        return None, None
+    term = getattr(message, field_name)
+    return term.id or None, term.label or None
+
+
+def _term_id(message: Message, field_name: str) -> Optional[str]:
+    return _term(message, field_name)[0]
+
+
+def _timestamp(message: Message, field_name: str) -> Optional[int]:
+    """Returns a timestamp field in microseconds since the epoch, if it is set"""
+    if not message.HasField(field_name):
+        return None
+    timestamp = getattr(message, field_name)
+    return timestamp.seconds * 1_000_000 + timestamp.nanos // 1_000
+
+
+def _time_element(message: Message, field_name: str
+                  ) -> Tuple[Optional[int], Optional[str]]:
+    """Returns the timestamp and the age of a time element field, if they are set"""
+    if not message.HasField(field_name):
+        return None, None
+    time_element = getattr(message, field_name)
+    age = time_element.age.iso8601duration if time_element.HasField('age') else None
+    return _timestamp(time_element, 'timestamp'), age
+
+
+def _row_schema(table: str) -> Dict[str, pl.PolarsDataType]:
+    """Timestamps are collected as microseconds since the epoch"""
+    return {column: pl.Int64 if isinstance(dtype, pl.Datetime) else dtype
+            for column, dtype in SCHEMAS[table].items()}
+
+
+def _timestamp_columns(table: str) -> List[pl.Expr]:
+    return [pl.col(column).cast(dtype)
+            for column, dtype in SCHEMAS[table].items()
+            if isinstance(dtype, pl.Datetime)]
+
+
+def _bucket(phenopacket_ids: pl.Series, num_buckets: int) -> pl.Series:
+    # crc32 instead of `hash()` and `Series.hash()`, which differ between processes
+    # and polars versions
+    return pl.Series(BUCKET, [zlib.crc32(phenopacket_id.encode()) % num_buckets
+                              for phenopacket_id in phenopacket_ids], pl.UInt32)
+
+
+def _write_part(df: pl.DataFrame, out_dir: Path, table: str, bucket: int,
+                chunk_index: int) -> None:
+    part_dir = out_dir / table / f'{BUCKET}={bucket}'
+    part_dir.mkdir(parents=True, exist_ok=True)
+    df.write_parquet(part_dir / f'part-{chunk_index:05d}.parquet')
+
+
+def _chunks(phenopackets: Iterable[Phenopacket],
+            chunk_size: int) -> Iterator[List[Phenopacket]]:
+    iterator = iter(phenopackets)
+    while chunk := list(itertools.islice(iterator, chunk_size)):
+        yield chunk
+
+
+def _iter_phenopackets(path: Path) -> Iterator[Phenopacket]:
+    """Reads the phenopackets of a bundle, or of a directory of JSON files or with a
+    bundle"""
+    if path.is_file():
+        return iter_bundle(path)
+    for bundle_format in BUNDLE_FORMATS:
+        if (path / bundle_file_name(bundle_format)).is_file():
+            return iter_bundle(path / bundle_file_name(bundle_format))
+    return iter_files(path)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        prog='cohort_tables',
+        description='Flatten phenopackets into partitioned Parquet cohort tables.'
+    )
+
+    arg_parser.add_argument(
+        'path',
+        nargs='?',
+        default='',
+        help='Path to a bundle or a directory of phenopackets, defaults to the last '
+             'created phenopackets'
+    )
+
+    arg_parser.add_argument(
+        'out_dir_name',
+        nargs='?',
+        default='',
+        help='The name of the output directory, defaults to cohort_tables in the '
+             'directory of the phenopackets'
+    )
+
+    arg_parser.add_argument('-b', '--buckets', type=int, default=8,
+                            help='Number of hash buckets of the phenopacket ids, '
+                                 'defaults to 8')
+    arg_parser.add_argument('-c', '--chunk-size', type=int, default=10_000,
+                            help='Number of phenopackets flattened at once, '
+                                 'defaults to 10000')
+
+    mut_excl_group = arg_parser.add_mutually_exclusive_group()
+
+    mut_excl_group.add_argument('-d', '--debug', action='store_true',
+                                help='Enable debug logging')
+    mut_excl_group.add_argument('-t', '--trace', action='store_true',
+                                help='Enable trace logging')
+
+    args = arg_parser.parse_args()
+
+    if args.debug:
+        level = 'DEBUG'
+    elif args.trace:
+        level = 'TRACE'
+    else:
+        level = 'INFO'
+
+    setup_logging(level=level)
+
+    path = Path(args.path) if args.path else last_phenopackets_dir()
+    if args.out_dir_name:
+        out_dir = Path(args.out_dir_name)
+    else:
+        out_dir = (path.parent if path.is_file() else path) / 'cohort_tables'
+
+    write_cohort_tables(_iter_phenopackets(path), out_dir, num_buckets=args.buckets,
+                        chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
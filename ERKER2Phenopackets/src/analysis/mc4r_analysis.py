@@ -1,5 +1,4 @@
 import argparse
-import configparser
 from pathlib import Path
 
 from loguru import logger
@@ -28,9 +27,6 @@ def analyze(data_path='', out_dir_name='', publish=False, debug=False):
     logger.debug(f'{out_dir_name=} {type(out_dir_name)=}')
     logger.error('Not implemented yet')
 
-    config = configparser.ConfigParser()
-    config.read('ERKER2Phenopackets/data/config/config.cfg')
-
     if data_path == '':
         data_path = last_phenopackets_dir()
 
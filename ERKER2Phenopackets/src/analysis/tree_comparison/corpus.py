@@ -0,0 +1,295 @@
+import heapq
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, \
+    Tuple, Union
+
+import polars as pl
+from google.protobuf.message import Message
+from loguru import logger
+
+from ERKER2Phenopackets.src.utils.io import phenopacket2dict
+from ERKER2Phenopackets.src.utils.parallelization_utils import EXECUTORS, \
+    init_worker_process
+from .edit_dist import Tree, dict2tree, tree_edit_distance
+from .merkle import MerkleTree
+
+# pairs of (index of the first, index of the second dictionary)
+Pair = Tuple[int, int]
+
+
+class CorpusFeatures(NamedTuple):
+    """Features of a dictionary of a corpus, computed once per dictionary
+
+    :ivar fingerprint: Merkle content hash, equal for identical dictionaries
+    :ivar size: Number of nodes of its tree, see `dict2tree()`
+    :ivar labels: Number of nodes per kind and label
+    :ivar block: Blocking key, only dictionaries with the same key are compared
+    """
+    fingerprint: bytes
+    size: int
+    labels: Counter
+    block: Hashable
+
+
+def corpus_features(d: Dict,
+                    block_key: Optional[Callable[[Dict], Hashable]] = None
+                    ) -> CorpusFeatures:
+    """Computes the features of a dictionary used by `compare_corpus()`
+
+    :param d: a dictionary
+    :type d: Dict
+    :param block_key: Function returning the blocking key of a dictionary, defaults
+        to None (a single block)
+    :type block_key: Callable[[Dict], Hashable], optional
+    :return: The features
+    :rtype: CorpusFeatures
+    """
+    tree = dict2tree(d)
+    return CorpusFeatures(
+        fingerprint=MerkleTree(d).fingerprint().content,
+        size=len(tree.labels),
+        labels=Counter(zip(tree.kinds, map(type, tree.labels), tree.labels)),
+        block=block_key(d) if block_key is not None else None,
+    )
+
+
+def lower_bound(f1: CorpusFeatures, f2: CorpusFeatures) -> int:
+    """Lower bound of the edit distance with unit costs of two dictionaries
+
+    Every insertion, deletion or substitution changes the labels of one node, so at
+    least as many operations as labels of the larger tree that are missing in the
+    other tree are needed.
+
+    :param f1: Features of the first dictionary
+    :type f1: CorpusFeatures
+    :param f2: Features of the second dictionary
+    :type f2: CorpusFeatures
+    :return: The lower bound
+    :rtype: int
+    """
+    if f1.fingerprint == f2.fingerprint:
+        return 0
+    common = sum((f1.labels & f2.labels).values())
+    return max(f1.size, f2.size) - common
+
+
+def compare_corpus(
+        dicts: List[Union[Dict, Message]],
+        ids: Optional[List[str]] = None,
+        max_distance: Optional[int] = None,
+        top_k: Optional[int] = None,
+        block_key: Optional[Callable[[Dict], Hashable]] = None,
+        num_workers: int = 1,
+        executor: str = 'thread',
+        chunk_size: int = 32,
+) -> pl.DataFrame:
+    """Compares all pairs of dictionaries of a corpus, e.g. to find near-duplicate
+    phenopackets
+
+    The distance is the tree edit distance with unit costs, see
+    `edit_distance(..., subtree_substitution_cost=0)`. Most pairs are never compared:
+    - the features of every dictionary are computed once, see `corpus_features()`
+    - only dictionaries with the same `block_key` are paired
+    - identical dictionaries (by their Merkle fingerprint) have the distance 0
+    - pairs whose lower bound (see `lower_bound()`) exceeds `max_distance` are
+      skipped
+    - with `top_k`, the pairs are compared in the order of their lower bounds until
+      no remaining pair can be closer than the k-th closest pair found
+
+    The remaining pairs are compared in chunks of `chunk_size` pairs on a pool of
+    `num_workers` threads or processes. The comparison is pure Python, use
+    `executor='process'` to use more than one core.
+
+    Example:
+        >>> compare_corpus(dicts, max_distance=5, num_workers=8, executor='process',
+        ...                block_key=lambda d: d['subject'].get('sex'))
+
+    :param dicts: The dictionaries or phenopackets, phenopackets are converted once by
+        `phenopacket2dict()`
+    :type dicts: List[Union[Dict, Message]]
+    :param ids: Identifiers of the dictionaries, defaults to their 'id' or their index
+    :type ids: List[str], optional
+    :param max_distance: Only return pairs within this distance, defaults to None
+    :type max_distance: int, optional
+    :param top_k: Only return the k closest pairs, defaults to None
+    :type top_k: int, optional
+    :param block_key: Function returning the blocking key of a dictionary, defaults to
+        None (all pairs)
+    :type block_key: Callable[[Dict], Hashable], optional
+    :param num_workers: Number of threads or processes, defaults to 1
+    :type num_workers: int, optional
+    :param executor: Either 'thread' or 'process', defaults to 'thread'
+    :type executor: str, optional
+    :param chunk_size: Number of pairs compared per task, defaults to 32
+    :type chunk_size: int, optional
+    :return: Sparse distance matrix with the columns `id1`, `id2` and `distance`,
+        ordered by distance
+    :rtype: pl.DataFrame
+    :raises ValueError: If executor is not 'thread' or 'process' or ids do not match
+        the dictionaries
+    """
+    if executor not in EXECUTORS:
+        logger.error(f'Executor {executor} not supported, use one of {EXECUTORS}')
+        raise ValueError(f'Executor {executor} not supported, use one of {EXECUTORS}')
+    dicts = [phenopacket2dict(d) if isinstance(d, Message) else d for d in dicts]
+    if ids is None:
+        ids = [str(d.get('id', i)) for i, d in enumerate(dicts)]
+    if len(ids) != len(dicts):
+        logger.error(f'Got {len(ids)} ids for {len(dicts)} dictionaries')
+        raise ValueError(f'Got {len(ids)} ids for {len(dicts)} dictionaries')
+
+    features = [corpus_features(d, block_key) for d in dicts]
+    identical, candidates = _candidate_pairs(features, max_distance)
+    logger.info(f'Comparing {len(candidates)} of {len(dicts) * (len(dicts) - 1) // 2} '
+                f'pairs of {len(dicts)} dictionaries, {len(identical)} pairs are '
+                'identical')
+
+    results = [(i, j, 0) for i, j in identical]
+    with _distance_mapper(dicts, num_workers, executor) as map_chunks:
+        if top_k is not None:
+            results = _top_k(candidates, results, top_k, map_chunks,
+                             max(1, num_workers) * chunk_size, chunk_size)
+        else:
+            results += _compare(candidates, map_chunks, chunk_size)
+
+    if max_distance is not None:
+        results = [(i, j, dist) for i, j, dist in results if dist <= max_distance]
+    results.sort(key=lambda result: (result[2], result[0], result[1]))
+    if top_k is not None:
+        results = results[:top_k]
+
+    return pl.DataFrame(
+        {
+            'id1': [ids[i] for i, _, _ in results],
+            'id2': [ids[j] for _, j, _ in results],
+            'distance': [dist for _, _, dist in results],
+        },
+        schema={'id1': pl.Utf8, 'id2': pl.Utf8, 'distance': pl.Int64},
+    )
+
+
+def _candidate_pairs(
+        features: List[CorpusFeatures],
+        max_distance: Optional[int],
+) -> Tuple[List[Pair], List[Tuple[int, int, int]]]:
+    """Returns the identical pairs and the lower bound and the pair of each other
+    pair that may be within `max_distance`, pairs of different blocks are skipped"""
+    blocks = defaultdict(list)
+    for i, feature in enumerate(features):
+        blocks[feature.block].append(i)
+
+    identical = []
+    candidates = []
+    for members in blocks.values():
+        # sorted by size, the size difference is a lower bound as well
+        members.sort(key=lambda i: features[i].size)
+        for a, i in enumerate(members):
+            for j in members[a + 1:]:
+                if max_distance is not None and \
+                        features[j].size - features[i].size > max_distance:
+                    break
+                pair = min(i, j), max(i, j)
+                if features[i].fingerprint == features[j].fingerprint:
+                    identical.append(pair)
+                    continue
+                bound = lower_bound(features[i], features[j])
+                if max_distance is None or bound <= max_distance:
+                    candidates.append((bound, *pair))
+    return identical, candidates
+
+
+def _compare(candidates: List[Tuple[int, int, int]], map_chunks: Callable,
+             chunk_size: int) -> List[Tuple[int, int, int]]:
+    """Computes the distances of candidate pairs"""
+    pairs = [(i, j) for _, i, j in candidates]
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    results = []
+    for chunk, distances in zip(chunks, map_chunks(chunks)):
+        results.extend((i, j, dist) for (i, j), dist in zip(chunk, distances))
+    return results
+
+
+def _top_k(candidates: List[Tuple[int, int, int]],
+           results: List[Tuple[int, int, int]],
+           k: int, map_chunks: Callable, round_size: int,
+           chunk_size: int) -> List[Tuple[int, int, int]]:
+    """Computes the distances of the candidate pairs in the order of their lower
+    bounds, until no remaining pair can be closer than the k-th closest pair"""
+    candidates = sorted(candidates)
+    # max heap of the k closest pairs, by negated distance
+    closest: List[Tuple[int, int, int]] = []
+
+    def push(new_results: List[Tuple[int, int, int]]) -> None:
+        for i, j, dist in new_results:
+            if len(closest) < k:
+                heapq.heappush(closest, (-dist, i, j))
+            elif dist < -closest[0][0]:
+                heapq.heapreplace(closest, (-dist, i, j))
+
+    push(results)
+    start = 0
+    while start < len(candidates):
+        if len(closest) == k and candidates[start][0] >= -closest[0][0]:
+            break
+        push(_compare(candidates[start:start + round_size], map_chunks, chunk_size))
+        start += round_size
+    logger.debug(f'Compared {min(start, len(candidates))} of {len(candidates)} '
+                 f'candidate pairs to find the {k} closest pairs')
+    return [(i, j, -neg_dist) for neg_dist, i, j in closest]
+
+
+@contextmanager
+def _distance_mapper(dicts: List[Dict], num_workers: int,
+                     executor: str) -> Iterator[Callable]:
+    """Yields a function that maps chunks of pairs to their distances, sequentially,
+    on a thread pool or on a process pool"""
+    if num_workers <= 1 or executor == 'thread':
+        trees = [dict2tree(d) for d in dicts]
+        if num_workers <= 1:
+            yield lambda chunks: (_pair_distances(trees, chunk) for chunk in chunks)
+            return
+        pool = ThreadPoolExecutor(max_workers=num_workers)
+        map_chunks = partial(pool.map, partial(_pair_distances, trees))
+    else:
+        # the dictionaries are sent to every worker process once
+        pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_corpus_worker,
+            initargs=(dicts,),
+        )
+        map_chunks = partial(pool.map, _worker_pair_distances)
+    try:
+        yield map_chunks
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+_worker_trees: List[Tree] = []
+
+
+def _init_corpus_worker(dicts: List[Dict]) -> None:
+    """Initializes the worker processes of `compare_corpus()`"""
+    init_worker_process()
+    global _worker_trees
+    _worker_trees = [dict2tree(d) for d in dicts]
+
+
+def _worker_pair_distances(pairs: List[Pair]) -> List[int]:
+    """Executed in the worker processes of `compare_corpus()`"""
+    return _pair_distances(_worker_trees, pairs)
+
+
+def _unit_cost(*_) -> int:
+    return 1
+
+
+def _pair_distances(trees: List[Tree], pairs: List[Pair]) -> List[int]:
+    """Computes the edit distances with unit costs of pairs of trees"""
+    return [tree_edit_distance(trees[i], trees[j], insertion_cost=_unit_cost,
+                               deletion_cost=_unit_cost, substitution_cost=_unit_cost)
+            for i, j in pairs]
@@ -1,166 +1,283 @@
 import uuid
-from collections import deque
-from typing import Dict, Optional, Union, Callable, Any
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union, Callable, Any
 
-from .structure import compare_structure
+from google.protobuf.message import Message
+
+from .merkle import MerkleTree, merkle_tree, _digest, _encode
 
 T = Union[int, float]
 
+# kinds of the nodes of the tree of a dictionary, see `dict2tree()`
+KEY = 0
+VALUE = 1
+LIST = 2
+DICT = 3
+
+LIST_LABEL = 'type: <list>'
+DICT_LABEL = 'type: <dict>'
+
+
+class Tree(NamedTuple):
+    """Ordered tree of a dictionary, with its nodes in postorder
+
+    :ivar kinds: Kind of each node, `KEY`, `VALUE`, `LIST` or `DICT`
+    :ivar labels: Label of each node, the key, the value, `LIST_LABEL` or `DICT_LABEL`
+    :ivar leftmost: Index of the leftmost leaf of the subtree of each node
+    :ivar keyroots: Nodes that are the root or have a left sibling, ascending
+    :ivar hashes: BLAKE2b digest of the subtree of each node, equal for identical
+        subtrees (up to hash collisions of BLAKE2b)
+    """
+    kinds: List[int]
+    labels: List[Any]
+    leftmost: List[int]
+    keyroots: List[int]
+    hashes: List[bytes]
+
 
 def edit_distance(
-        d1: Dict, d2: Dict,
+        d1: Union[Dict, MerkleTree, Message], d2: Union[Dict, MerkleTree, Message],
         d1_id: Optional[Union[int, str]] = uuid.uuid4(),
         d2_id: Optional[Union[int, str]] = uuid.uuid4(),
         subtree_substitution_cost: T = 1,
         insertion_cost: Union[int, float, Callable[[Any], T]] = 1,
-        val_substitution_cost: Union[int, float, Callable[[Any, Any], T]] = 1
+        val_substitution_cost: Union[int, float, Callable[[Any, Any], T]] = 1,
+        deletion_cost: Union[int, float, Callable[[Any], T], None] = None,
 ) -> T:
     """
     Calculates the edit distance between two dictionaries.
 
+    The dictionaries are compared as ordered trees (see `dict2tree()`) with the
+    algorithm of Zhang and Shasha: the cheapest sequence of node insertions, node
+    deletions and node substitutions (of keys or values) that turns the first tree
+    into the second. Keys are aligned by the algorithm, so a single inserted key only
+    costs its own subtree.
+
+    With a `subtree_substitution_cost`, replacing a subtree by a subtree with a
+    different root (e.g. a different key) costs at most that much.
+
+    Example:
+        >>> edit_distance({'a': 1, 'b': 2}, {'a': 1, 'x': 0, 'b': 2},
+        ...               subtree_substitution_cost=0)
+        2
+
+    Identical dictionaries are detected by their Merkle fingerprints, see
+    `MerkleTree`, pass a `MerkleTree` to reuse its fingerprints across comparisons.
+    Phenopackets are converted by `phenopacket2dict()`, without a JSON round trip.
+
     :param d1: First dictionary
-    :type d1: Dict
+    :type d1: Union[Dict, MerkleTree, Message]
     :param d2: Second dictionary
-    :type d2: Dict
+    :type d2: Union[Dict, MerkleTree, Message]
     :param d1_id: Identifier for first dictionary, defaults to random UUID
     :type d1_id: Optional[Union[int, str]], optional
     :param d2_id: Identifier for second dictionary, defaults to random UUID
     :type d2_id: Optional[Union[int, str]], optional
-    :param subtree_substitution_cost: Cost for changing a subtree, if this is assigned,
-    insertion cost and substitution cost are ignored, defaults 1
+    :param subtree_substitution_cost: Maximum cost for replacing a subtree by a subtree
+    with a different root, 0 to disable, defaults 1
     :type subtree_substitution_cost: Union[int, float]
-    :param insertion_cost: Cost for inserting a key, can be a method taking the
-    inserted element as a parameter, defaults to 1
+    :param insertion_cost: Cost for inserting a node, can be a method taking the
+    label of the inserted node (key or value) as a parameter, defaults to 1
     :type insertion_cost: Union[int, float, Callable[[Any], Union[int, float]]]
-    :param val_substitution_cost: Cost for changing a value, can be a method taking
-    the first and the second value as argument, defaults to 1
+    :param val_substitution_cost: Cost for changing the label of a node, can be a
+    method taking the first and the second label as argument, defaults to 1
     :type val_substitution_cost:
     Union[int, float, Callable[[Any, Any], Union[int, float]]]
+    :param deletion_cost: Cost for deleting a node, can be a method taking the
+    label of the deleted node as a parameter, defaults to the insertion cost
+    :type deletion_cost: Union[int, float, Callable[[Any], Union[int, float]], None]
     :return: Edit distance between the two dictionaries
-    :rtype: int
+    :rtype: Union[int, float]
+    :raises ValueError: If a cost is not a non-negative number
     """
+    _validate_cost(subtree_substitution_cost or 0, 'subtree_substitution_cost')
+    insertion_cost = _cost_function(insertion_cost, 'insertion_cost')
+    val_substitution_cost = _cost_function(val_substitution_cost,
+                                           'val_substitution_cost')
+    if deletion_cost is None:
+        deletion_cost = insertion_cost
+    else:
+        deletion_cost = _cost_function(deletion_cost, 'deletion_cost')
 
-    def validate_cost(cost_val: T, cost_label: str):
-        """surround each cost call with this method to check if the cost is valid"""
-        if not isinstance(cost_val, (int, float)) or cost_val < 0:
-            raise ValueError(f'{cost_label} {cost_val} must be a non-negative '
-                             f' integer or floating point number')
-        return cost_val
+    # fast path, identical dictionaries do not need a tree
+    t1, t2 = merkle_tree(d1), merkle_tree(d2)
+    if t1.fingerprint().content == t2.fingerprint().content:
+        return 0
 
-    if isinstance(subtree_substitution_cost, (int, float)):
-        validate_cost(
-            subtree_substitution_cost,
-            'subtree_substitution_cost'
-        )
+    return tree_edit_distance(
+        dict2tree(t1.root), dict2tree(t2.root),
+        insertion_cost=insertion_cost,
+        deletion_cost=deletion_cost,
+        substitution_cost=val_substitution_cost,
+        subtree_substitution_cost=subtree_substitution_cost,
+    )
 
-    if isinstance(insertion_cost, (int, float)):
-        validate_cost(insertion_cost, 'insertion_cost')
 
-        def insertion_cost(inserted):
-            return insertion_cost
+def dict2tree(d: Dict) -> Tree:
+    """Converts a dictionary to an ordered tree
 
-    if isinstance(val_substitution_cost, (int, float)):
-        validate_cost(val_substitution_cost, 'val_substitution_cost')
+    The root is a `DICT` node. Every key is a `KEY` node, whose children are the keys
+    of its value if it is a dictionary, a `LIST` node if it is a list or a `VALUE`
+    node otherwise. The children of a `LIST` node are its items, dictionaries in a
+    list are `DICT` nodes.
 
-        def val_substitution_cost(val1, val2):
-            return val_substitution_cost
+    Example:
+        >>> dict2tree({'a': [1]}).labels
+        [1, 'type: <list>', 'a', 'type: <dict>']
 
-    equals = compare_structure(
-        d1, d2,
-        d1_id, d2_id,
-        include_vals=bool(val_substitution_cost),
-        construct_diff_tree=False
-    )
+    :param d: a dictionary
+    :type d: Dict
+    :return: The tree, with its nodes in postorder
+    :rtype: Tree
+    """
+    tree = Tree([], [], [], [], [])
+    _add_node(tree, DICT, DICT_LABEL, d)
 
-    if equals:
-        return 0
+    is_keyroot = {}
+    # the highest node with a given leftmost leaf is a keyroot
+    for node, leftmost in enumerate(tree.leftmost):
+        is_keyroot[leftmost] = node
+    tree.keyroots.extend(sorted(is_keyroot.values()))
+    return tree
 
-    cost = 0
-
-    q1 = deque()
-    q1.append(d1)
-
-    q2 = deque()
-    q2.append(d2)
-
-    while q1:
-        n1 = q1.popleft()
-        n2 = q2.popleft()
-
-        if isinstance(n1, dict) and isinstance(n2, dict):
-            for k1, v1, k2, v2 in zip(n1.keys(), n1.values(), n2.keys(), n2.values()):
-                if k1 == k2:
-                    q1.append(v1)
-                    q2.append(v2)
-                elif k1 != k2:
-                    cost += _calculate_edit_distance(
-                        subtree1={k1: v1},
-                        subtree2={k2: v2},
-                        validate_cost=validate_cost,
-                        insertion_cost=insertion_cost,
-                        val_substitution_cost=val_substitution_cost
-                    )
-
-        elif (isinstance(n1, list) or isinstance(n1, tuple)) and \
-                (isinstance(n2, list) or isinstance(n2, tuple)):
-            if n1 != n2:
-                cost += _calculate_edit_distance(
-                    subtree1={'k': n1},
-                    subtree2={'k': n2},
-                    validate_cost=validate_cost,
-                    insertion_cost=insertion_cost,
-                    val_substitution_cost=val_substitution_cost
-                )
 
-    return cost
+def tree_edit_distance(
+        t1: Tree, t2: Tree,
+        insertion_cost: Callable[[Any], T],
+        deletion_cost: Callable[[Any], T],
+        substitution_cost: Callable[[Any, Any], T],
+        subtree_substitution_cost: T = 0,
+) -> T:
+    """Calculates the edit distance between two ordered trees (Zhang and Shasha)
 
+    The distances between all pairs of subtrees are memoized and computed keyroot
+    pair by keyroot pair. Identical subtrees (by their hash) are matched without
+    evaluating their costs.
 
-def _calculate_edit_distance(
-        subtree1: Dict, subtree2: Dict,
-        validate_cost: Callable[[T, str], T],
-        subtree_substitution_cost: T = 1,
-        insertion_cost: Union[int, float, Callable[[Any], T]] = 1,
-        val_substitution_cost: Union[int, float, Callable[[Any, Any], T]] = 1,
-) -> T:
-    """
-    Calculates the edit distance between two subtrees.
-
-    :param subtree1: First subtree
-    :type subtree1: Dict
-    :param subtree2: Second subtree
-    :type subtree2: Dict
-    :param validate_cost: Method to check if the cost is valid
-    :type validate_cost: Callable[[T, str], T]
-    :param subtree_substitution_cost: Cost for changing a subtree, if this is assigned,
-    insertion cost and substitution cost are ignored, defaults 1
+    :param t1: First tree
+    :type t1: Tree
+    :param t2: Second tree
+    :type t2: Tree
+    :param insertion_cost: Cost for inserting a node of the second tree
+    :type insertion_cost: Callable[[Any], Union[int, float]]
+    :param deletion_cost: Cost for deleting a node of the first tree
+    :type deletion_cost: Callable[[Any], Union[int, float]]
+    :param substitution_cost: Cost for changing the label of a node
+    :type substitution_cost: Callable[[Any, Any], Union[int, float]]
+    :param subtree_substitution_cost: Maximum cost for replacing a subtree by a
+        subtree with a different root, 0 to disable, defaults to 0
     :type subtree_substitution_cost: Union[int, float]
-    :param insertion_cost: Cost for inserting a key, can be a method taking the
-    inserted element as a parameter, defaults to 1
-    :type insertion_cost: Union[int, float, Callable[[Any], Union[int, float]]]
-    :param val_substitution_cost: Cost for changing a value, can be a method taking
-    the first and the second value as argument, defaults to 1
-    :type val_substitution_cost:
-    Union[int, float, Callable[[Any, Any], Union[int, float]]]
-    :return: Edit distance between the two subtrees
-    :rtype: int
+    :return: Edit distance between the two trees
+    :rtype: Union[int, float]
     """
-    if subtree_substitution_cost:
-        return subtree_substitution_cost
+    l1, l2 = t1.leftmost, t2.leftmost
+    h1, h2 = t1.hashes, t2.hashes
+    deletions = [_validate_cost(deletion_cost(label), 'deletion_cost')
+                 for label in t1.labels]
+    insertions = [_validate_cost(insertion_cost(label), 'insertion_cost')
+                  for label in t2.labels]
+
+    def relabel(a: int, b: int) -> T:
+        if _same_label(t1, a, t2, b):
+            return 0
+        return _validate_cost(substitution_cost(t1.labels[a], t2.labels[b]),
+                              'val_substitution_cost')
+
+    # tree_dist[a][b] is the distance between the subtrees rooted at a and b
+    tree_dist = [[0] * len(l2) for _ in range(len(l1))]
+    for i in t1.keyroots:
+        for j in t2.keyroots:
+            li, lj = l1[i], l2[j]
+            rows, cols = i - li + 2, j - lj + 2
+            # forest_dist[x][y] is the distance between the forests li..li+x-1 and
+            # lj..lj+y-1
+            forest_dist = [[0] * cols for _ in range(rows)]
+            for x in range(1, rows):
+                forest_dist[x][0] = forest_dist[x - 1][0] + deletions[li + x - 1]
+            first_row = forest_dist[0]
+            for y in range(1, cols):
+                first_row[y] = first_row[y - 1] + insertions[lj + y - 1]
+
+            for x in range(1, rows):
+                a = li + x - 1
+                row, prev_row = forest_dist[x], forest_dist[x - 1]
+                deletion = deletions[a]
+                tree_row = tree_dist[a]
+                for y in range(1, cols):
+                    b = lj + y - 1
+                    if l1[a] == li and l2[b] == lj:
+                        # both forests are trees, rooted at a and b
+                        if h1[a] == h2[b]:
+                            dist = 0
+                        else:
+                            dist = min(prev_row[y] + deletion,
+                                       row[y - 1] + insertions[b],
+                                       prev_row[y - 1] + relabel(a, b))
+                            if subtree_substitution_cost and \
+                                    not _same_label(t1, a, t2, b):
+                                dist = min(dist, subtree_substitution_cost)
+                        row[y] = tree_row[b] = dist
+                    else:
+                        row[y] = min(
+                            prev_row[y] + deletion,
+                            row[y - 1] + insertions[b],
+                            forest_dist[l1[a] - li][l2[b] - lj] + tree_row[b],
+                        )
+    return tree_dist[-1][-1]
+
+
+def _add_node(tree: Tree, kind: int, label: Any, value: Any) -> int:
+    """Adds a node and its subtree to a tree in postorder, returns its index"""
+    if kind == KEY:
+        children = _value_children(value)
+    elif kind == DICT:
+        children = [(KEY, key, child) for key, child in value.items()]
+    elif kind == LIST:
+        children = [(DICT, DICT_LABEL, item) if isinstance(item, dict)
+                    else (LIST, LIST_LABEL, item) if isinstance(item, (list, tuple))
+                    else (VALUE, item, None)
+                    for item in value]
     else:
-        # TODO: the structure of the subtrees should roughly match, assign penalties
-        #  otherwise
-        # just assign penalties for each key or value or list item that is different
-        # also count up the items in a not in b and in b not in a and assign penalties
-        cost = 69
-
-        if True:  # insertion
-            inserted_item = None
-            cost += validate_cost(insertion_cost(inserted_item), 'insertion_cost')
-        if True:  # modification
-            val1 = None
-            val2 = None
-            cost += validate_cost(
-                val_substitution_cost(val1, val2),
-                'val_substitution_cost'
-            )
-        return cost
+        children = []
+
+    child_indices = [_add_node(tree, *child) for child in children]
+    index = len(tree.labels)
+    tree.kinds.append(kind)
+    tree.labels.append(label)
+    tree.leftmost.append(tree.leftmost[child_indices[0]] if child_indices else index)
+    # the label is encoded with its type, the digests of the children have a fixed
+    # size, so different subtrees do not share the same input of the digest
+    tree.hashes.append(_digest(bytes([kind]), _encode(label),
+                               *(tree.hashes[child] for child in child_indices)))
+    return index
+
+
+def _same_label(t1: Tree, a: int, t2: Tree, b: int) -> bool:
+    """Whether two nodes have the same kind and label, `True` differs from `1`"""
+    label1, label2 = t1.labels[a], t2.labels[b]
+    return t1.kinds[a] == t2.kinds[b] and type(label1) is type(label2) and \
+        label1 == label2
+
+
+def _value_children(value: Any) -> List[Tuple[int, Any, Any]]:
+    """Returns the children of a key node with the given value"""
+    if isinstance(value, dict):
+        return [(KEY, key, child) for key, child in value.items()]
+    if isinstance(value, (list, tuple)):
+        return [(LIST, LIST_LABEL, value)]
+    return [(VALUE, value, None)]
+
+
+def _cost_function(cost: Union[T, Callable], cost_label: str) -> Callable:
+    """Wraps a constant cost in a function"""
+    if isinstance(cost, (int, float)):
+        _validate_cost(cost, cost_label)
+        return lambda *_: cost
+    return cost
+
+
+def _validate_cost(cost_val: T, cost_label: str) -> T:
+    """surround each cost call with this method to check if the cost is valid"""
+    if not isinstance(cost_val, (int, float)) or cost_val < 0:
+        raise ValueError(f'{cost_label} {cost_val} must be a non-negative '
+                         f' integer or floating point number')
+    return cost_val
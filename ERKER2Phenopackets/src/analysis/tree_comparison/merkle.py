@@ -0,0 +1,134 @@
+import hashlib
+from typing import Any, Dict, NamedTuple, Union
+
+from google.protobuf.message import Message
+
+from ERKER2Phenopackets.src.utils.io import phenopacket2dict
+
+_DIGEST_SIZE = 16
+
+
+class Fingerprint(NamedTuple):
+    """Merkle hashes of a subtree
+
+    :ivar structure: Hash of the keys, their order and the shape of the lists, equal
+        for subtrees that `compare_structure()` considers equal
+    :ivar content: Hash of the structure and the values, equal for identical subtrees
+    """
+    structure: bytes
+    content: bytes
+
+
+def _digest(*parts: bytes) -> bytes:
+    h = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+    for part in parts:
+        h.update(part)
+    return h.digest()
+
+
+def _encode(value: Any) -> bytes:
+    """Encodes a key or a value with its type and length, so that concatenated
+    encodings are unambiguous"""
+    encoded = f'{type(value).__name__}:{value!r}'.encode('utf-8')
+    return len(encoded).to_bytes(4, 'little') + encoded
+
+
+# a value has no structure of its own, like in the traversals of `compare_structure()`
+_EMPTY_DICT = Fingerprint(_digest(b'd'), _digest(b'd'))
+
+# default node of `MerkleTree.fingerprint()`, None is a value of the tree
+_ROOT = object()
+
+
+class MerkleTree:
+    """Merkle fingerprints of all subtrees of a dictionary
+
+    The fingerprints of the dictionaries and lists of the tree are computed once, in
+    a single pass, and cached by node. Two subtrees are equal if and only if their
+    fingerprints are equal (up to hash collisions of BLAKE2b), so comparing subtrees
+    takes constant time. The hashes do not depend on the process, they can be
+    compared across processes and runs.
+
+    The dictionary must not be modified while the tree is in use.
+
+    Example:
+        >>> t1, t2 = MerkleTree({'a': {'b': 1}}), MerkleTree({'a': {'b': 2}})
+        >>> t1.fingerprint().structure == t2.fingerprint().structure
+        True
+        >>> t1.fingerprint().content == t2.fingerprint().content
+        False
+
+    :param d: a dictionary
+    :type d: Dict
+    """
+
+    def __init__(self, d: Dict):
+        self.root = d
+        # by id() of the node, the nodes are kept alive by `root`
+        self._fingerprints: Dict[int, Fingerprint] = {}
+        self._compute(d)
+
+    def fingerprint(self, node: Any = _ROOT) -> Fingerprint:
+        """Returns the fingerprint of a node of the tree, defaults to the root
+
+        :param node: A dictionary, list or value of the tree, defaults to the root
+        :type node: Any, optional
+        :return: The fingerprint
+        :rtype: Fingerprint
+        """
+        if node is _ROOT:
+            node = self.root
+        if isinstance(node, (dict, list, tuple)):
+            return self._fingerprints[id(node)]
+        return _value_fingerprint(node)
+
+    def _compute(self, root: Any) -> None:
+        # iterative postorder, so that deep dictionaries do not exceed the recursion
+        # limit, a node is visited again once the fingerprints of its children exist
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not isinstance(node, (dict, list, tuple)):
+                continue
+            children = node.values() if isinstance(node, dict) else node
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+
+            child_fingerprints = map(self.fingerprint, children)
+            if isinstance(node, dict):
+                structure, content = [b'd'], [b'd']
+                for key, child in zip(node.keys(), child_fingerprints):
+                    encoded_key = _encode(key)
+                    structure += [encoded_key, child.structure]
+                    content += [encoded_key, child.content]
+            else:
+                structure, content = [b'l'], [b'l']
+                for child in child_fingerprints:
+                    structure.append(child.structure)
+                    content.append(child.content)
+            self._fingerprints[id(node)] = Fingerprint(_digest(*structure),
+                                                       _digest(*content))
+
+
+def merkle_tree(d: Union[Dict, MerkleTree, Message]) -> MerkleTree:
+    """Returns the Merkle tree of a dictionary, or the tree itself if it already is
+    one, so that precomputed fingerprints can be reused across comparisons
+
+    Phenopackets and other protobuf messages are converted by `phenopacket2dict()`.
+
+    :param d: a dictionary, its Merkle tree or a protobuf message
+    :type d: Union[Dict, MerkleTree, Message]
+    :return: The Merkle tree
+    :rtype: MerkleTree
+    """
+    if isinstance(d, MerkleTree):
+        return d
+    if isinstance(d, Message):
+        return MerkleTree(phenopacket2dict(d))
+    return MerkleTree(d)
+
+
+def _value_fingerprint(value: Any) -> Fingerprint:
+    return Fingerprint(_EMPTY_DICT.structure, _digest(b'v', _encode(value)))
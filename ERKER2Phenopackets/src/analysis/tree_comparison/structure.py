@@ -1,12 +1,16 @@
 import uuid
 from collections import deque
-from typing import Dict, Tuple, Union, Optional, List, Any
+from itertools import zip_longest
+from typing import Dict, Tuple, Union, Optional, List, Any, Iterator, NamedTuple
 
-from .traverse import traverse
+from google.protobuf.message import Message
+
+from .merkle import MerkleTree, merkle_tree
+from .traverse import MISSING, first_mismatch
 
 
 def compare_structure(
-        d1: Dict, d2: Dict,
+        d1: Union[Dict, MerkleTree, Message], d2: Union[Dict, MerkleTree, Message],
         d1_id: Optional[Union[int, str]] = uuid.uuid4(),
         d2_id: Optional[Union[int, str]] = uuid.uuid4(),
         include_vals: bool = False,
@@ -16,10 +20,16 @@ def compare_structure(
 
     By structure we mean the keys and the order of the keys.
 
+    Dictionaries are walked in lockstep and the comparison stops at their first
+    difference, see `first_mismatch()`. If both are a `MerkleTree`, their
+    fingerprints are compared instead, pass a `MerkleTree` instead of a dictionary to
+    reuse its fingerprints across comparisons. Phenopackets can be compared directly,
+    without converting them to JSON, see `phenopacket2dict()`.
+
     :param d1: First dictionary
-    :type d1: Dict
+    :type d1: Union[Dict, MerkleTree, Message]
     :param d2: Second dictionary
-    :type d2: Dict
+    :type d2: Union[Dict, MerkleTree, Message]
     :param d1_id: Identifier for first dictionary, defaults to random UUID
     :type d1_id: Optional[Union[int, str]], optional
     :param d2_id: Identifier for second dictionary, defaults to random UUID
@@ -32,19 +42,17 @@ def compare_structure(
     :return: True if structure matches, False and difference dict otherwise
     :rtype: Union[Tuple[bool, Dict], bool]
     """
-    bfs1 = traverse(d1, 'bfs', include_vals=include_vals)
-    bfs2 = traverse(d2, 'bfs', include_vals=include_vals)
-
-    bfs_equals = bfs1 == bfs2
-
-    if bfs_equals:
-        dfs1 = traverse(d1, 'dfs', include_vals=include_vals)
-        dfs2 = traverse(d2, 'dfs', include_vals=include_vals)
-
-        dfs_equals = dfs1 == dfs2
+    if isinstance(d1, MerkleTree) and isinstance(d2, MerkleTree):
+        fingerprint1, fingerprint2 = d1.fingerprint(), d2.fingerprint()
+        if include_vals:
+            equals = fingerprint1.content == fingerprint2.content
+        else:
+            equals = fingerprint1.structure == fingerprint2.structure
+    else:
+        equals = first_mismatch(_root(d1), _root(d2), include_vals) is None
 
-        if dfs_equals:
-            return True, {} if construct_diff_tree else True
+    if equals:
+        return (True, {}) if construct_diff_tree else True
 
     if construct_diff_tree:
         return False, create_difference_tree(d1, d2, d1_id, d2_id)
@@ -52,16 +60,31 @@ def compare_structure(
         return False
 
 
-def create_difference_tree(d1: Dict, d2: Dict,
+def create_difference_tree(d1: Union[Dict, MerkleTree, Message],
+                           d2: Union[Dict, MerkleTree, Message],
                            d1_id: Optional[Union[int, str]] = uuid.uuid4(),
                            d2_id: Optional[Union[int, str]] = uuid.uuid4()
                            ) -> Dict:
     """Creates a difference tree for two dictionaries.
 
+    Only subtrees whose Merkle fingerprints differ are descended into, identical
+    subtrees under the same key are left out of the difference tree. Values that
+    differ are replaced by `{d1_id: value1, d2_id: value2}`, keys that differ (or
+    that only one of the dictionaries has) are collected under `d1_id` and `d2_id`
+    in the difference tree of their parent.
+
+    The tree is built in a single pass, every node of the difference tree is
+    created once and filled through a direct reference.
+
+    Example:
+        >>> create_difference_tree({'a': {'b': 1}, 'c': 2}, {'a': {'b': 2}, 'd': 2},
+        ...                        1, 2)
+        {'a': {'b': {1: 1, 2: 2}}, 1: {'c': 2}, 2: {'d': 2}}
+
     :param d1: First dictionary
-    :type d1: Dict
+    :type d1: Union[Dict, MerkleTree, Message]
     :param d2: Second dictionary
-    :type d2: Dict
+    :type d2: Union[Dict, MerkleTree, Message]
     :param d1_id: Identifier for first dictionary, defaults to random UUID
     :type d1_id: Optional[Union[int, str]], optional
     :param d2_id: Identifier for second dictionary, defaults to random UUID
@@ -69,68 +92,136 @@ def create_difference_tree(d1: Dict, d2: Dict,
     :return: Difference tree
     :rtype: Dict
     """
+    t1, t2 = merkle_tree(d1), merkle_tree(d2)
+    if t1.fingerprint().content == t2.fingerprint().content:
+        return {}
+    if not (isinstance(t1.root, dict) and isinstance(t2.root, dict)):
+        return _value_difference(t1.root, t2.root, d1_id, d2_id)
+
     difference_tree = {}
-    q1 = deque()
-    q1.append((d1, [None]))
-
-    q2 = deque()
-    q2.append((d2, [None]))
-
-    while q1:
-        n1, key_path1 = q1.popleft()
-        n2, key_path2 = q2.popleft()
-
-        if isinstance(n1, dict) and isinstance(n2, dict):
-            for k1, v1, k2, v2 in zip(n1.keys(), n1.values(), n2.keys(), n2.values()):
-                if k1 == k2:
-                    difference_tree = assign_dict_at(
-                        d=difference_tree,
-                        key_path=key_path1,
-                        value={k1: {}}
-                    )
-
-                    q1.append((v1, key_path1 + [k1]))
-                    q2.append((v2, key_path2 + [k2]))
-                elif k1 != k2:
-                    difference_tree = assign_dict_at(
-                        d=difference_tree,
-                        key_path=key_path1,
-                        value={
-                            d1_id: {k1: v1},
-                            d2_id: {k2: v2},
-                        }
-                    )
-
-        elif (isinstance(n1, list) or isinstance(n1, tuple)) and \
-                (isinstance(n2, list) or isinstance(n2, tuple)):
-            if n1 == n2:
-                difference_tree = assign_dict_at(
-                    d=difference_tree,
-                    key_path=key_path1,
-                    value=n1
-                )
-            elif n1 != n2:
-                difference_tree = assign_dict_at(
-                    d=difference_tree,
-                    key_path=key_path1,
-                    value={
-                        d1_id: n1,
-                        d2_id: n2,
-                    }
-                )
-        else:
-            difference_tree = assign_dict_at(
-                d=difference_tree,
-                key_path=key_path1,
-                value={
-                    d1_id: n1,
-                    d2_id: n2,
-                }
-            )
+    # pairs of nodes to compare and the node of the difference tree to fill
+    queue = deque()
+    queue.append((t1.root, t2.root, difference_tree))
+
+    while queue:
+        n1, n2, out = queue.popleft()
+        for k1, v1, k2, v2 in _differing_children(t1, t2, n1, n2):
+            if k1 is not MISSING and k1 == k2:
+                if isinstance(v1, dict) and isinstance(v2, dict):
+                    out[k1] = {}
+                    queue.append((v1, v2, out[k1]))
+                else:
+                    out[k1] = _value_difference(v1, v2, d1_id, d2_id)
+                continue
+            if k1 is not MISSING:
+                out.setdefault(d1_id, {})[k1] = v1
+            if k2 is not MISSING:
+                out.setdefault(d2_id, {})[k2] = v2
 
     return difference_tree
 
 
+class Difference(NamedTuple):
+    """Difference of two dictionaries, see `list_differences()`
+
+    :ivar path: Keys from the root to the value that differs
+    :ivar value1: Value of the first dictionary, `MISSING` if it has no such key
+    :ivar value2: Value of the second dictionary, `MISSING` if it has no such key
+    """
+    path: Tuple
+    value1: Any
+    value2: Any
+
+
+def list_differences(d1: Union[Dict, MerkleTree, Message],
+                     d2: Union[Dict, MerkleTree, Message]) -> List[Difference]:
+    """Lists the differences of two dictionaries as a flat list.
+
+    A compact alternative to `create_difference_tree()` for large dictionaries: the
+    same differences, each with the full path to it and without the nested
+    dictionaries that lead to it. The traversal shares the prefixes of the paths, a
+    path is only built for the differences. As every path is a full tuple, the
+    nested difference tree is more compact if many differences are deeply nested.
+
+    Example:
+        >>> list_differences({'a': {'b': 1}, 'c': 2}, {'a': {'b': 2}, 'd': 2})
+        [Difference(path=('c',), value1=2, value2=MISSING),
+         Difference(path=('d',), value1=MISSING, value2=2),
+         Difference(path=('a', 'b'), value1=1, value2=2)]
+
+    :param d1: First dictionary
+    :type d1: Union[Dict, MerkleTree, Message]
+    :param d2: Second dictionary
+    :type d2: Union[Dict, MerkleTree, Message]
+    :return: The differences, in breadth first order
+    :rtype: List[Difference]
+    """
+    t1, t2 = merkle_tree(d1), merkle_tree(d2)
+    if t1.fingerprint().content == t2.fingerprint().content:
+        return []
+    if not (isinstance(t1.root, dict) and isinstance(t2.root, dict)):
+        return [Difference((), t1.root, t2.root)]
+
+    differences = []
+    # pairs of nodes to compare and their path, as a linked list of
+    # (path of the parent, key) that shares the prefixes
+    queue = deque()
+    queue.append((t1.root, t2.root, None))
+
+    while queue:
+        n1, n2, path = queue.popleft()
+        # the path of the node is only built if one of its children differs
+        prefix = None
+        for k1, v1, k2, v2 in _differing_children(t1, t2, n1, n2):
+            if k1 is not MISSING and k1 == k2 and \
+                    isinstance(v1, dict) and isinstance(v2, dict):
+                queue.append((v1, v2, (path, k1)))
+                continue
+            if prefix is None:
+                prefix = _unlink(path)
+            if k1 is not MISSING and k1 == k2:
+                differences.append(Difference(prefix + (k1,), v1, v2))
+                continue
+            if k1 is not MISSING:
+                differences.append(Difference(prefix + (k1,), v1, MISSING))
+            if k2 is not MISSING:
+                differences.append(Difference(prefix + (k2,), MISSING, v2))
+
+    return differences
+
+
+def _differing_children(t1: MerkleTree, t2: MerkleTree, n1: Dict, n2: Dict
+                        ) -> Iterator[Tuple[Any, Any, Any, Any]]:
+    """Yields the pairs of keys and values of two dictionaries, by position, except
+    identical values under the same key, `MISSING` pads the shorter dictionary"""
+    for (k1, v1), (k2, v2) in zip_longest(n1.items(), n2.items(),
+                                          fillvalue=(MISSING, MISSING)):
+        if k1 is not MISSING and k1 == k2 and \
+                t1.fingerprint(v1).content == t2.fingerprint(v2).content:
+            continue
+        yield k1, v1, k2, v2
+
+
+def _value_difference(v1: Any, v2: Any, d1_id: Optional[Union[int, str]],
+                      d2_id: Optional[Union[int, str]]) -> Any:
+    if isinstance(v1, (list, tuple)) and isinstance(v2, (list, tuple)) and v1 == v2:
+        return v1
+    return {d1_id: v1, d2_id: v2}
+
+
+def _unlink(path: Optional[Tuple]) -> Tuple:
+    """Builds a path from its linked list of (path of the parent, key)"""
+    keys = []
+    while path is not None:
+        path, parent_key = path
+        keys.append(parent_key)
+    return tuple(reversed(keys))
+
+
+def _root(d: Union[Dict, MerkleTree, Message]) -> Union[Dict, Message]:
+    return d.root if isinstance(d, MerkleTree) else d
+
+
 def assign_dict_at(d: Dict, key_path: List[Union[str, int]], value: Any) -> Dict:
     """
     Assigns a value to a dictionary at a given key path.
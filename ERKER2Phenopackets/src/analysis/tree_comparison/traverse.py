@@ -1,5 +1,36 @@
 from collections import deque
-from typing import Dict, List
+from itertools import zip_longest
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from google.protobuf.message import Message
+
+from ERKER2Phenopackets.src.utils.io import message_fields
+
+LIST_LABEL = 'type: <list>'
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return 'MISSING'
+
+
+# marks a key or a list item that only one of two compared trees has
+MISSING = _Missing()
+
+
+class Mismatch(NamedTuple):
+    """First difference of two dictionaries found by `first_mismatch()`
+
+    :ivar path: Keys and list indices from the root to the node that differs, for
+        dictionaries with different keys the path of the dictionaries
+    :ivar value1: The node of the first dictionary, or its differing key, `MISSING`
+        if the first dictionary has no such key or list item
+    :ivar value2: The node of the second dictionary, or its differing key, `MISSING`
+        if the second dictionary has no such key or list item
+    """
+    path: Tuple
+    value1: Any
+    value2: Any
 
 
 def traverse(d: Dict, order: str = 'bfs', include_vals: bool = True) -> List:
@@ -15,58 +46,185 @@ def traverse(d: Dict, order: str = 'bfs', include_vals: bool = True) -> List:
     :return: List of keys and values in the order they were traversed
     :rtype: List
     """
+    return list(iter_traverse(d, order, include_vals))
+
+
+def iter_traverse(d: Union[Dict, Message], order: str = 'bfs',
+                  include_vals: bool = True) -> Iterator:
+    """Traverse a dictionary in a specific order, lazily.
+
+    Yields the same keys and values as `traverse()` without building the list, so
+    a consumer that stops early never visits the rest of the dictionary. Nested
+    protobuf messages are converted when they are visited, see `message_fields()`.
+
+    :param d: Dictionary or protobuf message to traverse
+    :type d: Union[Dict, Message]
+    :param order: Order to traverse the dictionary in either 'bfs' or 'dfs', defaults to
+    'bfs'
+    :type order: str, optional
+    :param include_vals: Whether to include values in the traversal, defaults to True
+    :type include_vals: bool, optional
+    :return: Iterator over the keys and values in the order they are traversed
+    :rtype: Iterator
+    """
     if order == 'bfs':
-        return bfs(d, include_vals)
+        return iter_bfs(d, include_vals)
     elif order == 'dfs':
-        return dfs(d, include_vals)
+        return iter_dfs(d, include_vals)
     else:
         raise ValueError(f'Order {order} not supported')
 
 
 def bfs(d: Dict, include_vals: bool = True) -> List:
-    traversal = []
-
-    queue = deque()
-    queue.append(d)
+    return list(iter_bfs(d, include_vals))
 
-    while queue:
-        node = queue.popleft()
-
-        if isinstance(node, dict):
-            for key, value in zip(node.keys(), node.values()):
-                traversal.append(key)
-                queue.append(value)
-        elif isinstance(node, list) or isinstance(node, tuple):
-            traversal.append('type: <list>')
-            for value in node:
-                queue.append(value)
-        elif include_vals:
-            traversal.append(node)
 
-    return traversal
+def dfs(d: Dict, include_vals: bool = True) -> List:
+    return list(iter_dfs(d, include_vals))
 
 
-def dfs(d: Dict, include_vals: bool = True) -> List:
-    traversal = []
+def iter_bfs(d: Union[Dict, Message], include_vals: bool = True) -> Iterator:
+    # the queue holds an iterator over the children of every visited dictionary and
+    # list instead of the children themselves
+    queue = deque()
+    queue.append(iter((d,)))
 
-    stack = [d]
+    while queue:
+        for node in queue.popleft():
+            node = _expand(node)
+            if isinstance(node, dict):
+                yield from node.keys()
+                queue.append(iter(node.values()))
+            elif isinstance(node, (list, tuple)):
+                yield LIST_LABEL
+                queue.append(iter(node))
+            elif include_vals:
+                yield node
+
+
+def iter_dfs(d: Union[Dict, Message], include_vals: bool = True) -> Iterator:
+    # the stack holds an iterator over the remaining children of every dictionary and
+    # list on the current path, so it only grows with the depth
+    stack = [iter((d,))]
 
     while stack:
-        node = stack.pop()
-
-        if isinstance(node, dict):
-            for key, value in zip(reversed(list(node.keys())),
-                                  reversed(list(node.values()))):
-                stack.append(value)
-                traversal.append(key)
-        elif isinstance(node, list) or isinstance(node, tuple):
-            traversal.append('type: <list>')
-            for value in reversed(node):
-                stack.append(value)
+        node = _expand(next(stack[-1], MISSING))
+        if node is MISSING:
+            stack.pop()
+        elif isinstance(node, dict):
+            yield from reversed(node.keys())
+            stack.append(iter(node.values()))
+        elif isinstance(node, (list, tuple)):
+            yield LIST_LABEL
+            stack.append(iter(node))
         elif include_vals:
-            traversal.append(node)
+            yield node
+
+
+def first_mismatch(d1: Any, d2: Any, include_vals: bool = False
+                   ) -> Optional[Mismatch]:
+    """Walks two dictionaries in lockstep and returns their first difference.
+
+    The dictionaries are walked depth first and the walk stops at the first key, list
+    length, type or (with `include_vals`) value that differs. Only an iterator per
+    level of the current path is kept, so memory grows with the depth of the
+    dictionaries but not with their width, and nothing after the first difference is
+    visited.
+
+    Like `compare_structure()`, keys and their order must match and values are
+    compared by type and value. Without `include_vals` a value has the same
+    structure as an empty dictionary. Phenopackets and other protobuf messages are
+    walked as their dictionaries (see `phenopacket2dict()`), converting a nested
+    message only when it is reached.
+
+    Example:
+        >>> first_mismatch({'a': [1, {'b': 2}]}, {'a': [1, {'c': 2}]})
+        Mismatch(path=('a', 1), value1='b', value2='c')
+
+    :param d1: First dictionary or message
+    :type d1: Any
+    :param d2: Second dictionary or message
+    :type d2: Any
+    :param include_vals: Whether to compare the values, defaults to False
+    :type include_vals: bool, optional
+    :return: The first mismatch, None if the dictionaries match
+    :rtype: Optional[Mismatch]
+    """
+    # frames of (key or index, node of d1, node of d2, iterator over the keys or
+    # indices of their children) of the dictionaries and lists on the current path
+    stack = [(None, {None: d1}, {None: d2}, iter((None,)))]
 
-    return traversal
+    while stack:
+        _, parent1, parent2, children = stack[-1]
+        key = next(children, MISSING)
+        if key is MISSING:
+            stack.pop()
+            continue
+        n1, n2 = _expand(_child(parent1, key)), _expand(_child(parent2, key))
+
+        if n1 is MISSING or n2 is MISSING:
+            return Mismatch(_path(stack, key), n1, n2)
+        if isinstance(n1, dict) and isinstance(n2, dict):
+            mismatch = _first_key_mismatch(n1, n2)
+            if mismatch is not None:
+                return Mismatch(_path(stack, key), *mismatch)
+            if n1:
+                stack.append((key, n1, n2, iter(n1)))
+        elif isinstance(n1, (list, tuple)) and isinstance(n2, (list, tuple)):
+            if n1 or n2:
+                stack.append((key, n1, n2, iter(range(max(len(n1), len(n2))))))
+        elif not _same_node(n1, n2, include_vals):
+            return Mismatch(_path(stack, key), n1, n2)
+
+    return None
+
+
+def _expand(node: Any) -> Any:
+    """Converts the fields of a protobuf message when it is visited, so that
+    messages are walked without converting them completely"""
+    return message_fields(node) if isinstance(node, Message) else node
+
+
+def _child(node: Any, key: Any) -> Any:
+    """Returns the child of a dictionary or list, `MISSING` if a list is too short"""
+    if isinstance(node, dict):
+        return node[key]
+    return node[key] if key < len(node) else MISSING
+
+
+def _first_key_mismatch(n1: Dict, n2: Dict) -> Optional[Tuple[Any, Any]]:
+    """Returns the first pair of keys of two dictionaries that differs"""
+    for k1, k2 in zip_longest(n1.keys(), n2.keys(), fillvalue=MISSING):
+        if not _same_value(k1, k2):
+            return k1, k2
+    return None
+
+
+def _same_node(n1: Any, n2: Any, include_vals: bool) -> bool:
+    """Whether two nodes that are not both dictionaries or both lists match"""
+    if include_vals:
+        return _same_value(n1, n2)
+    if isinstance(n1, (list, tuple)) or isinstance(n2, (list, tuple)):
+        return False
+    # a value has the structure of an empty dictionary
+    if isinstance(n1, dict):
+        return not n1
+    if isinstance(n2, dict):
+        return not n2
+    return True
+
+
+def _same_value(v1: Any, v2: Any) -> bool:
+    """Compares by type and value, `True` differs from `1`"""
+    return type(v1) is type(v2) and v1 == v2
+
+
+def _path(stack: List[Tuple], key: Any) -> Tuple:
+    """Returns the path of a child of the node on top of the stack"""
+    # the frame of the root and the root itself have no key
+    if len(stack) == 1:
+        return ()
+    return tuple(frame[0] for frame in stack[2:]) + (key,)
 
 
 if __name__ == '__main__':
@@ -1,5 +1,5 @@
-from .logging_ import setup_logging, LOG_LEVELS
+from .logging_ import setup_logging, LOG_LEVELS, trace_enabled, set_trace_enabled
 
 __all__ = [
-    "LOG_LEVELS", "setup_logging",
+    "LOG_LEVELS", "setup_logging", "trace_enabled", "set_trace_enabled",
 ]
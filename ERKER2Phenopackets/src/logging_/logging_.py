@@ -1,36 +1,67 @@
 from loguru import logger
 
-from pathlib import Path
 from datetime import datetime
-import configparser
+
+from ERKER2Phenopackets.src.settings import load_settings
 
 LOG_LEVELS = ['TRACE', 'DEBUG', 'INFO', 'SUCCESS', 'WARNING', 'ERROR', 'CRITICAL']
 
+# the default sink of loguru logs from DEBUG, so trace messages are dropped anyway
+_trace_enabled = False
+
+
+def trace_enabled() -> bool:
+    """Whether trace messages are logged by any sink
+
+    Hot paths guard their `logger.trace()` calls with this check, so the messages are
+    not even formatted if no sink logs them:
+
+        if trace_enabled():
+            logger.trace(f'Created phenopacket {phenopacket}')
+
+    The flag is set by `setup_logging()`. Call `set_trace_enabled()` after adding a
+    TRACE sink to loguru directly.
+
+    :return: True if trace messages are logged
+    :rtype: bool
+    """
+    return _trace_enabled
 
-def setup_logging(level='DEBUG'):
-    """Setup logging_ for the project."""
+
+def set_trace_enabled(enabled: bool) -> None:
+    """Enables or disables the trace messages guarded by `trace_enabled()`
+
+    :param enabled: Whether trace messages are logged
+    :type enabled: bool
+    """
+    global _trace_enabled
+    _trace_enabled = enabled
+
+
+def setup_logging(level='DEBUG', file_level=None):
+    """Setup logging_ for the project.
+
+    :param level: Level of the console sink, defaults to 'DEBUG'
+    :type level: str, optional
+    :param file_level: Level of the log file, defaults to 'TRACE' if `level` is
+        'TRACE' and to 'DEBUG' otherwise
+    :type file_level: str, optional
+    """
     logger.remove()  # Remove default logger (stdout)    
+    if file_level is None:
+        # the file keeps the debug messages, only trace messages are expensive to
+        # format, see `trace_enabled()`
+        file_level = 'TRACE' if level == 'TRACE' else 'DEBUG'
+    set_trace_enabled('TRACE' in (level, file_level))
 
     cur_time = datetime.now().strftime("%Y%m%d-%H%M")  # get curtime for unique dir name
 
-    config = configparser.ConfigParser()
-
-    try:
-        config.read('../../data/config/config.cfg')
-        log_file = Path(config.get('Paths', 'log_path')) / cur_time / 'pipeline.log'
-    except Exception as e1:
-        try:
-            config.read('ERKER2Phenopackets/data/config/config.cfg')
-            log_dir_path = Path(config.get('Paths', 'log_path_script'))
-            log_file = log_dir_path / cur_time / 'pipeline.log'
-        except Exception as e2:
-            print(f"Could not find config file. \n {e1} \n {e2}")
-            exit()
+    log_file = load_settings().paths.log_path / cur_time / 'pipeline.log'
 
     print(f"Logging to {log_file.resolve()}")
 
     # Log to a file     
-    logger.add(log_file, level='TRACE')
+    logger.add(log_file, level=file_level)
 
     # You can customize the log format as needed    
     logger_format = (
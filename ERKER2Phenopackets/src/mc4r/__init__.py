@@ -1,7 +1,8 @@
 from .mapping_dicts import sex_map_erker2phenopackets, zygosity_map_erker2phenopackets,\
     phenotype_status_map_erker2phenopackets
 from .parse_mc4r import parse_year_of_birth, parse_sex, parse_zygosity, parse_omim
-from .map_mc4r import map_mc4r2phenopackets, map_chunk
+from .map_mc4r import map_mc4r2phenopackets, map_mc4r2serialized_phenopackets, \
+    map_chunk
 
 __all__ = [
     'sex_map_erker2phenopackets', 'zygosity_map_erker2phenopackets',
@@ -9,5 +10,5 @@ __all__ = [
 
     'parse_year_of_birth', 'parse_sex', 'parse_zygosity', 'parse_omim',
 
-    'map_mc4r2phenopackets', 'map_chunk',
+    'map_mc4r2phenopackets', 'map_mc4r2serialized_phenopackets', 'map_chunk',
 ]
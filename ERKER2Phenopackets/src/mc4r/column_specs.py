@@ -0,0 +1,111 @@
+from typing import List
+
+from ERKER2Phenopackets.src.settings import Settings
+from ERKER2Phenopackets.src.utils import raise_on_invalid_date_strings
+from ERKER2Phenopackets.src.utils.polars_utils import ColumnSpec
+from ERKER2Phenopackets.src.mc4r.mapping_dicts import \
+    sex_map_erker2phenopackets, zygosity_map_erker2phenopackets, \
+    allele_label_map_erker2phenopackets, phenotype_label_map_erker2phenopackets, \
+    phenotype_status_map_erker2phenopackets
+from ERKER2Phenopackets.src.mc4r.parse_mc4r import parse_year_of_birth_expr, \
+    parse_date_of_diagnosis_expr, parse_phenotyping_date_expr, parse_omim_expr, \
+    raise_on_invalid_years_of_birth, collect_invalid_omims, raise_on_invalid_omims
+
+
+def _check_years_of_birth(df, year_of_birth_col, _):
+    """Check of the year of birth spec, see `raise_on_invalid_years_of_birth`"""
+    raise_on_invalid_years_of_birth(df, year_of_birth_col)
+
+
+def _check_omims(df, omim_col, parsed_col):
+    """Check of the OMIM specs, see `raise_on_invalid_omims`"""
+    raise_on_invalid_omims(collect_invalid_omims(df, {omim_col: parsed_col}))
+
+
+def mc4r_column_specs(settings: Settings) -> List[ColumnSpec]:
+    """Returns the column specs parsing a DataFrame in erker format (mc4r) for the
+    phenopacket creation, see `polars_utils.apply_column_specs`
+
+    The order of the specs is the order in which invalid values are reported.
+
+    :param settings: The settings, see `load_settings()`
+    :type settings: Settings
+    :return: The column specs
+    :rtype: List[ColumnSpec]
+    """
+    no_mutation = settings.no_value.mutation
+    no_phenotype = settings.no_value.phenotype
+    no_date = settings.no_value.date
+    no_omim = settings.no_value.omim
+
+    specs = [
+        # sct_184099003_y (year of birth)
+        ColumnSpec('sct_184099003_y', 'parsed_year_of_birth',
+                   mapping=parse_year_of_birth_expr, check=_check_years_of_birth),
+        # sct_281053000 (sex)
+        ColumnSpec('sct_281053000', 'parsed_sex',
+                   mapping=sex_map_erker2phenopackets),
+        # sct_432213005 (date of diagnosis)
+        ColumnSpec('sct_432213005', 'parsed_date_of_diagnosis',
+                   mapping=parse_date_of_diagnosis_expr, fill_value=no_date,
+                   check=raise_on_invalid_date_strings),
+    ]
+
+    # ln_48007_9_1, ln_48007_9_2, ln_48007_9_3 (zygosity)
+    for i in range(1, 4):
+        specs += [
+            ColumnSpec(f'ln_48007_9_{i}', f'parsed_zygosity_{i}',
+                       mapping=zygosity_map_erker2phenopackets, optional=i == 3),
+            ColumnSpec(f'ln_48007_9_{i}', f'allele_label_{i}',
+                       mapping=allele_label_map_erker2phenopackets, optional=i == 3),
+        ]
+
+    # sct_439401001_orpha (diagnosis (ORPHA)) does not require parsing
+
+    # sct_439401001_omim_g_1, sct_439401001_omim_g_2 (Primärdiagnose OMIM)
+    specs += [
+        ColumnSpec(f'sct_439401001_omim_g_{i}', f'parsed_omim_{i}',
+                   mapping=lambda col: parse_omim_expr(col, no_omim),
+                   check=_check_omims)
+        for i in range(1, 3)
+    ]
+
+    # ln_48005_3_1, ln_48005_3_2, ln_48005_3_3 (mutation p.HGVS)
+    # ln_48004_6_1, ln_48004_6_2, ln_48004_6_3 (mutation c.HGVS)
+    specs += [
+        ColumnSpec(f'{col}_{i}', fill_value=no_mutation, optional=i == 3)
+        for col in ('ln_48005_3', 'ln_48004_6') for i in range(1, 4)
+    ]
+
+    # ln_48018_6_1 (gene HGNC) does not require parsing
+
+    # sct_8116006_1, ..., sct_8116006_5 (phenotype classification)
+    specs += [
+        ColumnSpec(f'sct_8116006_{i}', fill_value=no_phenotype)
+        for i in range(1, 6)
+    ]
+
+    # sct_8116006_1_date, ..., sct_8116006_5_date (dates of phenotype determination)
+    specs += [
+        ColumnSpec(f'sct_8116006_{i}_date', f'parsed_date_of_phenotyping{i}',
+                   mapping=parse_phenotyping_date_expr, fill_value=no_date,
+                   optional=i > 2, check=raise_on_invalid_date_strings)
+        for i in range(1, 6)
+    ]
+
+    # sct_8116006_1_status, ..., sct_8116006_5_status (status of phenotype
+    # determination)
+    specs += [
+        ColumnSpec(f'sct_8116006_{i}_status', f'parsed_phenotype_status{i}',
+                   mapping=phenotype_status_map_erker2phenopackets)
+        for i in range(1, 6)
+    ]
+
+    # sct_8116006_1, ..., sct_8116006_5 (phenotypic feature)
+    specs += [
+        ColumnSpec(f'sct_8116006_{i}', f'parsed_phenotype_label{i}',
+                   mapping=phenotype_label_map_erker2phenopackets, optional=i == 5)
+        for i in range(1, 6)
+    ]
+
+    return specs
@@ -1,9 +1,10 @@
-import configparser
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Optional, Union
 import threading
 import uuid
+from functools import lru_cache
 
 import phenopackets
 import polars as pl
@@ -19,15 +20,45 @@ from loguru import logger
 
 from ERKER2Phenopackets.src.utils import calc_chunk_size, split_dataframe, \
     parse_date_string_to_protobuf_timestamp
+from ERKER2Phenopackets.src.utils import dataframe2ipc_bytes, ipc_bytes2dataframe
+from ERKER2Phenopackets.src.utils import EXECUTORS, init_worker_process
 from ERKER2Phenopackets.src.utils import parse_iso8601_utc_to_protobuf_timestamp
+from ERKER2Phenopackets.src.logging_ import trace_enabled
+from ERKER2Phenopackets.src.settings import Settings, load_settings
 
 uuid_gen = uuid.uuid4()
 
+# columns of the parsed mc4r DataFrame that are combined into lists per phenopacket,
+# the columns of the third variant and the fifth phenotype are optional
+HPO_COLS = ['sct_8116006_1', 'sct_8116006_2', 'sct_8116006_3', 'sct_8116006_4',
+            'sct_8116006_5']
+ONSET_COLS = ['parsed_date_of_phenotyping1', 'parsed_date_of_phenotyping2',
+              'parsed_date_of_phenotyping3', 'parsed_date_of_phenotyping4',
+              'parsed_date_of_phenotyping5']
+LABEL_COLS = ['parsed_phenotype_label1', 'parsed_phenotype_label2',
+              'parsed_phenotype_label3', 'parsed_phenotype_label4',
+              'parsed_phenotype_label5']
+STATUS_COLS = ['parsed_phenotype_status1', 'parsed_phenotype_status2',
+               'parsed_phenotype_status3', 'parsed_phenotype_status4',
+               'parsed_phenotype_status5']
+P_HGVS_COLS = ['ln_48005_3_1', 'ln_48005_3_2', 'ln_48005_3_3']
+C_HGVS_COLS = ['ln_48004_6_1', 'ln_48004_6_2', 'ln_48004_6_3']
+ZYGOSITY_COLS = ['parsed_zygosity_1', 'parsed_zygosity_2', 'parsed_zygosity_3']
+ALLELE_LABEL_COLS = ['allele_label_1', 'allele_label_2', 'allele_label_3']
+MAPPED_COLS = {'mc4r_id', 'parsed_year_of_birth', 'parsed_sex', 'sct_439401001_orpha',
+               *HPO_COLS, *ONSET_COLS, *LABEL_COLS, *STATUS_COLS,
+               *P_HGVS_COLS, *C_HGVS_COLS, *ZYGOSITY_COLS, *ALLELE_LABEL_COLS}
+
+# shared by all phenopackets, protobuf copies it on assignment, so it is never mutated
+TAXONOMY_TEMPLATE = OntologyClass(id='NCBITaxon:9606', label='Homo sapiens')
+
 
 def map_mc4r2phenopackets(
         df: pl.DataFrame,
         cur_time: str,
         num_threads: int = os.cpu_count(),
+        executor: str = 'thread',
+        settings: Optional[Settings] = None,
 ) -> List[Phenopacket]:
     """Maps mc4r DataFrame to List of Phenopackets.
 
@@ -35,19 +66,46 @@ def map_mc4r2phenopackets(
     represents a single Phenopacket. The Phenopacket.id is the index of the row.
     Uses parallel processing to speed up the mapping.
 
+    The mapping itself is pure Python and therefore bound by the GIL. With
+    `executor='thread'` all chunks share one core, with `executor='process'` the
+    chunks are mapped in worker processes (see
+    `map_mc4r2serialized_phenopackets()`) and parsed back into Phenopackets.
+
     :param df: mc4r DataFrame
     :type df: pl.DataFrame
     :param cur_time: string representation of the current time ("YYYY-MM-DD")
     :type cur_time: str
-    :param num_threads: Maximum number of threads to use, defaults to the number of CPUs
+    :param num_threads: Maximum number of threads or processes to use, defaults to the
+        number of CPUs
     :type num_threads: int, optional
+    :param executor: Either 'thread' or 'process', defaults to 'thread'
+    :type executor: str, optional
+    :param settings: The settings, defaults to `load_settings()`
+    :type settings: Optional[Settings], optional
     :return: List of Phenopackets
     :rtype: List[Phenopacket]
+    :raises ValueError: If executor is not 'thread' or 'process'
     """
-    logger.trace('Called map_mc4r2phenopackets() with the following parameters:'
-                 f'\n\tdf: {df.head(5)}'
-                 f'\n\tcur_time: {cur_time}'
-                 f'\n\tnum_threads: {num_threads}')
+    if trace_enabled():
+        logger.trace('Called map_mc4r2phenopackets() with the following parameters:'
+                     f'\n\tdf: {df.head(5)}'
+                     f'\n\tcur_time: {cur_time}'
+                     f'\n\tnum_threads: {num_threads}'
+                     f'\n\texecutor: {executor}')
+
+    if executor not in EXECUTORS:
+        logger.error(f'Executor {executor} not supported, use one of {EXECUTORS}')
+        raise ValueError(f'Executor {executor} not supported, use one of {EXECUTORS}')
+    if settings is None:
+        settings = load_settings()
+
+    if executor == 'process':
+        serialized_phenopackets = map_mc4r2serialized_phenopackets(
+            df=df, cur_time=cur_time, num_processes=num_threads, settings=settings
+        )
+        logger.trace('Parsing serialized phenopackets returned by worker processes')
+        return [Phenopacket.FromString(serialized_phenopacket)
+                for serialized_phenopacket in serialized_phenopackets]
 
     # divide the DataFrame into chunks
     logger.trace(f'Calculating chunk sizes to split the DataFrame into {num_threads} '
@@ -63,7 +121,9 @@ def map_mc4r2phenopackets(
     with ThreadPoolExecutor(max_workers=num_threads) as executor:
         collected_results = list(executor.map(
             map_chunk,  # function to execute
-            chunks, [cur_time] * len(chunks))  # arguments to pass to function
+            # arguments to pass to function
+            chunks, [cur_time] * len(chunks), [True] * len(chunks),
+            [settings] * len(chunks))
         )
     logger.trace('Finished mapping the chunks to Phenopackets')
 
@@ -75,7 +135,153 @@ def map_mc4r2phenopackets(
     return results
 
 
-def map_chunk(chunk: pl.DataFrame, cur_time: str) -> List[Phenopacket]:
+def map_mc4r2serialized_phenopackets(
+        df: pl.DataFrame,
+        cur_time: str,
+        num_processes: int = os.cpu_count(),
+        settings: Optional[Settings] = None,
+) -> List[bytes]:
+    """Maps mc4r DataFrame to a list of serialized Phenopackets using processes.
+
+    The DataFrame is split into one chunk per process. Every chunk is shipped to its
+    worker as Arrow IPC bytes and each worker returns its Phenopackets in the protobuf
+    wire format (`Phenopacket.SerializeToString()`), so neither rows nor messages
+    have to be pickled. Use `Phenopacket.FromString()` to parse the results.
+
+    The workers are started with the `spawn` method, because forking a process after
+    polars has started its thread pool can deadlock.
+
+    :param df: mc4r DataFrame
+    :type df: pl.DataFrame
+    :param cur_time: string representation of the current time ("YYYY-MM-DD")
+    :type cur_time: str
+    :param num_processes: Maximum number of processes to use, defaults to the number
+        of CPUs
+    :type num_processes: int, optional
+    :param settings: The settings, sent to the workers, defaults to `load_settings()`
+    :type settings: Optional[Settings], optional
+    :return: List of serialized Phenopackets
+    :rtype: List[bytes]
+    """
+    if trace_enabled():
+        logger.trace('Called map_mc4r2serialized_phenopackets() with the following '
+                     f'parameters:'
+                     f'\n\tdf: {df.head(5)}'
+                     f'\n\tcur_time: {cur_time}'
+                     f'\n\tnum_processes: {num_processes}')
+
+    if settings is None:
+        settings = load_settings()
+    chunk_sizes = calc_chunk_size(num_chunks=num_processes, num_instances=df.height)
+    logger.trace(f'Resulting chunk sizes by splitting {df.height} elements into '
+                 f'{num_processes} chunks: {chunk_sizes}')
+    chunks = [dataframe2ipc_bytes(chunk)
+              for chunk in split_dataframe(df=df, chunk_sizes=chunk_sizes)]
+    logger.trace(f'Serialized {len(chunks)} chunks to Arrow IPC')
+
+    # built once in the parent, the workers only append the bytes to each phenopacket
+    meta_data_field = serialized_meta_data_field(cur_time, settings)
+
+    logger.trace(f'Creating {num_processes} processes to map the chunks to '
+                 'Phenopackets')
+    with ProcessPoolExecutor(
+            max_workers=num_processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker_process,
+    ) as executor:
+        collected_results = list(executor.map(
+            _map_serialized_chunk,  # function to execute
+            # arguments to pass to function
+            chunks, [cur_time] * len(chunks), [meta_data_field] * len(chunks),
+            [settings] * len(chunks))
+        )
+    logger.trace('Finished mapping the chunks to serialized Phenopackets')
+
+    results = [result for result_list in collected_results for result in result_list]
+    logger.trace('Finished map_mc4r2serialized_phenopackets()')
+    return results
+
+
+def _map_serialized_chunk(chunk_ipc: bytes, cur_time: str, meta_data_field: bytes,
+                          settings: Settings) -> List[bytes]:
+    """Maps a chunk in Arrow IPC format to a list of serialized Phenopackets
+
+    Executed in the worker processes of `map_mc4r2serialized_phenopackets()`. The
+    Phenopackets are mapped without metadata and the serialized metadata field is
+    appended to each of them, `meta_data` has the highest field number of
+    Phenopacket, so the result equals serializing the complete Phenopacket.
+
+    :param chunk_ipc: Chunk of the mc4r DataFrame as Arrow IPC bytes
+    :type chunk_ipc: bytes
+    :param cur_time: string representation of the current time ("YYYY-MM-DD")
+    :type cur_time: str
+    :param meta_data_field: Serialized metadata field, see
+        `serialized_meta_data_field()`
+    :type meta_data_field: bytes
+    :param settings: The settings
+    :type settings: Settings
+    :return: List of serialized Phenopackets
+    :rtype: List[bytes]
+    """
+    chunk = ipc_bytes2dataframe(chunk_ipc)
+    return [phenopacket.SerializeToString() + meta_data_field
+            for phenopacket in map_chunk(chunk, cur_time, with_meta_data=False,
+                                         settings=settings)]
+
+
+@lru_cache(maxsize=8)
+def meta_data_template(cur_time: str,
+                       settings: Optional[Settings] = None) -> MetaData:
+    """Returns the metadata block shared by all Phenopackets created at `cur_time`
+
+    The block is built once per process, `cur_time` and settings. It must not be
+    modified, assign it to a Phenopacket or copy it with `CopyFrom()` instead.
+
+    :param cur_time: string representation of the current time ("YYYY-MM-DD")
+    :type cur_time: str
+    :param settings: The settings, defaults to `load_settings()`
+    :type settings: Optional[Settings], optional
+    :return: Metadata block
+    :rtype: MetaData
+    """
+    if settings is None:
+        settings = load_settings()
+    resources = settings.resources
+    created = parse_date_string_to_protobuf_timestamp(cur_time)
+    return _create_metadata(
+        created_by=settings.constants.creator_tag,
+        created=created,
+        names=list(resources.formal_names),
+        namespace_prefixes=list(resources.namespace_prefixes),
+        urls=list(resources.urls),
+        versions=list(resources.versions),
+        iri_prefixes=list(resources.iri_prefixes),
+    )
+
+
+@lru_cache(maxsize=8)
+def serialized_meta_data_field(cur_time: str,
+                               settings: Optional[Settings] = None) -> bytes:
+    """Returns the `meta_data` field of a Phenopacket in the protobuf wire format
+
+    The bytes contain the field tag and the serialized `meta_data_template()`. They
+    can be merged into a Phenopacket with `MergeFromString()` or appended to a
+    serialized Phenopacket without metadata.
+
+    :param cur_time: string representation of the current time ("YYYY-MM-DD")
+    :type cur_time: str
+    :param settings: The settings, defaults to `load_settings()`
+    :type settings: Optional[Settings], optional
+    :return: Serialized metadata field
+    :rtype: bytes
+    """
+    return Phenopacket(
+        meta_data=meta_data_template(cur_time, settings)
+    ).SerializeToString()
+
+
+def map_chunk(chunk: pl.DataFrame, cur_time: str, with_meta_data: bool = True,
+              settings: Optional[Settings] = None) -> List[Phenopacket]:
     """Maps a chunk of the mc4r DataFrame to a list of Phenopackets.
 
     Can be used as a sequential alternative to `map_mc4r2phenopackets()` for
@@ -85,154 +291,142 @@ def map_chunk(chunk: pl.DataFrame, cur_time: str) -> List[Phenopacket]:
     :type chunk: pl.DataFrame
     :param cur_time: string representation of the current time ("YYYY-MM-DD")
     :type cur_time: str
+    :param with_meta_data: Whether to add the metadata block, defaults to True
+    :type with_meta_data: bool, optional
+    :param settings: The settings, defaults to `load_settings()`
+    :type settings: Optional[Settings], optional
     :return: List of Phenopackets
     :rtype: List[Phenopacket]
     """
     thread_id = threading.get_ident()
     logger.info(f'Currently working on thread {thread_id}')
-    logger.trace(f'{thread_id}: Called _map_chunk() with the following parameters:'
-                 f'\n\tchunk: {chunk.head(5)}'
-                 f'\n\tcur_time: {cur_time}')
-
-    # metadata creation
-    config = configparser.ConfigParser()
-
-    logger.debug(f'{thread_id}: CWD: {os.getcwd()}')
-    logger.trace(f'{thread_id}: Trying to read config file from default location')
-    try:
-        config.read('../../data/config/config.cfg')
-        no_mutation, no_phenotype, no_date, no_omim, not_recorded, created_by = \
-            _get_constants_from_config(config)
-        logger.trace(f'{thread_id}: Successfully read config file from default '
-                     'location')
-    except Exception as e1:
-        logger.trace(f'{thread_id}: Could not find config file in default location.'
-                     f' {e1}')
-        try:
-            logger.trace(f'{thread_id}: Trying to read config file from alternative '
-                         'location')
-            config.read('ERKER2Phenopackets/data/config/config.cfg')
-            no_mutation, no_phenotype, no_date, no_omim, not_recorded, created_by = \
-                _get_constants_from_config(config)
-            logger.trace(f'{thread_id}: Successfully read config file from alternative '
-                         'location')
-        except Exception as e2:
-            logger.error(f'{thread_id}: Could not find config file. {e1} {e2}')
-            exit()
-
-    logger.trace(f'{thread_id}: Creating metadata block')
-    created = parse_date_string_to_protobuf_timestamp(cur_time)
-    meta_data = _create_metadata(
-        created_by=created_by,
-        created=created,
-        names=config.get('Resources', 'formal_names').split(','),
-        namespace_prefixes=config.get('Resources', 'namespace_prefixes').split(','),
-        urls=config.get('Resources', 'urls').split(','),
-        versions=config.get('Resources', 'versions').split(','),
-        iri_prefixes=config.get('Resources', 'iri_prefixes').split(','),
-    )
-    logger.trace(f'{thread_id}: Successfully created metadata block \n {meta_data}')
-
-    logger.trace(f'{thread_id}: Creating taxonomy block')
-    taxonomy = OntologyClass(id='NCBITaxon:9606', label='Homo sapiens')
-    logger.trace(f'{thread_id}:Successfully created taxonomy block {taxonomy}')
+    trace = trace_enabled()  # checked once, the loop below runs for every row
+    if trace:
+        logger.trace(f'{thread_id}: Called _map_chunk() with the following parameters:'
+                     f'\n\tchunk: {chunk.head(5)}'
+                     f'\n\tcur_time: {cur_time}')
+
+    if settings is None:
+        settings = load_settings()
+    meta_data = meta_data_template(cur_time, settings)
+    if trace:
+        logger.trace(f'{thread_id}: Using metadata block \n {meta_data}')
+
+    # resolving the constants and the columns present in the chunk once per chunk
+    no_mutation = settings.no_value.mutation
+    no_phenotype = settings.no_value.phenotype
+    no_date = settings.no_value.date
+    not_recorded = settings.no_value.recorded
+    disease_label = settings.constants.disease_label
+    variant_descriptor_ids = list(settings.constants.variant_descriptor_ids)
+    interpretation_status = settings.constants.interpretation_status
+    progress_status = settings.constants.progress_status
+
+    columns = {col: chunk.get_column(col).to_list() for col in chunk.columns
+               if col in MAPPED_COLS}
+
+    def present(cols: List[str]) -> List[List]:
+        return [columns[col] for col in cols if col in columns]
+
+    hpos, onsets, labels, status = present(HPO_COLS), present(ONSET_COLS), \
+        present(LABEL_COLS), present(STATUS_COLS)
+    p_hgvs, c_hgvs, zygosities, allele_labels = present(P_HGVS_COLS), \
+        present(C_HGVS_COLS), present(ZYGOSITY_COLS), present(ALLELE_LABEL_COLS)
+    phenopacket_ids = columns['mc4r_id']
+    years_of_birth = columns['parsed_year_of_birth']
+    sexes = columns['parsed_sex']
+    orphas = columns['sct_439401001_orpha']
 
     phenopackets_list = []
-    logger.trace(f'{thread_id}: Starting loop to build phenopacket for each patient.')
-    for i, row in enumerate(chunk.rows(named=True)):
-        logger.trace(f'{thread_id}: Iteration {i + 1}/{chunk.height}')
-        logger.trace(f'{thread_id}: Mapping row: {row}')
-        phenopacket_id = row['mc4r_id']
-
-        logger.trace(f'{thread_id}: Creating individual block')
+    if trace:
+        logger.trace(f'{thread_id}: Starting loop to build phenopacket for each '
+                     'patient.')
+    for i in range(chunk.height):
+        if trace:
+            logger.trace(f'{thread_id}: Iteration {i + 1}/{chunk.height}')
+        phenopacket_id = phenopacket_ids[i]
+
+        if trace:
+            logger.trace(f'{thread_id}: Creating individual block')
         individual = _map_individual(
             phenopacket_id=phenopacket_id,
-            year_of_birth=row['parsed_year_of_birth'],
-            sex=row['parsed_sex'],
-            taxonomy=taxonomy
+            year_of_birth=years_of_birth[i],
+            sex=sexes[i],
+            taxonomy=TAXONOMY_TEMPLATE
         )
-        logger.trace(f'{thread_id}: Created individual block {individual}')
+        if trace:
+            logger.trace(f'{thread_id}: Created individual block {individual}')
 
         # PHENOTYPIC FEATURES
-        logger.trace(f'{thread_id}: Creating phenotypic features block')
-        hpo_cols = ['sct_8116006_1', 'sct_8116006_2',
-                    'sct_8116006_3', 'sct_8116006_4',
-                    'sct_8116006_5']
-        onset_cols = ['parsed_date_of_phenotyping1', 'parsed_date_of_phenotyping2',
-                      'parsed_date_of_phenotyping3', 'parsed_date_of_phenotyping4',
-                      'parsed_date_of_phenotyping5']
-        label_cols = ['parsed_phenotype_label1', 'parsed_phenotype_label2',
-                      'parsed_phenotype_label3', 'parsed_phenotype_label4',
-                      'parsed_phenotype_label5']
-        status_cols = ['parsed_phenotype_status1', 'parsed_phenotype_status2',
-                       'parsed_phenotype_status3', 'parsed_phenotype_status4',
-                       'parsed_phenotype_status5']
-
+        if trace:
+            logger.trace(f'{thread_id}: Creating phenotypic features block')
         phenotypic_features = _map_phenotypic_features(
-            # only including cols if they are in the keyset of the row
-            hpos=[row[hpo_col] for hpo_col in hpo_cols if hpo_col in row],
-            onsets=[row[onset_col] for onset_col in onset_cols if onset_col in row],
-            labels=[row[label_col] for label_col in label_cols if label_col in row],
-            status=[row[status_col] for status_col in status_cols if status_col in row],
+            hpos=[col[i] for col in hpos],
+            onsets=[col[i] for col in onsets],
+            labels=[col[i] for col in labels],
+            status=[col[i] for col in status],
             no_phenotype=no_phenotype,
             no_date=no_date,
             not_recorded=not_recorded,
         )
-        logger.trace(f'{thread_id}: Successfully created phenotypic features block '
-                     f'{phenotypic_features}')
+        if trace:
+            logger.trace(f'{thread_id}: Successfully created phenotypic features block '
+                         f'{phenotypic_features}')
 
         # DISEASE
-        logger.trace(f'{thread_id}: Creating disease block')
+        if trace:
+            logger.trace(f'{thread_id}: Creating disease block')
         disease = _map_disease_for_diagnosis(
-            orpha=row['sct_439401001_orpha'],
-            label=config.get('Constants', 'disease_label'),
+            orpha=orphas[i],
+            label=disease_label,
         )
-        logger.trace(f'{thread_id}: Successfully created disease for interpretation '
-                     f'block {disease}')
+        if trace:
+            logger.trace(f'{thread_id}: Successfully created disease for '
+                         f'interpretation block {disease}')
 
         # INTERPRETATION
-        logger.trace(f'{thread_id}: Creating interpretation block')
-        p_hgvs_cols = ['ln_48005_3_1', 'ln_48005_3_2', 'ln_48005_3_3']
-        c_hgvs_cols = ['ln_48004_6_1', 'ln_48004_6_2', 'ln_48004_6_3']
-        zygosity_cols = ['parsed_zygosity_1', 'parsed_zygosity_2','parsed_zygosity_3']
-        allele_label_cols = ['allele_label_1', 'allele_label_2', 'allele_label_3']
-        
+        if trace:
+            logger.trace(f'{thread_id}: Creating interpretation block')
         interpretation = _map_interpretation(
             phenopacket_id=phenopacket_id,
-            variant_descriptor_ids=
-            config.get('Constants', 'variant_descriptor_ids').split(','),
-            zygosities=[row[zygosity_col] for zygosity_col in zygosity_cols \
-                        if zygosity_col in row],
-            allele_labels=[row[allele_label_col] for allele_label_col \
-                           in allele_label_cols if allele_label_col in row],
+            variant_descriptor_ids=variant_descriptor_ids,
+            zygosities=[col[i] for col in zygosities],
+            allele_labels=[col[i] for col in allele_labels],
             # same mutation, p=protein, c=coding DNA reference sequence
-            p_hgvs=[row[p_hgvs_col] for p_hgvs_col in p_hgvs_cols if p_hgvs_col in row],
-            c_hgvs=[row[c_hgvs_col] for c_hgvs_col in c_hgvs_cols if c_hgvs_col in row],
+            p_hgvs=[col[i] for col in p_hgvs],
+            c_hgvs=[col[i] for col in c_hgvs],
             no_mutation=no_mutation,
-            interpretation_status=config.get('Constants', 'interpretation_status'),
-            progress_status=config.get('Constants', 'progress_status'),
+            interpretation_status=interpretation_status,
+            progress_status=progress_status,
             disease=disease,
         )
-        logger.trace(f'{thread_id}: Successfully created interpretation block '
-                     f'{interpretation}')
+        if trace:
+            logger.trace(f'{thread_id}: Successfully created interpretation block '
+                         f'{interpretation}')
 
         # Orchestrate the mapping
-        logger.trace(f'{thread_id}: Creating phenopacket')
+        if trace:
+            logger.trace(f'{thread_id}: Creating phenopacket')
         phenopacket = Phenopacket(
             id=phenopacket_id,
             subject=individual,
             phenotypic_features=phenotypic_features,
-            meta_data=meta_data,
             interpretations=[interpretation],
         )
-        logger.trace(f'{thread_id}: Successfully created phenopacket {phenopacket}')
+        if with_meta_data:
+            phenopacket.meta_data.CopyFrom(meta_data)
+        if trace:
+            logger.trace(f'{thread_id}: Successfully created phenopacket {phenopacket}')
 
         phenopackets_list.append(phenopacket)
 
-        logger.trace(f'{thread_id}: Appended phenopacket to list')
-        logger.trace(f'{thread_id}: Finished mapping row {i + 1}/{chunk.height}')
+        if trace:
+            logger.trace(f'{thread_id}: Appended phenopacket to list')
+            logger.trace(f'{thread_id}: Finished mapping row {i + 1}/{chunk.height}')
 
-    logger.trace(f'{thread_id}: Finished loop to build phenopacket for each patient.')
+    if trace:
+        logger.trace(f'{thread_id}: Finished loop to build phenopacket for each '
+                     'patient.')
     return phenopackets_list
 
 
@@ -322,11 +516,12 @@ def _map_individual(phenopacket_id: str,
     :return: Individual Phenopacket block
     :rtype: Individual
     """
-    logger.trace(f'Mapping individual with the following parameters:'
-                 f'\n\tphenopacket_id: {phenopacket_id}'
-                 f'\n\tyear_of_birth: {year_of_birth}'
-                 f'\n\tsex {sex}'
-                 f'\n\ttaxonomy: {taxonomy}')
+    if trace_enabled():
+        logger.trace(f'Mapping individual with the following parameters:'
+                     f'\n\tphenopacket_id: {phenopacket_id}'
+                     f'\n\tyear_of_birth: {year_of_birth}'
+                     f'\n\tsex {sex}'
+                     f'\n\ttaxonomy: {taxonomy}')
 
     year_of_birth_timestamp = parse_iso8601_utc_to_protobuf_timestamp(year_of_birth)
     individual = Individual(
@@ -361,12 +556,13 @@ def _map_phenotypic_feature(
     :type label: str, optional
     :return: Union[PhenotypicFeature, None]
     """
-    logger.trace(f'Mapping phenotypic feature with the following parameters:'
-                 f'\n\thpo: {hpo}'
-                 f'\n\tonset: {onset}'
-                 f'\n\tlabel: {label}'
-                 f'\n\tstatus: {status}'
-                 f'\n\tnot_recorded: {not_recorded}')
+    if trace_enabled():
+        logger.trace(f'Mapping phenotypic feature with the following parameters:'
+                     f'\n\thpo: {hpo}'
+                     f'\n\tonset: {onset}'
+                     f'\n\tlabel: {label}'
+                     f'\n\tstatus: {status}'
+                     f'\n\tnot_recorded: {not_recorded}')
 
     if label:
         phenotype = OntologyClass(
@@ -425,13 +621,14 @@ def _map_phenotypic_features(
     :rtype: List[PhenotypicFeature]
     :raises ValueError: If the length of hpos, onsets, labels and status is not equal
     """
-    logger.trace(f'Mapping phenotypic features with the following parameters:'
-                 f'\n\thpos: {hpos}'
-                 f'\n\tonsets: {onsets}'
-                 f'\n\tno_phenotype: {no_phenotype}'
-                 f'\n\tno_date: {no_date}'
-                 f'\n\tstatus: {status}'
-                 f'\n\tlabels: {labels}')
+    if trace_enabled():
+        logger.trace(f'Mapping phenotypic features with the following parameters:'
+                     f'\n\thpos: {hpos}'
+                     f'\n\tonsets: {onsets}'
+                     f'\n\tno_phenotype: {no_phenotype}'
+                     f'\n\tno_date: {no_date}'
+                     f'\n\tstatus: {status}'
+                     f'\n\tlabels: {labels}')
 
     if not (len(hpos) == len(onsets) == len(labels) == len(status)):
         logger.error('Length of hpos, onsets, labels and status must be equal.'
@@ -512,18 +709,19 @@ def _map_interpretation(phenopacket_id: str,
     :return: Interpretation block (containing variation description)
     :rtype: Interpretation
     """
-    logger.trace(f'Mapping interpretation with the following parameters:'
-                 f'\n\tphenopacket_id: {phenopacket_id}'
-                 f'\n\tvariant_descriptor_ids: {variant_descriptor_ids}'
-                 f'\n\tzygosities: {zygosities}'
-                 f'\n\tallele_labels: {allele_labels}'
-                 f'\n\tp_hgvs: {p_hgvs}'
-                 f'\n\tc_hgvs: {c_hgvs}'
-                 f'\n\tno_mutation: {no_mutation}'
-                 f'\n\tgene: {gene}'
-                 f'\n\tinterpretation_status: {interpretation_status}'
-                 f'\n\tprogress_status: {progress_status}'
-                 )
+    if trace_enabled():
+        logger.trace(f'Mapping interpretation with the following parameters:'
+                     f'\n\tphenopacket_id: {phenopacket_id}'
+                     f'\n\tvariant_descriptor_ids: {variant_descriptor_ids}'
+                     f'\n\tzygosities: {zygosities}'
+                     f'\n\tallele_labels: {allele_labels}'
+                     f'\n\tp_hgvs: {p_hgvs}'
+                     f'\n\tc_hgvs: {c_hgvs}'
+                     f'\n\tno_mutation: {no_mutation}'
+                     f'\n\tgene: {gene}'
+                     f'\n\tinterpretation_status: {interpretation_status}'
+                     f'\n\tprogress_status: {progress_status}'
+                     )
 
     # filter hgvs lists to avoid null vals
     p_hgvs = [p_hgvs[i] for i in range(len(p_hgvs)) if not p_hgvs[i] == no_mutation]
@@ -596,11 +794,12 @@ def _map_gene_descriptor(hgnc: str, symbol: str, omims: List[str], no_omim: str)
     :return: GeneDescriptor Phenopackets block
     :rtype: GeneDescriptor
     """
-    logger.trace(f'Mapping gene descriptor with the following parameters:'
-                 f'\n\thgnc: {hgnc}'
-                 f'\n\tsymbol: {symbol}'
-                 f'\n\tomims: {omims}'
-                 f'\n\tno_omim: {no_omim}')
+    if trace_enabled():
+        logger.trace(f'Mapping gene descriptor with the following parameters:'
+                     f'\n\thgnc: {hgnc}'
+                     f'\n\tsymbol: {symbol}'
+                     f'\n\tomims: {omims}'
+                     f'\n\tno_omim: {no_omim}')
 
     # filter out  null vals
     omims = [omim for omim in omims if not omim == no_omim]
@@ -635,10 +834,11 @@ def _map_disease_for_diagnosis(
     :type label: str
     :return: OntologyClass Phenopackets block of disease
     """
-    logger.trace(f'Mapping disease with the following parameters:'
-                 f'\n\torpha: {orpha}'
-                 f'\n\tlabel: {label}'
-                 )
+    if trace_enabled():
+        logger.trace(f'Mapping disease with the following parameters:'
+                     f'\n\torpha: {orpha}'
+                     f'\n\tlabel: {label}'
+                     )
 
     disease = OntologyClass(
         id=orpha,
@@ -669,12 +869,13 @@ def _map_disease_block(
     :type no_date: str
     :return: Disease Phenopackets block
     """
-    logger.trace(f'Mapping disease with the following parameters:'
-                 f'\n\torpha: {orpha}'
-                 f'\n\tdate_of_diagnosis: {date_of_diagnosis}'
-                 f'\n\tlabel: {label}'
-                 f'\n\tno_date: {no_date}'
-                 )
+    if trace_enabled():
+        logger.trace(f'Mapping disease with the following parameters:'
+                     f'\n\torpha: {orpha}'
+                     f'\n\tdate_of_diagnosis: {date_of_diagnosis}'
+                     f'\n\tlabel: {label}'
+                     f'\n\tno_date: {no_date}'
+                     )
 
     term = OntologyClass(
         id=orpha,
@@ -700,18 +901,3 @@ def _map_disease_block(
         )
 
     return disease
-
-
-def _get_constants_from_config(config):
-    logger.trace('Called _get_constants_from_config()')
-    no_mutation = config.get('NoValue', 'mutation')
-    no_phenotype = config.get('NoValue', 'phenotype')
-    no_date = config.get('NoValue', 'date')
-    no_omim = config.get('NoValue', 'omim')
-    not_recorded = config.get('NoValue', 'recorded')
-
-    created_by = config.get('Constants', 'creator_tag')
-
-    logger.trace('Successfully finished _get_constants_from_config()')
-
-    return no_mutation, no_phenotype, no_date, no_omim, not_recorded, created_by
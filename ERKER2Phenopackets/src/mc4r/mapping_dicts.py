@@ -1,21 +1,6 @@
-from loguru import logger
-import configparser
+from ERKER2Phenopackets.src.settings import load_settings
 
-config = configparser.ConfigParser()
-try:
-    config.read('../../data/config/config.cfg')
-    not_recorded = config.get('NoValue', 'recorded')
-    logger.trace('Successfully read config file from default location')
-except Exception as e1:
-    logger.trace(f'Could not find config file in default location. {e1}')
-    try:
-        logger.trace('Trying to read config file from alternative location')
-        config.read('ERKER2Phenopackets/data/config/config.cfg')
-        not_recorded = config.get('NoValue', 'recorded')
-        logger.trace('Successfully read config file from alternative location')
-    except Exception as e2:
-        logger.error(f'Could not find config file. {e1} {e2}')
-        exit()
+not_recorded = load_settings().no_value.recorded
 
 sex_map_erker2phenopackets = {
     'sct_248152002': 'FEMALE',
@@ -1,13 +1,22 @@
+import polars as pl
 from google.protobuf.timestamp_pb2 import Timestamp
 from . import sex_map_erker2phenopackets, zygosity_map_erker2phenopackets
 
 from loguru import logger
 
 import re
-import configparser
+from typing import Dict
 
 from ERKER2Phenopackets.src.utils import parse_year_month_day_to_iso8601_utc_timestamp
 from ERKER2Phenopackets.src.utils import parse_date_string_to_iso8601_utc_timestamp
+from ERKER2Phenopackets.src.utils import parse_year_to_iso8601_utc_timestamp_expr
+from ERKER2Phenopackets.src.utils import parse_date_string_to_iso8601_utc_timestamp_expr
+from ERKER2Phenopackets.src.logging_ import trace_enabled
+from ERKER2Phenopackets.src.settings import load_settings
+
+MIN_YEAR_OF_BIRTH = 1900
+MAX_YEAR_OF_BIRTH = 2023
+OMIM_PATTERN = r'^(\d{6}\.\d{4}|\d{6})'
 
 
 def parse_year_of_birth(year_of_birth: int) -> Timestamp:
@@ -35,22 +44,69 @@ def parse_year_of_birth(year_of_birth: int) -> Timestamp:
     :rtype: Timestamp
     :raises: ValueError: if year_of_birth is not within 1900 and 2023
     """
-    logger.trace(f'Parsing year of birth {year_of_birth}')
-    logger.trace('Checking if year of birth is within 1900 and 2023')
-    if year_of_birth < 1900 or year_of_birth > 2023:
+    if trace_enabled():
+        logger.trace(f'Parsing year of birth {year_of_birth}')
+        logger.trace('Checking if year of birth is within 1900 and 2023')
+    if year_of_birth < MIN_YEAR_OF_BIRTH or year_of_birth > MAX_YEAR_OF_BIRTH:
         logger.error('year_of_birth has to be within 1900 and 2023,'
                      f'but was {year_of_birth}')
         raise ValueError('year_of_birth has to be within 1900 and 2023,'
                          f'but was {year_of_birth}')
-    logger.trace('Passed check if year of birth is within 1900 and 2023')
+    if trace_enabled():
+        logger.trace('Passed check if year of birth is within 1900 and 2023')
     parsed_year_of_birth = parse_year_month_day_to_iso8601_utc_timestamp(
         year_of_birth, 1, 1
     )
-    logger.trace(f'Finished parsing year of birth {year_of_birth} -> '
-                 f'{parsed_year_of_birth}')
+    if trace_enabled():
+        logger.trace(f'Finished parsing year of birth {year_of_birth} -> '
+                     f'{parsed_year_of_birth}')
     return parsed_year_of_birth
 
 
+def parse_year_of_birth_expr(year_of_birth_col: str) -> pl.Expr:
+    """Vectorized version of `parse_year_of_birth`
+
+    Returns a polars expression parsing a column of years of birth to ISO8601 UTC
+    timestamps. Years outside of 1900 and 2023 evaluate to null, use
+    `raise_on_invalid_years_of_birth` to report them.
+
+    Example:
+    df.with_columns(parse_year_of_birth_expr('sct_184099003_y'))
+
+    :param year_of_birth_col: Name of the column with the years of birth
+    :type year_of_birth_col: str
+    :return: Expression evaluating to the years of birth as ISO8601 UTC timestamps
+    :rtype: pl.Expr
+    """
+    return pl.when(
+        pl.col(year_of_birth_col).is_between(MIN_YEAR_OF_BIRTH, MAX_YEAR_OF_BIRTH)
+    ).then(
+        parse_year_to_iso8601_utc_timestamp_expr(year_of_birth_col)
+    )
+
+
+def raise_on_invalid_years_of_birth(df: pl.DataFrame, year_of_birth_col: str):
+    """Raises the error of `parse_year_of_birth` for the first year of birth that is
+    not within 1900 and 2023
+
+    :param df: DataFrame containing the years of birth
+    :type df: pl.DataFrame
+    :param year_of_birth_col: Name of the column with the years of birth
+    :type year_of_birth_col: str
+    :raises: ValueError: if a year of birth is not within 1900 and 2023
+    """
+    invalid = df.select(year_of_birth_col).filter(
+        pl.col(year_of_birth_col).is_not_null()
+        & ~pl.col(year_of_birth_col).is_between(MIN_YEAR_OF_BIRTH, MAX_YEAR_OF_BIRTH)
+    )
+    if invalid.height:
+        year_of_birth = invalid[year_of_birth_col][0]
+        logger.error('year_of_birth has to be within 1900 and 2023,'
+                     f'but was {year_of_birth}')
+        raise ValueError('year_of_birth has to be within 1900 and 2023,'
+                         f'but was {year_of_birth}')
+
+
 def parse_date_of_diagnosis(date_of_diagnosis: str) -> Timestamp:
     """Parses a patient's date of diagnosis from ERKER to a Phenopackets Age block
 
@@ -75,15 +131,32 @@ def parse_date_of_diagnosis(date_of_diagnosis: str) -> Timestamp:
     :rtype: Timestamp
     :raises ValueError: If the date of diagnosis is not known
     """
-    logger.trace(f'Parsing date of diagnosis {date_of_diagnosis}')
+    if trace_enabled():
+        logger.trace(f'Parsing date of diagnosis {date_of_diagnosis}')
     parsed_date_of_diagnosis = parse_date_string_to_iso8601_utc_timestamp(
         date_of_diagnosis
     )
-    logger.trace(f'Finished parsing date of diagnosis {date_of_diagnosis} -> '
-                 f'{parsed_date_of_diagnosis}')
+    if trace_enabled():
+        logger.trace(f'Finished parsing date of diagnosis {date_of_diagnosis} -> '
+                     f'{parsed_date_of_diagnosis}')
     return parsed_date_of_diagnosis
 
 
+def parse_date_of_diagnosis_expr(date_of_diagnosis_col: str) -> pl.Expr:
+    """Vectorized version of `parse_date_of_diagnosis`
+
+    Invalid dates evaluate to null, use `raise_on_invalid_date_strings` to report
+    them.
+
+    :param date_of_diagnosis_col: Name of the column with dates of diagnosis in
+        YYYY-MM-DD format
+    :type date_of_diagnosis_col: str
+    :return: Expression evaluating to the dates as ISO8601 UTC timestamps
+    :rtype: pl.Expr
+    """
+    return parse_date_string_to_iso8601_utc_timestamp_expr(date_of_diagnosis_col)
+
+
 def parse_sex(sex: str) -> str:
     """Parses the sex (SNOMED) of a patient entry from ERKER to a Phenopackets sex code.
 
@@ -105,11 +178,13 @@ def parse_sex(sex: str) -> str:
     Link to Phenopackets documentation, where requirement is defined:
     https://phenopacket-schema.readthedocs.io/en/latest/sex.html 
     """
-    logger.trace(f'Parsing sex {sex}')
-    logger.trace(f'Check if sex {sex} is a valid SNOMED sex code')
+    if trace_enabled():
+        logger.trace(f'Parsing sex {sex}')
+        logger.trace(f'Check if sex {sex} is a valid SNOMED sex code')
     if sex in sex_map_erker2phenopackets:
         parsed_sex = sex_map_erker2phenopackets[sex]
-        logger.trace(f'Finished parsing sex {sex} -> {parsed_sex}')
+        if trace_enabled():
+            logger.trace(f'Finished parsing sex {sex} -> {parsed_sex}')
         return parsed_sex
     else:
         logger.error(f'Unknown sex {sex}')
@@ -141,15 +216,32 @@ def parse_phenotyping_date(phenotyping_date: str) -> Timestamp:
     :rtype: Timestamp
     :raises: Value Error: If date of determination is not in "YYYY-MM-DD" format
     """
-    logger.trace(f'Parsing phenotyping date {phenotyping_date}')
+    if trace_enabled():
+        logger.trace(f'Parsing phenotyping date {phenotyping_date}')
     parsed_phenotyping_date = parse_date_string_to_iso8601_utc_timestamp(
         phenotyping_date
     )
-    logger.trace(f'Finished parsing phenotyping date {phenotyping_date} -> '
-                 f'{parsed_phenotyping_date}')
+    if trace_enabled():
+        logger.trace(f'Finished parsing phenotyping date {phenotyping_date} -> '
+                     f'{parsed_phenotyping_date}')
     return parsed_phenotyping_date
 
 
+def parse_phenotyping_date_expr(phenotyping_date_col: str) -> pl.Expr:
+    """Vectorized version of `parse_phenotyping_date`
+
+    Invalid dates evaluate to null, use `raise_on_invalid_date_strings` to report
+    them.
+
+    :param phenotyping_date_col: Name of the column with dates of phenotype
+        determination in "YYYY-MM-DD" format
+    :type phenotyping_date_col: str
+    :return: Expression evaluating to the dates as ISO8601 UTC timestamps
+    :rtype: pl.Expr
+    """
+    return parse_date_string_to_iso8601_utc_timestamp_expr(phenotyping_date_col)
+
+
 def parse_zygosity(zygosity: str) -> str:
     """
     Parses the zygosity (LOINC) of a patient entry from ERKER to a Phenopackets
@@ -172,11 +264,13 @@ def parse_zygosity(zygosity: str) -> str:
     :return: A string code representing the zygosity of the patient.
     :raises: Value Error: If the zygosity string is not a valid LOINC code
     """
-    logger.trace(f'Parsing zygosity {zygosity}')
-    logger.trace(f'Check if zygosity {zygosity} is a valid LOINC zygosity code')
+    if trace_enabled():
+        logger.trace(f'Parsing zygosity {zygosity}')
+        logger.trace(f'Check if zygosity {zygosity} is a valid LOINC zygosity code')
     if zygosity in zygosity_map_erker2phenopackets:
-        logger.trace(f'Finished parsing zygosity {zygosity} -> '
-                     f'{zygosity_map_erker2phenopackets[zygosity]}')
+        if trace_enabled():
+            logger.trace(f'Finished parsing zygosity {zygosity} -> '
+                         f'{zygosity_map_erker2phenopackets[zygosity]}')
         return zygosity_map_erker2phenopackets[zygosity]
     else:
         logger.error(f'Unknown zygosity {zygosity}')
@@ -204,48 +298,132 @@ def parse_omim(omim: str) -> str:
     :return: a patient's OMIM code in Phenopacket representation
     :raises: Value Error: If the OMIM string is not a valid OMIM code
     """
-    logger.trace(f'Parsing OMIM {omim}')
-    logger.trace(f'Check if OMIM {omim} contains unnecessary quotation marks')
+    if trace_enabled():
+        logger.trace(f'Parsing OMIM {omim}')
+        logger.trace(f'Check if OMIM {omim} contains unnecessary quotation marks')
     omim = omim.replace("\"", "")
-    logger.trace('If OMIM contained unnecessary quotation marks,'
-                 f' they were removed {omim}')
+    if trace_enabled():
+        logger.trace('If OMIM contained unnecessary quotation marks,'
+                     f' they were removed {omim}')
 
     pattern_with_suffix = r'\d{6}\.\d{4}'
     pattern_with_out_suffix = r'\d{6}'
 
-    logger.trace('Check if OMIM is None or nan')
-    logger.trace(f'Check if OMIM {omim} matches pattern {pattern_with_suffix} or '
-                 f'{pattern_with_out_suffix} to check if it is a valid OMIM code')
+    if trace_enabled():
+        logger.trace('Check if OMIM is None or nan')
+        logger.trace(f'Check if OMIM {omim} matches pattern {pattern_with_suffix} or '
+                     f'{pattern_with_out_suffix} to check if it is a valid OMIM code')
 
     if omim is None or omim == 'nan':
-        logger.trace('OMIM is None or nan. Trying to read config file to get'
-                     ' NO_OMIM value')
-
-        config = configparser.ConfigParser()
-        try:
-            logger.trace('Trying to read config file from default location')
-            config.read('../../data/config/config.cfg')
-            no_omim = config.get('NoValue', 'omim')
-            logger.trace(f'Found NO_OMIM value in config file: {no_omim}')
-        except Exception as e1:
-            logger.trace('Could not find config file in default location.')
-            try:
-                logger.trace('Trying to read config file from alternative location')
-                config.read('ERKER2Phenopackets/data/config/config.cfg')
-                no_omim = config.get('NoValue', 'omim')
-                logger.trace(f'Found NO_OMIM value in config file: {no_omim}')
-            except Exception as e2:
-                logger.error(f'Could not find config file. {e1} {e2}')
-                exit()
-        logger.trace(f'Finished parsing OMIM {omim} -> {no_omim}, '
-                     'since it was nan or None')
+        no_omim = load_settings().no_value.omim
+        if trace_enabled():
+            logger.trace(f'Finished parsing OMIM {omim} -> {no_omim}, '
+                         'since it was nan or None')
         return no_omim
     elif re.match(pattern_with_suffix, omim) or re.match(pattern_with_out_suffix, omim):
-        logger.trace(f'Successfully matched OMIM {omim} to a valid OMIM pattern.')
-        logger.trace(f'Finished parsing OMIM {omim} -> OMIM:{omim}')
+        if trace_enabled():
+            logger.trace(f'Successfully matched OMIM {omim} to a valid OMIM pattern.')
+            logger.trace(f'Finished parsing OMIM {omim} -> OMIM:{omim}')
         return 'OMIM:' + omim
     else:
         logger.error('The OMIM code does not match format "6d.4d" or "6d".'
                      f'Received: {omim}')
         raise ValueError('The OMIM code does not match format "6d.4d" or "6d".'
                          f'Received: {omim}')
+
+
+def parse_omim_expr(omim_col: str, no_omim: str) -> pl.Expr:
+    """Vectorized version of `parse_omim`
+
+    Returns a polars expression parsing a column of OMIM codes to the Phenopackets
+    OMIM structure. Quotation marks are removed, missing values and `nan` evaluate to
+    `no_omim` and invalid OMIM codes evaluate to null, use `collect_invalid_omims` to
+    report them.
+
+    Example:
+    df.with_columns(parse_omim_expr('sct_439401001_omim_g_1', 'NO_OMIM'))
+
+    :param omim_col: Name of the column with the OMIM codes
+    :type omim_col: str
+    :param no_omim: symbol for missing OMIM codes
+    :type no_omim: str
+    :return: Expression evaluating to the OMIM codes in Phenopacket representation
+    :rtype: pl.Expr
+    """
+    omim = pl.col(omim_col).cast(pl.Utf8).str.replace_all('"', '', literal=True)
+    return pl.when(
+        omim.is_null() | (omim == 'nan')
+    ).then(
+        pl.lit(no_omim)
+    ).when(
+        omim.str.contains(OMIM_PATTERN)
+    ).then(
+        pl.concat_str([pl.lit('OMIM:'), omim])
+    )
+
+
+def parse_omim_cols(df: pl.DataFrame, omim_cols: Dict[str, str], no_omim: str) -> \
+        pl.DataFrame:
+    """Parses all OMIM columns of a DataFrame in a single `with_columns` call
+
+    Invalid OMIM codes are left as null in the parsed columns, see
+    `collect_invalid_omims`.
+
+    :param df: DataFrame containing the OMIM columns
+    :type df: pl.DataFrame
+    :param omim_cols: Mapping of the OMIM columns to the names of the parsed columns
+    :type omim_cols: Dict[str, str]
+    :param no_omim: symbol for missing OMIM codes
+    :type no_omim: str
+    :return: DataFrame with the parsed OMIM columns added
+    :rtype: pl.DataFrame
+    """
+    return df.with_columns(
+        parse_omim_expr(omim_col, no_omim).alias(parsed_col)
+        for omim_col, parsed_col in omim_cols.items()
+    )
+
+
+def collect_invalid_omims(df: pl.DataFrame, omim_cols: Dict[str, str]) -> \
+        pl.DataFrame:
+    """Collects the OMIM codes that could not be parsed by `parse_omim_cols`
+
+    :param df: DataFrame returned by `parse_omim_cols`
+    :type df: pl.DataFrame
+    :param omim_cols: Mapping of the OMIM columns to the names of the parsed columns
+    :type omim_cols: Dict[str, str]
+    :return: Error report with the columns `row_nr`, `column` and `omim`, one row per \
+    invalid OMIM code
+    :rtype: pl.DataFrame
+    """
+    schema = {'row_nr': pl.UInt32, 'column': pl.Utf8, 'omim': pl.Utf8}
+    reports = [
+        df.with_row_count().filter(
+            pl.col(parsed_col).is_null()
+        ).select(
+            pl.col('row_nr'),
+            pl.lit(omim_col).alias('column'),
+            pl.col(omim_col).cast(pl.Utf8).str.replace_all('"', '', literal=True)
+            .alias('omim'),
+        )
+        for omim_col, parsed_col in omim_cols.items()
+    ]
+    return pl.concat([pl.DataFrame(schema=schema)] + reports, how='vertical')
+
+
+def raise_on_invalid_omims(invalid_omims: pl.DataFrame):
+    """Logs every entry of an OMIM error report and raises the error of `parse_omim`
+    for the first one
+
+    :param invalid_omims: Error report returned by `collect_invalid_omims`
+    :type invalid_omims: pl.DataFrame
+    :raises: ValueError: if the error report is not empty
+    """
+    if invalid_omims.height == 0:
+        return
+    for row_nr, column, omim in invalid_omims.iter_rows():
+        logger.error('The OMIM code does not match format "6d.4d" or "6d".'
+                     f'Received: {omim} (row {row_nr}, column {column})')
+    omim = invalid_omims['omim'][0]
+    raise ValueError('The OMIM code does not match format "6d.4d" or "6d".'
+                     f'Received: {omim}')
@@ -1,25 +1,38 @@
 import polars as pl  # the same as pandas just faster
 from loguru import logger
+from phenopackets import Phenopacket
 
-import configparser
 import argparse
+import os
+import shutil
 from pathlib import Path
+from typing import Iterable, List, Optional
 from datetime import datetime
 import re
+import sys
+import hashlib
+from functools import lru_cache
+from importlib.metadata import version
 
 from ERKER2Phenopackets.src.logging_ import setup_logging
-from ERKER2Phenopackets.src.utils import write_files
-from ERKER2Phenopackets.src.utils import polars_utils
-from ERKER2Phenopackets.src.utils import validate
-from ERKER2Phenopackets.src.mc4r.mapping_dicts import \
-    phenotype_label_map_erker2phenopackets
-from ERKER2Phenopackets.src.mc4r.mapping_dicts import \
-    allele_label_map_erker2phenopackets
-from ERKER2Phenopackets.src.mc4r import zygosity_map_erker2phenopackets, \
-    sex_map_erker2phenopackets, phenotype_status_map_erker2phenopackets
-from ERKER2Phenopackets.src.mc4r.parse_mc4r import parse_date_of_diagnosis, \
-    parse_year_of_birth, parse_phenotyping_date, parse_omim
+from ERKER2Phenopackets.src.settings import Settings, load_settings
+from ERKER2Phenopackets.src.utils import write_files, atomic_output_dir
+from ERKER2Phenopackets.src.utils import write_bundle, bundle_file_name, BUNDLE_FORMATS
+from ERKER2Phenopackets.src.utils import polars_utils, parsing_utils
+from ERKER2Phenopackets.src.utils import FrameCache, frame_cache_key
+from ERKER2Phenopackets.src.utils.frame_cache import DEFAULT_MAX_BYTES
+from ERKER2Phenopackets.src.utils.validation_cache import file_digest
+from ERKER2Phenopackets.src.utils.io import phenopackets2json
+from ERKER2Phenopackets.src.utils import validate, prevalidate_phenopackets
+from ERKER2Phenopackets.src.utils.manifest import Manifest, config_hash, row_hashes, \
+    diff_row_hashes, read_manifest, write_manifest, MANIFEST_FILE_NAME
+from ERKER2Phenopackets.src.mc4r.column_specs import mc4r_column_specs
 from ERKER2Phenopackets.src.mc4r import map_mc4r2phenopackets, map_chunk
+from ERKER2Phenopackets.src.mc4r.map_mc4r import EXECUTORS
+from ERKER2Phenopackets.src.mc4r.read_erker import ERKER_DTYPES, read_erker, \
+    scan_erker, iter_erker_batches
+from ERKER2Phenopackets.src.mc4r import read_erker as read_erker_module, \
+    column_specs, parse_mc4r, mapping_dicts, map_mc4r
 
 
 def main():
@@ -27,7 +40,8 @@ def main():
     the resulting phenopackets to json files on disk"""
     arg_parser = argparse.ArgumentParser(
         prog='pipeline',
-        description='A pipeline to map ERKER data in .csv format to phenopackets.'
+        description='A pipeline to map ERKER data in .csv, Parquet or Arrow IPC '
+                    'format to phenopackets.'
     )
 
     mut_excl_group = arg_parser.add_mutually_exclusive_group()
@@ -42,11 +56,54 @@ def main():
 
     arg_parser.add_argument('-v', '--validate', action='store_true',
                             help='Validate the created phenopackets')
+    arg_parser.add_argument('--prevalidate', action='store_true',
+                            help='Check the created phenopackets with the in-process '
+                                 'validator before writing them')
+    arg_parser.add_argument('--prevalidate-only', action='store_true',
+                            help='Only check the created phenopackets with the '
+                                 'in-process validator, without phenopacket-tools')
+
+    arg_parser.add_argument('-e', '--executor', choices=EXECUTORS, default='thread',
+                            help='Map the data on a thread pool or on a process pool '
+                                 '(processes use all cores), defaults to thread')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                            help='Number of threads or processes used for mapping and '
+                                 'writing, defaults to the number of CPUs')
+    arg_parser.add_argument('-b', '--batch-size', type=int, default=None,
+                            help='Stream the data in batches of at most this many rows '
+                                 'to bound the memory usage')
+    arg_parser.add_argument('--max-in-flight', type=int, default=None,
+                            help='Maximum number of phenopackets held in memory when '
+                                 'streaming, defaults to the batch size')
+    arg_parser.add_argument('-f', '--format', choices=['json', *BUNDLE_FORMATS],
+                            default='json',
+                            help='Write one .json file per phenopacket (json), a '
+                                 'single newline-delimited JSON file (ndjson) or a '
+                                 'single length-prefixed protobuf stream (pb), '
+                                 'defaults to json')
+    arg_parser.add_argument('--fsync', action='store_true',
+                            help='Flush the written phenopackets to the disk before '
+                                 'finishing')
+    arg_parser.add_argument('-c', '--cache', action='store_true',
+                            help='Cache the preprocessed data, so that runs on the '
+                                 'same data and config skip the preprocessing')
+    arg_parser.add_argument('--cache-max-mb', type=int,
+                            default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                            help='Maximum size of the cache of preprocessed data in '
+                                 'MiB, least recently used data is evicted first, '
+                                 f'defaults to {DEFAULT_MAX_BYTES // 1024 ** 2}')
+    arg_parser.add_argument('-i', '--incremental', action='store_true',
+                            help='Only map the rows that are new or changed since the '
+                                 'last run into the output directory, requires '
+                                 'out_dir_name')
 
     # positional arguments
-    arg_parser.add_argument('data_path', help='The path to the data')
+    arg_parser.add_argument('data_path', help='The path to the data (.csv, .parquet or '
+                                              '.arrow)')
     arg_parser.add_argument('out_dir_name', nargs='?', default='',
-                            help='The name of the output directory')
+                            help='The name of the output directory, phenopackets '
+                                 'are added to an existing directory (an incremental '
+                                 'run replaces it)')
 
     args = arg_parser.parse_args()
 
@@ -62,8 +119,13 @@ def main():
     if args.publish:
         logger.info('Publishing phenopackets to data/out/phenopackets')
 
-    if args.validate:
-        logger.info('Will validate phenopackets after creation')
+    if args.prevalidate_only:
+        logger.info('Will check phenopackets with the in-process validator only')
+    else:
+        if args.prevalidate:
+            logger.info('Will check phenopackets with the in-process validator')
+        if args.validate:
+            logger.info('Will validate phenopackets after creation')
 
     logger.info('Starting mc4r pipeline')
     out_dir_name = ''
@@ -93,10 +155,20 @@ def main():
         data_path=data_path,
         out_dir_name=out_dir_name,
         publish=args.publish,
-        debug=(args.debug or args.trace)  # debug mode enabled if either debug or trace
+        debug=(args.debug or args.trace),  # debug mode enabled if either debug or trace
+        executor=args.executor,
+        num_workers=args.workers,
+        batch_size=args.batch_size,
+        max_in_flight=args.max_in_flight,
+        fsync=args.fsync,
+        output_format=args.format,
+        prevalidate=(args.prevalidate or args.prevalidate_only),
+        incremental=args.incremental,
+        cache=args.cache,
+        cache_max_bytes=args.cache_max_mb * 1024 ** 2,
     )
 
-    if args.validate:
+    if args.validate and not args.prevalidate_only:
         logger.info('Starting up validation tool...')
         validate()
 
@@ -105,19 +177,69 @@ def pipeline(
         data_path: str,
         out_dir_name: str = '',
         publish: bool = False,
-        debug: bool = False
+        debug: bool = False,
+        executor: str = 'thread',
+        num_workers: int = os.cpu_count(),
+        batch_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        fsync: bool = False,
+        output_format: str = 'json',
+        prevalidate: bool = False,
+        incremental: bool = False,
+        cache: bool = False,
+        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+        settings: Optional[Settings] = None,
 ):
     """This method reads in a dataset in erker format (mc4r) and writes
     the resulting phenopackets to json files on disk
 
-    :param data_path: The path to the data in erker format in a `.csv` file
+    The phenopackets are written to a temporary directory that is renamed to the
+    output directory once all of them are written, see `atomic_output_dir()`. If the
+    output directory already exists, the phenopackets are merged into it: files of
+    the same name are replaced, all other files are kept. Incremental runs replace
+    the output directory instead, so that phenopackets of removed rows are dropped.
+
+    :param data_path: The path to the data in erker format in a `.csv`, Parquet or
+        Arrow IPC file
     :type data_path: str
-    :param out_dir_name: The name of the output directory
+    :param out_dir_name: The name of the output directory, an existing directory is
+        merged into (replaced by incremental runs), defaults to the current time
     :type out_dir_name: str
     :param publish: Write phenopackets to out instead of test
     :type publish: bool
     :param debug: Enable debug mode: log more information and sequential execution
     :type debug: bool
+    :param executor: Map on a pool of threads ('thread') or processes ('process')
+    :type executor: str
+    :param num_workers: Number of threads or processes used for mapping and writing
+    :type num_workers: int
+    :param batch_size: If set, the data is streamed in batches of at most this many
+        rows instead of being loaded at once
+    :type batch_size: Optional[int]
+    :param max_in_flight: Maximum number of phenopackets held in memory when
+        streaming, defaults to `batch_size`
+    :type max_in_flight: Optional[int]
+    :param fsync: Flush the phenopackets to the disk before finishing
+    :type fsync: bool
+    :param output_format: One `.json` file per phenopacket ('json') or a single bundle
+        file with a sidecar index ('ndjson' or 'pb')
+    :type output_format: str
+    :param prevalidate: Check the phenopackets in-process before writing them, see
+        `prevalidate_phenopackets()`
+    :type prevalidate: bool
+    :param incremental: Only map the rows that changed since the last run into the
+        output directory, see `_pipeline_incremental()`
+    :type incremental: bool
+    :param cache: Reuse the preprocessed data of an earlier run on the same data with
+        the same config and code, see `_read_preprocessed()`. Ignored when streaming
+        or running incrementally
+    :type cache: bool
+    :param cache_max_bytes: Maximum size of the cache of preprocessed data
+    :type cache_max_bytes: int
+    :param settings: The settings, defaults to `load_settings()`
+    :type settings: Optional[Settings]
+    :raises ValueError: If `incremental` is combined with streaming, a bundle format
+        or no output directory name
     """
     logger.info(f'Data path: {data_path}')
     if out_dir_name:
@@ -126,24 +248,438 @@ def pipeline(
         logger.info('No output directory name provided, current time will be used as '
                     'output directory name')
 
-    logger.trace('Reading config file')
-    config = configparser.ConfigParser()
-    config.read('ERKER2Phenopackets/data/config/config.cfg')
+    if settings is None:
+        settings = load_settings()
 
     if publish:
-        phenopackets_out = Path(config.get('Paths', 'phenopackets_out_script'))
+        phenopackets_out = settings.paths.phenopackets_out
     else:
-        phenopackets_out = Path(config.get('Paths', 'test_phenopackets_out_script'))
-    logger.trace('Finished reading config file')
+        phenopackets_out = settings.paths.test_phenopackets_out
     logger.debug(phenopackets_out.resolve())
 
     cur_time = datetime.now().strftime("%Y-%m-%d-%H%M")
     logger.debug(f'Current time: {cur_time}')
 
+    if out_dir_name:
+        phenopackets_out_dir = phenopackets_out / out_dir_name  # create dir for output
+    else:
+        phenopackets_out_dir = phenopackets_out / cur_time  # create dir for output
+
+    if incremental:
+        if batch_size or output_format != 'json' or not out_dir_name:
+            logger.error('Incremental runs require an output directory name and the '
+                         'json format, and do not support streaming')
+            raise ValueError('Incremental runs require an output directory name and '
+                             'the json format, and do not support streaming')
+        _pipeline_incremental(
+            data_path=data_path,
+            settings=settings,
+            phenopackets_out_dir=phenopackets_out_dir,
+            cur_time=cur_time,
+            debug=debug,
+            executor=executor,
+            num_workers=num_workers,
+            fsync=fsync,
+            prevalidate=prevalidate,
+        )
+        logger.info(f'Published phenopackets to {phenopackets_out_dir.resolve()}')
+        logger.info('Finished mc4r pipeline')
+        return
+
+    # the phenopackets of an earlier incremental run in the output directory are
+    # replaced, its manifest no longer describes them
+    (phenopackets_out_dir / MANIFEST_FILE_NAME).unlink(missing_ok=True)
+
+    if batch_size:
+        with atomic_output_dir(phenopackets_out_dir, fsync=fsync,
+                               merge=True) as tmp_out_dir:
+            _pipeline_batched(
+                data_path=data_path,
+                settings=settings,
+                phenopackets_out_dir=tmp_out_dir,
+                cur_time=cur_time,
+                batch_size=batch_size,
+                max_in_flight=max_in_flight,
+                debug=debug,
+                executor=executor,
+                num_workers=num_workers,
+                fsync=fsync,
+                output_format=output_format,
+                prevalidate=prevalidate,
+            )
+        logger.info(f'Published phenopackets to {phenopackets_out_dir.resolve()}')
+        logger.info('Finished mc4r pipeline')
+        return
+
+    frame_cache = None
+    if cache:
+        frame_cache = FrameCache(settings.paths.frame_cache, max_bytes=cache_max_bytes)
+    df = _read_preprocessed(data_path, settings, frame_cache)
+
+    logger.info('Start mapping data to phenopackets')
+    phenopackets = _map(df, cur_time, debug, executor, num_workers, settings)
+    logger.info('Finished mapping data to phenopackets')
+
+    if prevalidate:
+        num_invalid = _prevalidate(phenopackets, debug, executor, num_workers)
+        logger.info(f'Number of invalid phenopackets: {num_invalid}')
+
+    # Write to JSON
+    logger.info(f'Writing phenopackets to {phenopackets_out_dir.resolve()}')
+    with atomic_output_dir(phenopackets_out_dir, fsync=fsync,
+                           merge=True) as tmp_out_dir:
+        _write(phenopackets, tmp_out_dir, debug, executor, num_workers, fsync,
+               output_format)
+    logger.info(f'Successfully wrote {len(phenopackets)} files to disk')
+    logger.info('Finished mc4r pipeline')
+
+
+def _read_preprocessed(data_path: str, settings: Settings,
+                       frame_cache: Optional[FrameCache] = None) -> pl.DataFrame:
+    """Reads and preprocesses the data, see `preprocess()`
+
+    With a `frame_cache`, the preprocessed data is cached by the SHA-256 of the data
+    file, the hash of the settings and the version of the preprocessing code (see
+    `preprocessing_version()`). Cached data is memory mapped instead of being read and
+    preprocessed again.
+
+    :param data_path: The path to the data in erker format
+    :type data_path: str
+    :param settings: The settings
+    :type settings: Settings
+    :param frame_cache: Cache of preprocessed data, defaults to None
+    :type frame_cache: Optional[FrameCache]
+    :return: The preprocessed DataFrame
+    :rtype: pl.DataFrame
+    """
+    key = None
+    if frame_cache is not None:
+        key = frame_cache_key(file_digest(data_path), config_hash(settings),
+                              preprocessing_version())
+        df = frame_cache.get(key)
+        if df is not None:
+            logger.info(f'Loaded {len(df)} preprocessed rows from the cache '
+                        f'{frame_cache.path}')
+            return df
+        logger.info('Preprocessed data not cached yet')
+
     logger.info('Reading data')
-    df = pl.read_csv(data_path)
+    df = read_erker(data_path)
     logger.info(f'Read {len(df)} rows')
 
+    df = preprocess(df, settings)
+
+    if frame_cache is not None:
+        frame_cache.put(key, df)
+        logger.info(f'Cached the preprocessed data in {frame_cache.path}')
+    return df
+
+
+@lru_cache(maxsize=None)
+def preprocessing_version() -> str:
+    """Returns a version of the preprocessing, that changes whenever the code that
+    reads and preprocesses the data may change
+
+    The version is the SHA-256 of the source files of the modules used by
+    `read_erker()` and `preprocess()`, and the version of polars.
+
+    :return: The hex digest
+    :rtype: str
+    """
+    sha256 = hashlib.sha256(pl.__version__.encode('utf-8'))
+    for module in (sys.modules[__name__], read_erker_module, column_specs, parse_mc4r,
+                   mapping_dicts, polars_utils, parsing_utils):
+        sha256.update(Path(module.__file__).read_bytes())
+    return sha256.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def mapping_version() -> str:
+    """Returns a version of the mapping, that changes whenever the code that creates
+    and writes the phenopackets may change
+
+    The version is the SHA-256 of `preprocessing_version()`, the source files of the
+    mapping and the JSON writer, and the versions of phenopackets and protobuf.
+
+    :return: The hex digest
+    :rtype: str
+    """
+    sha256 = hashlib.sha256(preprocessing_version().encode('utf-8'))
+    sha256.update(f'{version("phenopackets")} {version("protobuf")}'.encode('utf-8'))
+    for module in (map_mc4r, phenopackets2json):
+        sha256.update(Path(module.__file__).read_bytes())
+    return sha256.hexdigest()
+
+
+def _pipeline_batched(
+        data_path: str,
+        settings: Settings,
+        phenopackets_out_dir: Path,
+        cur_time: str,
+        batch_size: int,
+        max_in_flight: Optional[int],
+        debug: bool,
+        executor: str,
+        num_workers: int,
+        fsync: bool = False,
+        output_format: str = 'json',
+        prevalidate: bool = False,
+) -> int:
+    """Streaming variant of the pipeline with bounded memory
+
+    The data is read in batches of at most `batch_size` rows. Each batch is
+    preprocessed, parsed, mapped and written before the next batch is read. Within a
+    batch at most `max_in_flight` phenopackets exist at the same time.
+
+    Columns that only contain null values are determined upfront in a streaming
+    pass over the whole file, so every batch drops the same columns as `pipeline()`
+    would for the complete data.
+
+    :param data_path: The path to the data in erker format in a `.csv`, Parquet or
+        Arrow IPC file
+    :type data_path: str
+    :param settings: The settings
+    :type settings: Settings
+    :param phenopackets_out_dir: The directory to write the phenopackets to
+    :type phenopackets_out_dir: Path
+    :param cur_time: The current time ("YYYY-MM-DD-hhmm")
+    :type cur_time: str
+    :param batch_size: Maximum number of rows held in memory
+    :type batch_size: int
+    :param max_in_flight: Maximum number of phenopackets held in memory, defaults to
+        `batch_size` if None
+    :type max_in_flight: Optional[int]
+    :param debug: Map sequentially
+    :type debug: bool
+    :param executor: Map on a pool of threads ('thread') or processes ('process')
+    :type executor: str
+    :param num_workers: Number of threads or processes used for mapping and writing
+    :type num_workers: int
+    :param fsync: Flush the phenopackets to the disk
+    :type fsync: bool
+    :param output_format: Either 'json', 'ndjson' or 'pb'
+    :type output_format: str
+    :param prevalidate: Check the phenopackets in-process before writing them
+    :type prevalidate: bool
+    :return: The number of phenopackets written
+    :rtype: int
+    """
+    if batch_size < 1 or (max_in_flight is not None and max_in_flight < 1):
+        logger.error('batch_size and max_in_flight must be greater than 0, got '
+                     f'{batch_size} and {max_in_flight}')
+        raise ValueError('batch_size and max_in_flight must be greater than 0, got '
+                         f'{batch_size} and {max_in_flight}')
+    max_in_flight = min(max_in_flight or batch_size, batch_size)
+    logger.info(f'Streaming data in batches of {batch_size} rows, at most '
+                f'{max_in_flight} phenopackets in flight')
+
+    logger.info('Scanning data for columns with only null values')
+    all_null_cols = polars_utils.scan_all_null_cols(scan_erker(data_path))
+    logger.info(f'There are {len(all_null_cols)} columns with only null values in '
+                'the data')
+    drop_cols = all_null_cols + ['record_id']
+
+    logger.info(f'Writing phenopackets to {phenopackets_out_dir.resolve()}')
+    num_rows = 0
+    num_invalid = 0
+    for batch in iter_erker_batches(data_path, batch_size):
+        logger.info(f'Processing rows {num_rows} to {num_rows + batch.height - 1}')
+
+        batch = batch.drop([col for col in drop_cols if col in batch.columns])
+        batch = polars_utils.add_id_col(batch, id_col_name='mc4r_id',
+                                        id_datatype=str, id_offset=num_rows)
+        batch = parse(batch, settings)
+
+        for sub_batch in batch.iter_slices(n_rows=max_in_flight):
+            phenopackets = _map(sub_batch, cur_time, debug, executor, num_workers,
+                                settings)
+            if prevalidate:
+                num_invalid += _prevalidate(phenopackets, debug, executor, num_workers)
+            _write(phenopackets, phenopackets_out_dir, debug, executor, num_workers,
+                   fsync, output_format)
+            del phenopackets
+
+        num_rows += batch.height
+
+    if prevalidate:
+        logger.info(f'Number of invalid phenopackets: {num_invalid}')
+    logger.info(f'Successfully wrote {num_rows} files to disk')
+    return num_rows
+
+
+def _pipeline_incremental(
+        data_path: str,
+        settings: Settings,
+        phenopackets_out_dir: Path,
+        cur_time: str,
+        debug: bool,
+        executor: str,
+        num_workers: int,
+        fsync: bool = False,
+        prevalidate: bool = False,
+) -> int:
+    """Incremental variant of the pipeline, that only maps new or changed rows
+
+    The output directory holds a manifest with a content hash of the source columns
+    of each phenopacket (the columns of `ERKER_DTYPES`), a hash of the config and the
+    version of the code, see `manifest.row_hashes()`, `manifest.config_hash()` and
+    `mapping_version()`. Only the rows whose hash differs from the manifest of the
+    existing output directory are mapped and written. The phenopackets of unchanged
+    rows are hard linked (or copied) from the existing output directory, the
+    phenopackets of removed rows are dropped. If the config or the code changed or
+    there is no manifest, all rows are mapped.
+
+    The phenopackets are identified by the position of their row, like in
+    `pipeline()`. Removing a row from the middle of the data therefore changes all
+    following rows.
+
+    :param data_path: The path to the data in erker format in a `.csv`, Parquet or
+        Arrow IPC file
+    :type data_path: str
+    :param settings: The settings
+    :type settings: Settings
+    :param phenopackets_out_dir: The output directory, read and replaced
+    :type phenopackets_out_dir: Path
+    :param cur_time: The current time ("YYYY-MM-DD-hhmm")
+    :type cur_time: str
+    :param debug: Map sequentially
+    :type debug: bool
+    :param executor: Map on a pool of threads ('thread') or processes ('process')
+    :type executor: str
+    :param num_workers: Number of threads or processes used for mapping and writing
+    :type num_workers: int
+    :param fsync: Flush the phenopackets to the disk
+    :type fsync: bool
+    :param prevalidate: Check the mapped phenopackets in-process before writing them
+    :type prevalidate: bool
+    :return: The number of phenopackets mapped
+    :rtype: int
+    """
+    logger.info('Reading data')
+    df = read_erker(data_path)
+    logger.info(f'Read {len(df)} rows')
+
+    # the same columns as in `preprocess()` are dropped for the whole data
+    drop_cols = polars_utils.get_all_null_cols(df) + ['record_id']
+    df = polars_utils.add_id_col(df, id_col_name='mc4r_id', id_datatype=str)
+    # only the columns used by the mapping are hashed, other columns of the data do
+    # not change the phenopackets
+    source_cols = [col for col in df.columns if col in ERKER_DTYPES]
+    manifest = Manifest(config_hash(settings), mapping_version(), 'json',
+                        row_hashes(df, 'mc4r_id', exclude=['record_id'],
+                                   columns=source_cols))
+
+    old_manifest = read_manifest(phenopackets_out_dir)
+    if old_manifest is None:
+        logger.info(f'No manifest in {phenopackets_out_dir}, mapping all rows')
+        changed, unchanged = set(manifest.row_hashes), set()
+    elif old_manifest.config_hash != manifest.config_hash or \
+            old_manifest.output_format != manifest.output_format:
+        logger.info('The config changed since the last run, mapping all rows')
+        changed, unchanged = set(manifest.row_hashes), set()
+    elif old_manifest.code_version != manifest.code_version:
+        logger.info('The code changed since the last run, mapping all rows')
+        changed, unchanged = set(manifest.row_hashes), set()
+    else:
+        changed, unchanged, removed = diff_row_hashes(old_manifest.row_hashes,
+                                                      manifest.row_hashes)
+        missing = {row_id for row_id in unchanged
+                   if not (phenopackets_out_dir / f'{row_id}.json').is_file()}
+        changed |= missing
+        unchanged -= missing
+        logger.info(f'{len(changed)} new or changed rows, {len(unchanged)} unchanged '
+                    f'rows, {len(removed)} removed rows')
+
+    phenopackets = []
+    if changed:
+        df = df.filter(pl.col('mc4r_id').is_in(list(changed)))
+        df = df.drop([col for col in drop_cols if col in df.columns])
+        df = parse(df, settings)
+
+        logger.info('Start mapping data to phenopackets')
+        phenopackets = _map(df, cur_time, debug, executor, num_workers, settings)
+        logger.info('Finished mapping data to phenopackets')
+
+        if prevalidate:
+            num_invalid = _prevalidate(phenopackets, debug, executor, num_workers)
+            logger.info(f'Number of invalid phenopackets: {num_invalid}')
+
+    logger.info(f'Writing phenopackets to {phenopackets_out_dir.resolve()}')
+    with atomic_output_dir(phenopackets_out_dir, fsync=fsync) as tmp_out_dir:
+        _reuse_files(phenopackets_out_dir, tmp_out_dir,
+                     (f'{row_id}.json' for row_id in unchanged))
+        _write(phenopackets, tmp_out_dir, debug, executor, num_workers, fsync)
+        write_manifest(tmp_out_dir, manifest, fsync=fsync)
+    logger.info(f'Wrote {len(phenopackets)} files to disk, reused {len(unchanged)}')
+    return len(phenopackets)
+
+
+def _reuse_files(src_dir: Path, dst_dir: Path, file_names: Iterable[str]) -> None:
+    """Hard links files of the previous run into the new output directory, copies
+    them if hard links are not supported"""
+    for file_name in file_names:
+        try:
+            os.link(src_dir / file_name, dst_dir / file_name)
+        except OSError:
+            shutil.copy2(src_dir / file_name, dst_dir / file_name)
+
+
+def _map(df: pl.DataFrame, cur_time: str, debug: bool, executor: str,
+         num_workers: int, settings: Settings) -> List[Phenopacket]:
+    """Maps a preprocessed DataFrame to phenopackets, sequentially in debug mode"""
+    if debug:
+        return map_chunk(df, cur_time[:10], settings=settings)
+    return map_mc4r2phenopackets(
+        df, cur_time[:10], num_threads=num_workers, executor=executor,
+        settings=settings
+    )
+
+
+def _prevalidate(phenopackets: List[Phenopacket], debug: bool, executor: str,
+                 num_workers: int) -> int:
+    """Checks phenopackets in-process, sequentially in debug mode, returns the number
+    of invalid phenopackets"""
+    if debug:
+        num_workers = 1
+    results = prevalidate_phenopackets(phenopackets, num_workers=num_workers,
+                                       executor=executor)
+    num_invalid = 0
+    for phenopacket, (no_errors, errors) in zip(phenopackets, results):
+        if not no_errors:
+            logger.warning(f'Phenopacket {phenopacket.id} is invalid:\n{errors}')
+            num_invalid += 1
+    return num_invalid
+
+
+def _write(phenopackets: List[Phenopacket], out_dir: Path, debug: bool,
+           executor: str, num_workers: int, fsync: bool,
+           output_format: str = 'json') -> None:
+    """Writes phenopackets to JSON files, sequentially in debug mode, or appends them
+    to the bundle in `out_dir`"""
+    if output_format != 'json':
+        write_bundle(phenopackets, out_dir / bundle_file_name(output_format),
+                     append=True, fsync=fsync)
+        return
+    if debug:
+        num_workers = 1
+    write_files(phenopackets, out_dir, num_workers=num_workers, executor=executor,
+                fsync=fsync)
+
+
+def preprocess(df: pl.DataFrame, settings: Settings) -> pl.DataFrame:
+    """Preprocesses and parses a DataFrame in erker format (mc4r)
+
+    Drops empty columns, adds the `mc4r_id` column and parses the columns required
+    for the phenopacket creation. The result can be passed to
+    `map_mc4r2phenopackets()`.
+
+    :param df: DataFrame in erker format
+    :type df: pl.DataFrame
+    :param settings: The settings
+    :type settings: Settings
+    :return: The preprocessed DataFrame
+    :rtype: pl.DataFrame
+    """
     logger.info('Preprocessing data')
     polars_utils.null_value_analysis(df, verbose=False)
 
@@ -155,189 +691,27 @@ def pipeline(
     df = polars_utils.add_id_col(df, id_col_name='mc4r_id', id_datatype=str)
     logger.info('Added mc4r_id as ID column')
 
-    # Parsing step
-    logger.info('Start parsing data for phenopacket creation')
-    no_mutation = config.get('NoValue', 'mutation')
-    no_phenotype = config.get('NoValue', 'phenotype')
-    no_date = config.get('NoValue', 'date')
-    no_omim = config.get('NoValue', 'omim')
-
-    # sct_184099003_y (year of birth)
-    logger.trace('Parsing year of birth column')
-    df = polars_utils.map_col(df, map_from='sct_184099003_y',
-                              map_to='parsed_year_of_birth',
-                              mapping=parse_year_of_birth)
-
-    # sct_281053000 (sex)
-    logger.trace('Parsing sex column')
-    df = polars_utils.map_col(df, map_from='sct_281053000', map_to='parsed_sex',
-                              mapping=sex_map_erker2phenopackets)
-
-    # sct_432213005 (date of diagnosis)
-    logger.trace('Parsing date of diagnosis column')
-    df = polars_utils.map_col(df, map_from='sct_432213005',
-                              map_to='parsed_date_of_diagnosis',
-                              mapping=parse_date_of_diagnosis)
-    logger.trace('Filling null values in date of diagnosis column')
-    df = polars_utils.fill_null_vals(df, 'parsed_date_of_diagnosis', no_date)
-
-    # ln_48007_9_1, ln_48007_9_2, ln_48007_9_3 (zygosity)
-    logger.trace('Parsing zygosity and allele label columns')
-    df = polars_utils.map_col(df, map_from='ln_48007_9_1', map_to='parsed_zygosity_1',
-                              mapping=zygosity_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='ln_48007_9_1', map_to='allele_label_1',
-                              mapping=allele_label_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='ln_48007_9_2', map_to='parsed_zygosity_2',
-                              mapping=zygosity_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='ln_48007_9_2', map_to='allele_label_2',
-                              mapping=allele_label_map_erker2phenopackets)
-    if 'ln_48007_9_3' in df.columns:
-        df = polars_utils.map_col(
-            df,
-            map_from='ln_48007_9_3',
-            map_to='parsed_zygosity_3',
-            mapping=zygosity_map_erker2phenopackets
-        )
-        df = polars_utils.map_col(
-            df,
-            map_from='ln_48007_9_3',
-            map_to='allele_label_3',
-            mapping=allele_label_map_erker2phenopackets
-        )
+    return parse(df, settings)
 
-    # sct_439401001_orpha (diagnosis (ORPHA))
-    logger.trace('Diagnosis (ORPHA) column does not require parsing')
-    # does not require mapping
-
-    # sct_439401001_omim_g_1, sct_439401001_omim_g_2, sct_439401001_omim_g_3 \
-    # (Primärdiagnose OMIM)
-    logger.trace('Parsing OMIM columns')
-    df = polars_utils.map_col(df, map_from='sct_439401001_omim_g_1',
-                              map_to='parsed_omim_1', mapping=parse_omim)
-    df = polars_utils.map_col(df, map_from='sct_439401001_omim_g_2',
-                              map_to='parsed_omim_2', mapping=parse_omim)
-
-    logger.trace('Filling null values in OMIM columns')
-    df = polars_utils.fill_null_vals(df, 'parsed_omim_1', no_omim)
-    df = polars_utils.fill_null_vals(df, 'parsed_omim_2', no_omim)
-
-    # ln_48005_3_1, ln_48005_3_2, ln_48005_3_3 (mutation p.HGVS)
-    logger.trace('Filling null values in mutation (p.HGVS) columns')
-    df = polars_utils.fill_null_vals(df, 'ln_48005_3_1', no_mutation)
-    df = polars_utils.fill_null_vals(df, 'ln_48005_3_2', no_mutation)
-    if 'ln_48005_3_3' in df.columns:
-        df = polars_utils.fill_null_vals(df, 'ln_48005_3_3', no_mutation)
-
-    # ln_48004_6_1, ln_48004_6_2, ln_48004_6_3 (mutation c.HGVS)
-    logger.trace('Filling null values in mutation (c.HGVS) columns')
-    df = polars_utils.fill_null_vals(df, 'ln_48004_6_1', no_mutation)
-    df = polars_utils.fill_null_vals(df, 'ln_48004_6_2', no_mutation)
-    if 'ln_48004_6_3' in df.columns:
-        df = polars_utils.fill_null_vals(df, 'ln_48004_6_3', no_mutation)
-
-    # ln_48018_6_1 (gene HGNC)
-    # does not require mapping
-    logger.trace('HGNC column does not require parsing')
-
-    # sct_8116006_1, sct_8116006_2, sct_8116006_3, sct_8116006_4, \
-    # sct_8116006_5 (phenotype classification)
-    logger.trace('Filling null values in phenotype classification columns')
-    df = polars_utils.fill_null_vals(df, 'sct_8116006_1', no_phenotype)
-    df = polars_utils.fill_null_vals(df, 'sct_8116006_2', no_phenotype)
-    df = polars_utils.fill_null_vals(df, 'sct_8116006_3', no_phenotype)
-    df = polars_utils.fill_null_vals(df, 'sct_8116006_4', no_phenotype)
-    df = polars_utils.fill_null_vals(df, 'sct_8116006_5', no_phenotype)
-
-    # sct_8116006_1_date, sct_8116006_2_date, sct_8116006_3_date, sct_8116006_4_date, \
-    # sct_8116006_5_date (dates of phenotype determination)
-    logger.trace('Parsing date of phenotype determination columns')
-    logger.trace('Filling null values in date of phenotype determination columns')
-    df = polars_utils.map_col(df, map_from='sct_8116006_1_date',
-                              map_to='parsed_date_of_phenotyping1',
-                              mapping=parse_phenotyping_date)
-    df = polars_utils.fill_null_vals(df, 'parsed_date_of_phenotyping1', no_date)
-
-    df = polars_utils.map_col(df, map_from='sct_8116006_2_date',
-                              map_to='parsed_date_of_phenotyping2',
-                              mapping=parse_phenotyping_date)
-    df = polars_utils.fill_null_vals(df, 'parsed_date_of_phenotyping2', no_date)
-
-    if 'sct_8116006_3_date' in df.columns:
-        df = polars_utils.map_col(df, map_from='sct_8116006_3_date',
-                                  map_to='parsed_date_of_phenotyping3',
-                                  mapping=parse_phenotyping_date)
-        df = polars_utils.fill_null_vals(df, 'parsed_date_of_phenotyping3', no_date)
-
-    if 'sct_8116006_4_date' in df.columns:
-        df = polars_utils.map_col(df, map_from='sct_8116006_4_date',
-                                  map_to='parsed_date_of_phenotyping4',
-                                  mapping=parse_phenotyping_date)
-        df = polars_utils.fill_null_vals(df, 'parsed_date_of_phenotyping4', no_date)
-
-    if 'sct_8116006_5_date' in df.columns:
-        df = polars_utils.map_col(df, map_from='sct_8116006_5_date',
-                                  map_to='parsed_date_of_phenotyping5',
-                                  mapping=parse_phenotyping_date)
-        df = polars_utils.fill_null_vals(df, 'parsed_date_of_phenotyping5', no_date)
-
-    # sct_8116006_1_status, sct_8116006_2_status, sct_8116006_3_status,\
-    # sct_8116006_4_status, sct_8116006_5_status (status of phenotype determination)
-    logger.trace('Parsing status of phenotype determination columns')
-    logger.trace('Filling null values in status of phenotype determination columns')
-    df = polars_utils.map_col(df, map_from='sct_8116006_1_status',
-                              map_to='parsed_phenotype_status1',
-                              mapping=phenotype_status_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_2_status',
-                              map_to='parsed_phenotype_status2',
-                              mapping=phenotype_status_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_3_status',
-                              map_to='parsed_phenotype_status3',
-                              mapping=phenotype_status_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_4_status',
-                              map_to='parsed_phenotype_status4',
-                              mapping=phenotype_status_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_5_status',
-                              map_to='parsed_phenotype_status5',
-                              mapping=phenotype_status_map_erker2phenopackets)
-
-    # sct_8116006_1, sct_8116006_2, sct_8116006_3, sct_8116006_4, sct_8116006_5 
-    # phenotypic feature
-    logger.trace('Parsing phenotype label columns')
-    df = polars_utils.map_col(df, map_from='sct_8116006_1',
-                              map_to='parsed_phenotype_label1',
-                              mapping=phenotype_label_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_2',
-                              map_to='parsed_phenotype_label2',
-                              mapping=phenotype_label_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_3',
-                              map_to='parsed_phenotype_label3',
-                              mapping=phenotype_label_map_erker2phenopackets)
-    df = polars_utils.map_col(df, map_from='sct_8116006_4',
-                              map_to='parsed_phenotype_label4',
-                              mapping=phenotype_label_map_erker2phenopackets)
-    if 'sct_8116006_5' in df.columns:
-        df = polars_utils.map_col(df, map_from='sct_8116006_5',
-                                  map_to='parsed_phenotype_label5',
-                                  mapping=phenotype_label_map_erker2phenopackets)
-    logger.info('Finished parsing data')
 
-    logger.info('Start mapping data to phenopackets')
-    if debug:
-        phenopackets = map_chunk(df, cur_time[:10])
-    else:
-        phenopackets = map_mc4r2phenopackets(df, cur_time[:10])
-    logger.info('Finished mapping data to phenopackets')
+def parse(df: pl.DataFrame, settings: Settings) -> pl.DataFrame:
+    """Parses the columns of a DataFrame in erker format (mc4r) required for the
+    phenopacket creation
 
-    # Write to JSON
-    if out_dir_name:
-        phenopackets_out_dir = phenopackets_out / out_dir_name  # create dir for output
-    else:
-        phenopackets_out_dir = phenopackets_out / cur_time  # create dir for output
+    Expects the `mc4r_id` column to be present, see `preprocess()`.
 
-    logger.info(f'Writing phenopackets to {phenopackets_out_dir.resolve()}')
-    write_files(phenopackets, phenopackets_out_dir)
-    logger.info(f'Successfully wrote {len(phenopackets)} files to disk')
-    logger.info('Finished mc4r pipeline')
+    :param df: DataFrame in erker format
+    :type df: pl.DataFrame
+    :param settings: The settings
+    :type settings: Settings
+    :return: The parsed DataFrame
+    :rtype: pl.DataFrame
+    """
+    # Parsing step
+    logger.info('Start parsing data for phenopacket creation')
+    df = polars_utils.apply_column_specs(df, mc4r_column_specs(settings))
+    logger.info('Finished parsing data')
+    return df
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+
+import polars as pl
+from loguru import logger
+
+# formats of the data in erker format (mc4r) by file extension
+INPUT_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'ipc',
+    '.ipc': 'ipc',
+    '.feather': 'ipc',
+}
+
+# The columns of the erker data read by the pipeline, with their types. All other
+# columns are not used by `mc4r_column_specs()` and `map_chunk()`, and are never
+# read. `.csv` files are read with these types instead of inferring them.
+ERKER_DTYPES: Dict[str, pl.PolarsDataType] = {
+    # dropped by `preprocess()`
+    'record_id': pl.Utf8,
+    # year of birth, sex, date of diagnosis, diagnosis (ORPHA)
+    'sct_184099003_y': pl.Int64,
+    'sct_281053000': pl.Utf8,
+    'sct_432213005': pl.Utf8,
+    'sct_439401001_orpha': pl.Utf8,
+    # Primärdiagnose OMIM
+    **{f'sct_439401001_omim_g_{i}': pl.Utf8 for i in range(1, 3)},
+    # zygosity, mutation p.HGVS, mutation c.HGVS
+    **{f'{col}_{i}': pl.Utf8
+       for col in ('ln_48007_9', 'ln_48005_3', 'ln_48004_6') for i in range(1, 4)},
+    # phenotype classification, date and status of phenotype determination
+    **{f'sct_8116006_{i}{suffix}': pl.Utf8
+       for i in range(1, 6) for suffix in ('', '_date', '_status')},
+}
+
+
+def input_format(data_path: Union[str, Path]) -> str:
+    """Returns the format of data in erker format by its file extension
+
+    :param data_path: The path to the data
+    :type data_path: Union[str, Path]
+    :return: Either 'csv', 'parquet' or 'ipc' (Arrow IPC / Feather)
+    :rtype: str
+    :raises ValueError: If the file extension is not supported
+    """
+    suffix = Path(data_path).suffix.lower()
+    if suffix not in INPUT_FORMATS:
+        logger.error(f'File extension {suffix} of {data_path} not supported, use one '
+                     f'of {list(INPUT_FORMATS)}')
+        raise ValueError(f'File extension {suffix} of {data_path} not supported, use '
+                         f'one of {list(INPUT_FORMATS)}')
+    return INPUT_FORMATS[suffix]
+
+
+def scan_erker(data_path: Union[str, Path]) -> pl.LazyFrame:
+    """Lazily scans data in erker format (mc4r) from a `.csv`, Parquet or Arrow IPC
+    file
+
+    Only the columns of `ERKER_DTYPES` are selected, so only they are read from
+    Parquet and Arrow IPC files and parsed from `.csv` files (projection pushdown).
+    The types of `.csv` files are not inferred, all columns are read as strings
+    except the overrides of `ERKER_DTYPES`. The columns of Parquet and Arrow IPC
+    files are cast to the types of `ERKER_DTYPES`. Missing columns are skipped, like
+    the optional columns of `mc4r_column_specs()`.
+
+    :param data_path: The path to the data
+    :type data_path: Union[str, Path]
+    :return: The columns of the data used by the pipeline
+    :rtype: pl.LazyFrame
+    :raises ValueError: If the file extension is not supported
+    """
+    data_format = input_format(data_path)
+    if data_format == 'csv':
+        lf = pl.scan_csv(data_path, dtypes=ERKER_DTYPES, infer_schema_length=0)
+    elif data_format == 'parquet':
+        lf = pl.scan_parquet(data_path)
+    else:
+        lf = pl.scan_ipc(data_path, memory_map=True)
+
+    return lf.select(_cast(_erker_columns(lf.columns)))
+
+
+def read_erker(data_path: Union[str, Path]) -> pl.DataFrame:
+    """Reads data in erker format (mc4r), see `scan_erker()`
+
+    :param data_path: The path to the data
+    :type data_path: Union[str, Path]
+    :return: The columns of the data used by the pipeline
+    :rtype: pl.DataFrame
+    :raises ValueError: If the file extension is not supported
+    """
+    return scan_erker(data_path).collect()
+
+
+def iter_erker_batches(data_path: Union[str, Path],
+                       batch_size: int) -> Iterator[pl.DataFrame]:
+    """Reads data in erker format (mc4r) in batches of at most `batch_size` rows,
+    see `scan_erker()`
+
+    :param data_path: The path to the data
+    :type data_path: Union[str, Path]
+    :param batch_size: Maximum number of rows per batch
+    :type batch_size: int
+    :return: Iterator over the batches
+    :rtype: Iterator[pl.DataFrame]
+    :raises ValueError: If the file extension is not supported
+    """
+    if input_format(data_path) == 'csv':
+        columns = _erker_columns(pl.scan_csv(data_path, infer_schema_length=0).columns)
+        # read as strings and cast afterwards, the batched reader of polars applies
+        # `dtypes` to the wrong columns if only some columns are read
+        reader = pl.read_csv_batched(data_path, columns=columns,
+                                     infer_schema_length=0, batch_size=batch_size)
+        # the batch size of the reader is only a hint, its batches are sliced to
+        # `batch_size` rows and the rest is carried over to the next batch
+        rest = None
+        while batches := reader.next_batches(1):
+            batch = batches[0].select(_cast(columns))
+            if rest is not None:
+                batch = pl.concat([rest, batch])
+            while batch.height >= batch_size:
+                yield batch.slice(0, batch_size)
+                batch = batch.slice(batch_size)
+            rest = batch
+        if rest is not None and rest.height:
+            yield rest
+        return
+
+    # Parquet and Arrow IPC files are sliced, which only reads the row groups or
+    # record batches of the slice
+    lf = scan_erker(data_path)
+    num_rows = lf.select(pl.len()).collect().item()
+    for offset in range(0, num_rows, batch_size):
+        yield lf.slice(offset, batch_size).collect()
+
+
+def _erker_columns(columns: List[str]) -> List[str]:
+    """Returns the columns of the data that are used by the pipeline"""
+    return [col for col in columns if col in ERKER_DTYPES]
+
+
+def _cast(columns: List[str]) -> List[pl.Expr]:
+    return [pl.col(col).cast(ERKER_DTYPES[col]) for col in columns]
@@ -0,0 +1,9 @@
+from .settings import Settings, PathSettings, NoValueSettings, ConstantSettings, \
+    ResourceSettings, CLICommandSettings, PlaceholderSettings, load_settings, \
+    CONFIG_PATH, PACKAGE_DIR
+
+__all__ = [
+    'Settings', 'PathSettings', 'NoValueSettings', 'ConstantSettings',
+    'ResourceSettings', 'CLICommandSettings', 'PlaceholderSettings',
+    'load_settings', 'CONFIG_PATH', 'PACKAGE_DIR',
+]
@@ -0,0 +1,144 @@
+import configparser
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Tuple, Union
+
+from loguru import logger
+
+# the top level ERKER2Phenopackets package, the config file and the paths in it are
+# resolved relative to it instead of the current working directory
+PACKAGE_DIR = Path(__file__).resolve().parents[2]
+CONFIG_PATH = PACKAGE_DIR / 'data' / 'config' / 'config.cfg'
+
+
+class PathSettings(NamedTuple):
+    """The `Paths` section of the config file, as absolute paths"""
+    mc4r_path: Path
+    synth_data_path: Path
+    phenopackets_out: Path
+    test_phenopackets_out: Path
+    log_path: Path
+    validation_cache: Path
+    frame_cache: Path
+    jar_path: Path
+
+
+class NoValueSettings(NamedTuple):
+    """The `NoValue` section of the config file, codes of missing values"""
+    omim: str
+    mutation: str
+    phenotype: str
+    date: str
+    recorded: str
+
+
+class ConstantSettings(NamedTuple):
+    """The `Constants` section of the config file"""
+    variant_descriptor_ids: Tuple[str, ...]
+    gene_descriptor_symbol: str
+    disease_label: str
+    creator_tag: str
+    interpretation_status: str
+    progress_status: str
+
+
+class ResourceSettings(NamedTuple):
+    """The `Resources` section of the config file, one item per resource"""
+    formal_names: Tuple[str, ...]
+    namespace_prefixes: Tuple[str, ...]
+    urls: Tuple[str, ...]
+    versions: Tuple[str, ...]
+    iri_prefixes: Tuple[str, ...]
+
+
+class CLICommandSettings(NamedTuple):
+    """The `CLICommands` section of the config file"""
+    validate: str
+
+
+class PlaceholderSettings(NamedTuple):
+    """The `Placeholders` section of the config file"""
+    jar_path: str
+    phenopacket_json_path: str
+
+
+class Settings(NamedTuple):
+    """The settings of the project, one field per section of the config file
+
+    Settings are immutable and hashable, they can be passed to worker processes and
+    used as keys of caches. Use `load_settings()` to read them, and `_replace()` to
+    derive modified settings, e.g. in tests.
+
+    Example:
+        >>> settings = load_settings()
+        >>> settings.no_value.omim
+        'NO_OMIM'
+    """
+    paths: PathSettings
+    no_value: NoValueSettings
+    constants: ConstantSettings
+    resources: ResourceSettings
+    cli_commands: CLICommandSettings
+    placeholders: PlaceholderSettings
+
+
+@lru_cache(maxsize=None)
+def load_settings(config_path: Union[str, Path] = CONFIG_PATH) -> Settings:
+    """Reads the settings from the config file
+
+    The settings are cached, so every config file is read only once per process. The
+    paths of the config file are resolved relative to the package, so the settings
+    do not depend on the current working directory.
+
+    :param config_path: Path to the config file, defaults to the config file of the
+        package
+    :type config_path: Union[str, Path], optional
+    :return: The settings
+    :rtype: Settings
+    :raises FileNotFoundError: If the config file does not exist
+    """
+    if not Path(config_path).is_file():
+        logger.error(f'Could not find config file {config_path}')
+        raise FileNotFoundError(f'Could not find config file {config_path}')
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    logger.trace(f'Read config file {config_path}')
+
+    return Settings(
+        paths=PathSettings(**{field: _path(config, field)
+                              for field in PathSettings._fields}),
+        no_value=NoValueSettings(**{field: config.get('NoValue', field)
+                                    for field in NoValueSettings._fields}),
+        constants=ConstantSettings(
+            variant_descriptor_ids=_items(config, 'Constants',
+                                          'variant_descriptor_ids'),
+            **{field: config.get('Constants', field)
+               for field in ConstantSettings._fields[1:]},
+        ),
+        resources=ResourceSettings(**{field: _items(config, 'Resources', field)
+                                      for field in ResourceSettings._fields}),
+        cli_commands=CLICommandSettings(validate=config.get('CLICommands', 'validate')),
+        placeholders=PlaceholderSettings(**{field: config.get('Placeholders', field)
+                                            for field in PlaceholderSettings._fields}),
+    )
+
+
+def _path(config: configparser.ConfigParser, option: str) -> Path:
+    """Resolves a path of the config file
+
+    The `<option>_script` variant of a path and the jar path are relative to the
+    directory of the package, the other paths are relative to the modules in `src`.
+    """
+    script_path = config.get('Paths', f'{option}_script', fallback=None)
+    if script_path is not None or option == 'jar_path':
+        path = PACKAGE_DIR.parent / (script_path or config.get('Paths', option))
+    else:
+        path = Path(__file__).parent / config.get('Paths', option)
+    return Path(os.path.normpath(path))
+
+
+def _items(config: configparser.ConfigParser, section: str,
+           option: str) -> Tuple[str, ...]:
+    # split like before, the whitespace after the commas is kept
+    return tuple(config.get(section, option).split(','))
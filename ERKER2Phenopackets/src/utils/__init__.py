@@ -1,29 +1,42 @@
-from .io import write_files, write_file, read_files, read_file
+from .io import write_files, write_file, read_files, read_file, atomic_output_dir
+from .io import iter_files
+from .io import write_bundle, read_bundle, bundle_file_name, BUNDLE_FORMATS
 
-from .parallelization_utils import calc_chunk_size, split_dataframe
+from .parallelization_utils import calc_chunk_size, split_dataframe, \
+    dataframe2ipc_bytes, ipc_bytes2dataframe, EXECUTORS, init_worker_process
 
 from .parsing_utils import parse_date_string_to_protobuf_timestamp, \
     parse_year_month_day_to_protobuf_timestamp, \
     parse_date_string_to_iso8601_utc_timestamp, \
     parse_year_month_day_to_iso8601_utc_timestamp, \
-    parse_iso8601_utc_to_protobuf_timestamp
+    parse_iso8601_utc_to_protobuf_timestamp, \
+    parse_date_string_to_iso8601_utc_timestamp_expr, raise_on_invalid_date_strings, \
+    parse_year_to_iso8601_utc_timestamp_expr
 
 from .last_phenopackets import last_phenopackets_dir
 from .validate_phenopackets import validate
+from .prevalidate_phenopackets import prevalidate, prevalidate_phenopackets
+from .validation_cache import ValidationCache
+from .frame_cache import FrameCache, frame_cache_key
 from .delete_files_in_folder import delete_files_in_folder
 
 __all__ = [
-    'write_file', 'write_files', 'read_file', 'read_files',
+    'write_file', 'write_files', 'read_file', 'read_files', 'atomic_output_dir',
+    'iter_files', 'write_bundle', 'read_bundle', 'bundle_file_name', 'BUNDLE_FORMATS',
 
-    'calc_chunk_size', 'split_dataframe',
+    'calc_chunk_size', 'split_dataframe', 'dataframe2ipc_bytes', 'ipc_bytes2dataframe',
+    'EXECUTORS', 'init_worker_process',
 
     'parse_date_string_to_protobuf_timestamp',
     'parse_year_month_day_to_protobuf_timestamp',
     'parse_date_string_to_iso8601_utc_timestamp', 
     'parse_year_month_day_to_iso8601_utc_timestamp',
     'parse_iso8601_utc_to_protobuf_timestamp',
+    'parse_date_string_to_iso8601_utc_timestamp_expr', 'raise_on_invalid_date_strings',
+    'parse_year_to_iso8601_utc_timestamp_expr',
 
-    'validate',
+    'validate', 'prevalidate', 'prevalidate_phenopackets', 'ValidationCache',
+    'FrameCache', 'frame_cache_key',
   
     'delete_files_in_folder',
 
@@ -1,11 +1,10 @@
 import argparse
-import configparser
-from pathlib import Path
 
 from loguru import logger
 
 from ERKER2Phenopackets.src.utils import delete_files_in_folder
 from ERKER2Phenopackets.src.logging_ import setup_logging
+from ERKER2Phenopackets.src.settings import load_settings
 
 
 def clear_dir(all_: bool, experimental: bool, publish: bool):
@@ -26,12 +25,9 @@ def clear_dir(all_: bool, experimental: bool, publish: bool):
     """
     logger.trace(f'Called clear_dir() with args: {all_=}, {experimental=}, {publish=}')
 
-    logger.trace('Reading config file')
-    config = configparser.ConfigParser()
-    config.read('ERKER2Phenopackets/data/config/config.cfg')
-
-    test_out = Path(config.get('Paths', 'test_phenopackets_out_script'))
-    prod_out = Path(config.get('Paths', 'phenopackets_out_script'))
+    paths = load_settings().paths
+    test_out = paths.test_phenopackets_out
+    prod_out = paths.phenopackets_out
     json_suffix = '.json'
 
     if all_:
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Union
+
+import polars as pl
+from loguru import logger
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_SUFFIX = '.arrow'
+
+
+def frame_cache_key(*parts: str) -> str:
+    """Returns the key of a cached DataFrame, the SHA-256 of everything it depends on
+
+    Example:
+        >>> frame_cache_key(file_digest(data_path), config_hash(config), version)
+
+    :param parts: e.g. digests of the input file, the config and the code
+    :type parts: str
+    :return: The hex digest
+    :rtype: str
+    """
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+class FrameCache:
+    """Persistent cache of DataFrames, stored as uncompressed Arrow IPC files
+
+    Cached DataFrames are memory mapped instead of being read, so loading them does
+    not copy their data. Every DataFrame is stored in its own file `<key>.arrow` in
+    the cache directory, the modification time of a file is the time it was last
+    used. The files hold at most `max_bytes` bytes, the least recently used files are
+    evicted first.
+
+    Example:
+        >>> cache = FrameCache('data/cache/frames')
+        >>> df = cache.get(key)
+        >>> if df is None:
+        ...     df = expensive_preprocessing()
+        ...     cache.put(key, df)
+
+    :param path: The cache directory, created if it does not exist
+    :type path: Union[str, Path]
+    :param max_bytes: Maximum size of the cached files, defaults to 2 GiB
+    :type max_bytes: int, optional
+    :raises ValueError: If max_bytes is smaller than 1
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 1:
+            logger.error(f'max_bytes must be greater than 0, got {max_bytes}')
+            raise ValueError(f'max_bytes must be greater than 0, got {max_bytes}')
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[pl.DataFrame]:
+        """Returns the cached DataFrame of a key, memory mapped, and marks it as used
+
+        :param key: The key, see `frame_cache_key()`
+        :type key: str
+        :return: The DataFrame, None if it is not cached
+        :rtype: Optional[pl.DataFrame]
+        """
+        file_path = self._file_path(key)
+        try:
+            os.utime(file_path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pl.read_ipc(file_path, memory_map=True)
+
+    def put(self, key: str, df: pl.DataFrame) -> None:
+        """Stores a DataFrame and evicts the least recently used DataFrames above
+        `max_bytes`
+
+        :param key: The key, see `frame_cache_key()`
+        :type key: str
+        :param df: The DataFrame
+        :type df: pl.DataFrame
+        """
+        file_path = self._file_path(key)
+        # written under a temporary name, so that a concurrent `get()` never reads a
+        # partially written file
+        tmp_path = file_path.with_name(f'.{file_path.name}.{os.getpid()}.tmp')
+        df.write_ipc(tmp_path, compression='uncompressed')
+        os.replace(tmp_path, file_path)
+        self._evict()
+
+    def size(self) -> int:
+        """Returns the size of the cached files in bytes"""
+        return sum(file_path.stat().st_size for file_path in self._files())
+
+    def __len__(self) -> int:
+        return len(self._files())
+
+    def _file_path(self, key: str) -> Path:
+        return self.path / f'{key}{_SUFFIX}'
+
+    def _files(self) -> List[Path]:
+        return list(self.path.glob(f'*{_SUFFIX}'))
+
+    def _evict(self) -> None:
+        entries = sorted(((file_path, file_path.stat()) for file_path in self._files()),
+                         key=lambda entry: entry[1].st_mtime_ns)
+        size = sum(stat.st_size for _, stat in entries)
+        for file_path, stat in entries:
+            if size <= self.max_bytes:
+                break
+            logger.debug(f'Evicting {file_path.name} ({stat.st_size} bytes) from the '
+                         f'frame cache {self.path}')
+            # a memory mapped file stays readable after it is removed
+            file_path.unlink(missing_ok=True)
+            size -= stat.st_size
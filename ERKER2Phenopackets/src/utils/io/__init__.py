@@ -1,15 +1,23 @@
 from .phenopackets2json import write_phenopackets2json_files as write_files, \
-    write_phenopacket2json_file as write_file
+    write_phenopacket2json_file as write_file, atomic_output_dir
 
 from .json2phenopackets import read_json_files2phenopackets as read_files, \
-    read_json_file2phenopacket as read_file
+    read_json_file2phenopacket as read_file, \
+    iter_json_files2phenopackets as iter_files
 
-from .phenopackets2dict import phenopacket2dict
+from .phenopackets_bundle import write_phenopackets2bundle as write_bundle, \
+    read_bundle2phenopackets as read_bundle, iter_bundle, PhenopacketBundle, \
+    bundle_file_name, BUNDLE_FORMATS
+
+from .phenopackets2dict import phenopacket2dict, message_fields
 
 __all__ = [
-    'write_file', 'write_files',
+    'write_file', 'write_files', 'atomic_output_dir',
+
+    'read_file', 'read_files', 'iter_files',
 
-    'read_file', 'read_files',
+    'write_bundle', 'read_bundle', 'iter_bundle', 'PhenopacketBundle',
+    'bundle_file_name', 'BUNDLE_FORMATS',
 
-    'phenopacket2dict',
+    'phenopacket2dict', 'message_fields',
 ]
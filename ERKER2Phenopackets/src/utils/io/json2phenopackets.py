@@ -1,11 +1,16 @@
+import multiprocessing
 import os
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Union
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
 from loguru import logger
 from phenopackets import Phenopacket
 from google.protobuf.json_format import Parse
 
+from ..parallelization_utils import EXECUTORS, init_worker_process
+
 
 def read_json_file2phenopacket(file_path: Union[str, Path]) -> Phenopacket:
     """Reads a Phenopacket from a JSON file.
@@ -22,19 +27,155 @@ def read_json_file2phenopacket(file_path: Union[str, Path]) -> Phenopacket:
         return phenopacket
 
 
-def read_json_files2phenopackets(dir_path: Union[str, Path]) -> List[Phenopacket]:
+def read_json_files2phenopackets(
+        dir_path: Union[str, Path],
+        num_workers: int = 1,
+        executor: str = 'thread',
+) -> List[Phenopacket]:
     """Reads a list of Phenopackets from JSON files in a directory.
 
+    The Phenopackets are ordered by file name, see `iter_json_files2phenopackets()`.
+
     :param dir_path: The directory containing JSON files.
     :type dir_path: Union[str, Path]
+    :param num_workers: Number of threads or processes parsing the files, defaults to 1
+    :type num_workers: int, optional
+    :param executor: Either 'thread' or 'process', defaults to 'thread'
+    :type executor: str, optional
     :return: The list of loaded Phenopackets.
     :rtype: List[Phenopacket]
     """
     logger.trace(f'Called read_json_files2phenopackets in {dir_path}')
-    phenopackets_list = []
-    for file_name in os.listdir(dir_path):
-        if file_name.endswith('.json'):
-            file_path = os.path.join(dir_path, file_name)
-            phenopacket = read_json_file2phenopacket(file_path)
-            phenopackets_list.append(phenopacket)
-    return phenopackets_list
+    return list(iter_json_files2phenopackets(dir_path, num_workers=num_workers,
+                                             executor=executor))
+
+
+def iter_json_files2phenopackets(
+        dir_path: Union[str, Path],
+        num_workers: int = 1,
+        executor: str = 'thread',
+        prefetch: Optional[int] = None,
+        ids: Optional[Iterable[str]] = None,
+        file_filter: Optional[Callable[[str], bool]] = None,
+) -> Iterator[Phenopacket]:
+    """Lazily reads the Phenopackets from JSON files in a directory.
+
+    The directory is scanned once, the files are parsed on a pool of `num_workers`
+    threads or processes. At most `prefetch` files are parsed ahead of the consumer,
+    so only a bounded number of Phenopackets is held in memory. Parsing is pure
+    Python, use `executor='process'` to use more than one core.
+
+    The Phenopackets are yielded in the order of their file names, numeric file
+    names (as written by the pipeline) in numeric order.
+
+    Files are selected before they are parsed: `ids` keeps only the files named
+    `<id>.json`, `file_filter` is called with the file name.
+
+    :param dir_path: The directory containing JSON files.
+    :type dir_path: Union[str, Path]
+    :param num_workers: Number of threads or processes parsing the files, defaults to 1
+    :type num_workers: int, optional
+    :param executor: Either 'thread' or 'process', defaults to 'thread'
+    :type executor: str, optional
+    :param prefetch: Maximum number of files parsed ahead, defaults to four per worker
+    :type prefetch: int, optional
+    :param ids: Only read the Phenopackets with these ids, defaults to all
+    :type ids: Iterable[str], optional
+    :param file_filter: Only read the files for which this returns True, defaults to
+        all
+    :type file_filter: Callable[[str], bool], optional
+    :return: Iterator over the Phenopackets
+    :rtype: Iterator[Phenopacket]
+    :raises ValueError: If executor is not 'thread' or 'process' or prefetch is
+        smaller than 1
+    """
+    if executor not in EXECUTORS:
+        logger.error(f'Executor {executor} not supported, use one of {EXECUTORS}')
+        raise ValueError(f'Executor {executor} not supported, use one of {EXECUTORS}')
+    num_workers = max(1, num_workers)
+    prefetch = prefetch or 4 * num_workers
+    if prefetch < 1:
+        logger.error(f'prefetch must be greater than 0, got {prefetch}')
+        raise ValueError(f'prefetch must be greater than 0, got {prefetch}')
+
+    file_paths = _scan_json_files(dir_path, ids, file_filter)
+    logger.trace(f'Reading {len(file_paths)} JSON files from {dir_path} with '
+                 f'{num_workers} {executor} workers')
+
+    if num_workers == 1:
+        for file_path in file_paths:
+            yield read_json_file2phenopacket(file_path)
+        return
+
+    if executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=num_workers)
+        read = read_json_file2phenopacket
+    else:
+        pool = ProcessPoolExecutor(max_workers=num_workers,
+                                   mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_worker_process)
+        read = _read_json_file2serialized_phenopacket
+
+    try:
+        for result in _map_prefetched(pool, read, file_paths, prefetch):
+            if executor == 'thread':
+                yield result
+            else:
+                yield Phenopacket.FromString(result)
+    finally:
+        # the consumer may stop early, the files not yet started are skipped
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _scan_json_files(
+        dir_path: Union[str, Path],
+        ids: Optional[Iterable[str]],
+        file_filter: Optional[Callable[[str], bool]],
+) -> List[str]:
+    """Returns the paths of the selected JSON files in a directory, ordered by name"""
+    ids = set(ids) if ids is not None else None
+    selected: List[Tuple[Tuple, str]] = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith('.json') or not entry.is_file():
+                continue
+            stem = name[:-len('.json')]
+            if ids is not None and stem not in ids:
+                continue
+            if file_filter is not None and not file_filter(name):
+                continue
+            selected.append((_file_name_key(stem), entry.path))
+    selected.sort()
+    return [path for _, path in selected]
+
+
+def _file_name_key(stem: str) -> Tuple:
+    """Sorts numeric file names numerically before all other file names"""
+    if stem.isdigit():
+        return 0, int(stem), stem
+    return 1, 0, stem
+
+
+def _map_prefetched(pool: Executor, fn: Callable, items: List,
+                    prefetch: int) -> Iterator:
+    """Yields `fn(item)` for each item in order, with at most `prefetch` calls
+    submitted to the pool ahead of the consumer"""
+    pending = deque()
+    items = iter(items)
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) == prefetch:
+            break
+    while pending:
+        result = pending.popleft().result()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            break
+        yield result
+
+
+def _read_json_file2serialized_phenopacket(file_path: str) -> bytes:
+    """Reads a Phenopacket from a JSON file and returns it in the protobuf wire format,
+    executed in the worker processes of `iter_json_files2phenopackets()`"""
+    return read_json_file2phenopacket(file_path).SerializeToString()
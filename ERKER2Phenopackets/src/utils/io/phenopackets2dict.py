@@ -1,9 +1,149 @@
+import base64
+import copy
+import math
+from functools import lru_cache
+from typing import Any, Callable, Dict, Tuple, Type
+
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.message import Message
 from phenopackets import Phenopacket
-from google.protobuf.json_format import MessageToJson
-from json import loads
 
-from typing import Dict
+_INT64_TYPES = (FieldDescriptor.CPPTYPE_INT64, FieldDescriptor.CPPTYPE_UINT64)
+
+# number of distinct well-known type messages whose conversion is cached
+FALLBACK_CACHE_SIZE = 4096
 
 
 def phenopacket2dict(phenopacket: Phenopacket) -> Dict:
-    return loads(MessageToJson(phenopacket))
+    """Converts a phenopacket to a dictionary, e.g. for the tree comparison
+
+    The fields of the message are walked directly through its descriptor
+    (`ListFields()`), without serializing the phenopacket to JSON and parsing it
+    again. The dictionary is the same as the one of `MessageToDict()` and of
+    parsing the JSON of `MessageToJson()`: camel case keys, only set fields, enums
+    by name and 64 bit integers as strings. Well-known types, like the timestamps
+    of the meta data, are converted by `MessageToDict()`, cached by their content.
+
+    :param phenopacket: A phenopacket, or any other protobuf message
+    :type phenopacket: Phenopacket
+    :return: The dictionary
+    :rtype: Dict
+    """
+    return _message2dict(phenopacket)
+
+
+def message_fields(message: Message) -> Any:
+    """Converts the fields of a message like `phenopacket2dict()`, but keeps its
+    nested messages as they are
+
+    Used to walk messages lazily, e.g. by `first_mismatch()`, converting a nested
+    message only when it is visited. Converting every nested message of the result
+    with `message_fields()` gives the dictionary of `phenopacket2dict()`.
+
+    :param message: A phenopacket or any other protobuf message
+    :type message: Message
+    :return: The dictionary of the fields, or the value of a well-known type
+    :rtype: Any
+    """
+    return _message2dict(message, deep=False)
+
+
+def _message2dict(message: Message, deep: bool = True) -> Any:
+    if message.DESCRIPTOR.file.name.startswith('google/protobuf/'):
+        # well-known types have their own JSON representation
+        return _cached_message2dict(type(message), message.SerializeToString(
+            deterministic=True))
+
+    d = {}
+    try:
+        for field, value in message.ListFields():
+            name, convert = _field_converter(field, deep)
+            d[name] = convert(value)
+    except _Fallback:
+        return MessageToDict(message)
+    return d
+
+
+class _Fallback(Exception):
+    """Raised for values whose conversion is left to `MessageToDict()`"""
+
+
+@lru_cache(maxsize=None)
+def _field_converter(field: FieldDescriptor,
+                     deep: bool) -> Tuple[str, Callable[[Any], Any]]:
+    """Returns the key and the conversion of the values of a field, computed once
+    per field of the descriptors"""
+    if field.is_extension:
+        return f'[{field.full_name}]', _value_converter(field, deep)
+    if field.message_type is not None and field.message_type.GetOptions().map_entry:
+        convert_item = _value_converter(field.message_type.fields_by_name['value'],
+                                        deep)
+        return field.json_name, lambda value: {
+            _map_key(key): convert_item(item) for key, item in value.items()
+        }
+    if field.label == FieldDescriptor.LABEL_REPEATED:
+        convert_item = _value_converter(field, deep)
+        if convert_item is _identity:
+            return field.json_name, list
+        return field.json_name, lambda value: [convert_item(item) for item in value]
+    return field.json_name, _value_converter(field, deep)
+
+
+def _value_converter(field: FieldDescriptor, deep: bool) -> Callable[[Any], Any]:
+    """Returns the conversion of a single value of a field like `MessageToDict()`,
+    nested messages are only converted if `deep`"""
+    cpp_type = field.cpp_type
+    if cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+        return _message2dict if deep else _identity
+    if cpp_type == FieldDescriptor.CPPTYPE_ENUM:
+        if field.enum_type.full_name == 'google.protobuf.NullValue':
+            return lambda _: None
+        names = {number: value.name
+                 for number, value in field.enum_type.values_by_number.items()}
+        return lambda value: names.get(value, value)
+    if field.type == FieldDescriptor.TYPE_BYTES:
+        return lambda value: base64.b64encode(value).decode('utf-8')
+    if cpp_type in _INT64_TYPES:
+        return str
+    if cpp_type == FieldDescriptor.CPPTYPE_FLOAT:
+        return _fallback
+    if cpp_type == FieldDescriptor.CPPTYPE_DOUBLE:
+        return _finite_double
+    if cpp_type == FieldDescriptor.CPPTYPE_BOOL:
+        return bool
+    return _identity
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _fallback(_: Any) -> Any:
+    # single precision floats have their own JSON representation
+    raise _Fallback()
+
+
+def _finite_double(value: float) -> float:
+    if not math.isfinite(value):
+        # NaN and infinity have their own JSON representation
+        raise _Fallback()
+    return value
+
+
+def _map_key(key: Any) -> str:
+    if isinstance(key, bool):
+        return 'true' if key else 'false'
+    return str(key)
+
+
+@lru_cache(maxsize=FALLBACK_CACHE_SIZE)
+def _cached_message2dict_uncopied(message_type: Type[Message],
+                                  serialized: bytes) -> Any:
+    return MessageToDict(message_type.FromString(serialized))
+
+
+def _cached_message2dict(message_type: Type[Message], serialized: bytes) -> Any:
+    result = _cached_message2dict_uncopied(message_type, serialized)
+    # the cached result must not be modified through the returned dictionary
+    return copy.deepcopy(result) if isinstance(result, (dict, list)) else result
@@ -1,11 +1,17 @@
+import multiprocessing
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Union
+from typing import Iterator, List, Union
 
 from loguru import logger
 from phenopackets import Phenopacket
 from google.protobuf.json_format import MessageToJson
 
+from ..parallelization_utils import EXECUTORS, calc_chunk_size, init_worker_process
+
 
 def _map_phenopacket2json_str(phenopacket: Phenopacket) -> str:
     """Maps a phenopacket to a JSON string.
@@ -23,39 +29,202 @@ def _map_phenopacket2json_str(phenopacket: Phenopacket) -> str:
 
 def write_phenopacket2json_file(
         phenopacket: Phenopacket,
-        out_dr: Union[str, Path]
-                                ) -> None:
+        out_dr: Union[str, Path],
+        fsync: bool = False,
+) -> None:
     """Writes a phenopacket to a JSON file.
 
     :param phenopacket: The phenopacket.
     :type phenopacket: Phenopacket
     :param out_dr: The output directory.
     :type out_dr: Union[str, Path]
+    :param fsync: Flush the file to the disk before returning, defaults to False
+    :type fsync: bool, optional
     """
-    json_str = _map_phenopacket2json_str(phenopacket)
+    json_bytes = _map_phenopacket2json_str(phenopacket).encode('utf-8')
     out_path = os.path.join(out_dr, (phenopacket.id + '.json'))
-    with open(out_path, 'w') as fh:
-        fh.write(json_str)
-        logger.trace(f'Successfully wrote phenopacket to JSON {out_dr}')
+    # the encoded file is written with a single write call
+    with open(out_path, 'wb') as fh:
+        fh.write(json_bytes)
+        if fsync:
+            fh.flush()
+            os.fsync(fh.fileno())
 
 
 def write_phenopackets2json_files(
-        phenopackets_list: List[Phenopacket], out_dir: Union[str, Path]) -> None:
+        phenopackets_list: List[Phenopacket],
+        out_dir: Union[str, Path],
+        num_workers: int = 1,
+        executor: str = 'thread',
+        fsync: bool = False,
+) -> None:
     """Writes a list of phenopackets to JSON files.
 
+    The list is split into one chunk per worker, each worker serializes and writes the
+    phenopackets of its chunk. Serializing to JSON is pure Python, use
+    `executor='process'` to use more than one core. The phenopackets are shipped to the
+    worker processes in the protobuf wire format.
+
+    By default the files are left to the page cache of the operating system. With
+    `fsync=True` every file and the output directory are flushed to the disk.
+
     :param phenopackets_list: The list of phenopackets.
     :type phenopackets_list: List[Phenopacket]
     :param out_dir: The output directory.
     :type out_dir: Union[str, Path]
+    :param num_workers: Number of threads or processes, defaults to 1
+    :type num_workers: int, optional
+    :param executor: Either 'thread' or 'process', defaults to 'thread'
+    :type executor: str, optional
+    :param fsync: Flush the files to the disk, defaults to False
+    :type fsync: bool, optional
+    :raises ValueError: If executor is not 'thread' or 'process'
     """
     logger.trace(f'Called write_phenopackets2json_files with {len(phenopackets_list)}')
+    if executor not in EXECUTORS:
+        logger.error(f'Executor {executor} not supported, use one of {EXECUTORS}')
+        raise ValueError(f'Executor {executor} not supported, use one of {EXECUTORS}')
+
     # Make sure output out_dr exists.
     logger.trace(f'Creating output directory {out_dir}')
     os.makedirs(out_dir, exist_ok=True)
     logger.trace(f'Successfully created output directory {out_dir}')
 
-    logger.trace(f'Started loop to write phenopackets to JSON in {out_dir}')
+    if not phenopackets_list:
+        return
+
+    num_workers = max(1, min(num_workers, len(phenopackets_list)))
+    chunks = []
+    start = 0
+    for chunk_size in calc_chunk_size(num_instances=len(phenopackets_list),
+                                      num_chunks=num_workers):
+        chunks.append(phenopackets_list[start:start + chunk_size])
+        start += chunk_size
+
+    logger.trace(f'Writing phenopackets to JSON in {out_dir} with {num_workers} '
+                 f'{executor} workers')
+    if num_workers == 1:
+        _write_chunk(chunks[0], out_dir, fsync)
+    elif executor == 'thread':
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            list(pool.map(_write_chunk, chunks, [out_dir] * len(chunks),
+                          [fsync] * len(chunks)))
+    else:
+        serialized_chunks = [[phenopacket.SerializeToString() for phenopacket in chunk]
+                             for chunk in chunks]
+        with ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker_process,
+        ) as pool:
+            list(pool.map(_write_serialized_chunk, serialized_chunks,
+                          [str(out_dir)] * len(chunks), [fsync] * len(chunks)))
+
+    if fsync:
+        _fsync_dir(out_dir)
+    logger.trace(f'Finished writing phenopackets to JSON in {out_dir}')
+
+
+def _write_chunk(phenopackets_list: List[Phenopacket], out_dir: Union[str, Path],
+                 fsync: bool) -> None:
+    """Writes a chunk of phenopackets, executed by the workers of
+    `write_phenopackets2json_files()`"""
     for phenopacket in phenopackets_list:
-        write_phenopacket2json_file(phenopacket, out_dir)
-    logger.trace(f'Finished loop to write phenopackets to JSON in {out_dir}')
+        write_phenopacket2json_file(phenopacket, out_dir, fsync)
+
+
+def _write_serialized_chunk(serialized_phenopackets: List[bytes], out_dir: str,
+                            fsync: bool) -> None:
+    """Parses and writes a chunk of serialized phenopackets, executed in the worker
+    processes of `write_phenopackets2json_files()`"""
+    for serialized_phenopacket in serialized_phenopackets:
+        write_phenopacket2json_file(Phenopacket.FromString(serialized_phenopacket),
+                                    out_dir, fsync)
+
+
+def _fsync_dir(dir_path: Union[str, Path]) -> None:
+    """Flushes the entries of a directory to the disk, a no-op on Windows"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_output_dir(out_dir: Union[str, Path], fsync: bool = False,
+                      merge: bool = False) -> Iterator[Path]:
+    """Context manager that publishes an output directory only once it is complete.
+
+    Yields a hidden temporary directory next to `out_dir`. If the block finishes
+    without an exception, the temporary directory is renamed to `out_dir`, so readers
+    never see a half-written run. If the block raises, the temporary directory is
+    removed and `out_dir` is left untouched.
+
+    An existing `out_dir` is replaced by the new one: it is renamed away, the
+    temporary directory is renamed into its place and the old directory is deleted,
+    including files that were not written by the block. Between the two renames
+    `out_dir` does not exist. With `merge`, the files of the temporary directory are
+    instead moved into an existing `out_dir` one by one, replacing files of the same
+    name and keeping all other files. Every file is replaced atomically, but readers
+    may see a mix of old and new files until all of them are moved.
+
+    Example:
+        >>> with atomic_output_dir('out/run') as tmp_dir:
+        ...     write_phenopackets2json_files(phenopackets, tmp_dir)
+
+    :param out_dir: The output directory.
+    :type out_dir: Union[str, Path]
+    :param fsync: Flush the parent directory to the disk after the rename, defaults to
+        False
+    :type fsync: bool, optional
+    :param merge: Merge into an existing `out_dir` instead of replacing it, defaults
+        to False
+    :type merge: bool, optional
+    :return: The temporary directory to write to.
+    :rtype: Iterator[Path]
+    """
+    out_dir = Path(out_dir)
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = out_dir.parent / f'.{out_dir.name}.tmp-{os.getpid()}'
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir()
+    logger.trace(f'Writing to temporary directory {tmp_dir}')
+
+    try:
+        yield tmp_dir
+    except BaseException:
+        logger.error(f'Writing to {out_dir} failed, removing {tmp_dir}')
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if out_dir.exists() and merge:
+        logger.info(f'Merging into existing output directory {out_dir}')
+        _merge_dir(tmp_dir, out_dir)
+        if fsync:
+            _fsync_dir(out_dir)
+    elif out_dir.exists():
+        logger.warning(f'Replacing existing output directory {out_dir}')
+        old_dir = out_dir.parent / f'.{out_dir.name}.old-{os.getpid()}'
+        os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.rename(tmp_dir, out_dir)
+    if fsync:
+        _fsync_dir(out_dir.parent)
+    logger.trace(f'Published {tmp_dir} as {out_dir}')
+
 
+def _merge_dir(src_dir: Path, dst_dir: Path) -> None:
+    """Moves the entries of a directory into another directory and removes it"""
+    for entry in src_dir.iterdir():
+        target = dst_dir / entry.name
+        if entry.is_dir() and target.is_dir():
+            _merge_dir(entry, target)
+        else:
+            os.replace(entry, target)
+    src_dir.rmdir()
@@ -0,0 +1,284 @@
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from loguru import logger
+from phenopackets import Phenopacket
+from google.protobuf.json_format import MessageToJson, Parse
+
+# newline-delimited JSON, one phenopacket per line
+NDJSON = 'ndjson'
+# binary protobuf messages, each preceded by its length as a varint (the same framing
+# as `writeDelimitedTo()` of the Java protobuf library)
+PB_STREAM = 'pb'
+BUNDLE_FORMATS = [NDJSON, PB_STREAM]
+
+# the sidecar index holds one "<id>\t<offset>\t<length>\n" line per phenopacket, the
+# offset and length of the serialized phenopacket within the bundle in bytes
+INDEX_SUFFIX = '.idx'
+
+
+def bundle_file_name(bundle_format: str) -> str:
+    """Returns the default file name of a bundle, e.g. `phenopackets.ndjson`
+
+    :param bundle_format: Either 'ndjson' or 'pb'
+    :type bundle_format: str
+    :return: The file name
+    :rtype: str
+    :raises ValueError: If the format is not supported
+    """
+    _check_format(bundle_format)
+    return f'phenopackets.{bundle_format}'
+
+
+def index_path(bundle_path: Union[str, Path]) -> Path:
+    """Returns the path of the sidecar index of a bundle
+
+    :param bundle_path: Path to the bundle
+    :type bundle_path: Union[str, Path]
+    :return: Path to the index
+    :rtype: Path
+    """
+    bundle_path = Path(bundle_path)
+    return bundle_path.with_name(bundle_path.name + INDEX_SUFFIX)
+
+
+def write_phenopackets2bundle(
+        phenopackets_list: Iterable[Phenopacket],
+        bundle_path: Union[str, Path],
+        append: bool = False,
+        fsync: bool = False,
+) -> int:
+    """Writes phenopackets to a single bundle file and its sidecar index.
+
+    The format is either newline-delimited JSON ('ndjson') or a length-prefixed stream
+    of binary protobuf messages ('pb'), determined by the suffix of `bundle_path`, see
+    `bundle_file_name()`. With `append=True` the phenopackets are added
+    to an existing bundle, e.g. to write a bundle batch by batch.
+
+    :param phenopackets_list: The phenopackets.
+    :type phenopackets_list: Iterable[Phenopacket]
+    :param bundle_path: Path to the bundle file.
+    :type bundle_path: Union[str, Path]
+    :param append: Append to an existing bundle, defaults to False
+    :type append: bool, optional
+    :param fsync: Flush the bundle and the index to the disk, defaults to False
+    :type fsync: bool, optional
+    :return: The number of phenopackets written
+    :rtype: int
+    :raises ValueError: If the format is not supported
+    """
+    bundle_path = Path(bundle_path)
+    bundle_format = bundle_path.suffix.lstrip('.')
+    _check_format(bundle_format)
+    logger.trace(f'Writing phenopackets to {bundle_format} bundle {bundle_path}')
+
+    mode = 'ab' if append else 'wb'
+    num_written = 0
+    with open(bundle_path, mode) as bundle_fh, \
+            open(index_path(bundle_path), mode) as index_fh:
+        offset = bundle_fh.tell()
+        index_lines = []
+        for phenopacket in phenopackets_list:
+            if bundle_format == NDJSON:
+                record = MessageToJson(phenopacket, indent=None).encode('utf-8')
+                prefix, suffix = b'', b'\n'
+            else:
+                record = phenopacket.SerializeToString()
+                prefix, suffix = _encode_varint(len(record)), b''
+            bundle_fh.write(prefix + record + suffix)
+            offset += len(prefix)
+            index_lines.append(f'{phenopacket.id}\t{offset}\t{len(record)}\n')
+            offset += len(record) + len(suffix)
+            num_written += 1
+        index_fh.write(''.join(index_lines).encode('utf-8'))
+        if fsync:
+            for fh in (bundle_fh, index_fh):
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    logger.trace(f'Wrote {num_written} phenopackets to {bundle_path}')
+    return num_written
+
+
+def read_bundle2phenopackets(bundle_path: Union[str, Path]) -> List[Phenopacket]:
+    """Reads all phenopackets of a bundle in the order they were written.
+
+    The index is not needed to read the whole bundle.
+
+    :param bundle_path: Path to the bundle file.
+    :type bundle_path: Union[str, Path]
+    :return: The list of loaded Phenopackets.
+    :rtype: List[Phenopacket]
+    """
+    return list(iter_bundle(bundle_path))
+
+
+def iter_bundle(bundle_path: Union[str, Path]) -> Iterator[Phenopacket]:
+    """Lazily reads the phenopackets of a bundle in the order they were written.
+
+    :param bundle_path: Path to the bundle file.
+    :type bundle_path: Union[str, Path]
+    :return: Iterator over the phenopackets
+    :rtype: Iterator[Phenopacket]
+    :raises ValueError: If the format is not supported
+    """
+    bundle_path = Path(bundle_path)
+    bundle_format = bundle_path.suffix.lstrip('.')
+    _check_format(bundle_format)
+
+    with open(bundle_path, 'rb') as fh:
+        for _, record in _iter_records(fh, bundle_format):
+            yield _parse_record(record, bundle_format)
+
+
+class PhenopacketBundle:
+    """Random access to the phenopackets of a bundle by their id.
+
+    Loads the sidecar index on construction, every lookup reads only the bytes of the
+    requested phenopacket. If the index is missing it is rebuilt by a scan over the
+    bundle.
+
+    Example:
+        >>> with PhenopacketBundle('out/run/phenopackets.pb') as bundle:
+        ...     phenopacket = bundle['42']
+
+    :param bundle_path: Path to the bundle file.
+    :type bundle_path: Union[str, Path]
+    :raises ValueError: If the format is not supported
+    """
+
+    def __init__(self, bundle_path: Union[str, Path]):
+        self.path = Path(bundle_path)
+        self.format = self.path.suffix.lstrip('.')
+        _check_format(self.format)
+        self._index = _read_index(self.path)
+        self._fh = open(self.path, 'rb')
+
+    def __getitem__(self, phenopacket_id: str) -> Phenopacket:
+        offset, length = self._index[phenopacket_id]
+        self._fh.seek(offset)
+        return _parse_record(_read_record(self._fh, length), self.format)
+
+    def __contains__(self, phenopacket_id: str) -> bool:
+        return phenopacket_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[Phenopacket]:
+        return (self[phenopacket_id] for phenopacket_id in self._index)
+
+    def ids(self) -> List[str]:
+        """Returns the ids of the phenopackets in the order they were written"""
+        return list(self._index)
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> 'PhenopacketBundle':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _read_index(bundle_path: Path) -> Dict[str, Tuple[int, int]]:
+    """Reads the sidecar index of a bundle, rebuilds it if it does not exist"""
+    path = index_path(bundle_path)
+    if not path.exists():
+        logger.warning(f'Index {path} not found, rebuilding it')
+        _rebuild_index(bundle_path)
+
+    index = {}
+    with open(path, 'r', encoding='utf-8') as fh:
+        for line in fh:
+            phenopacket_id, offset, length = line.rstrip('\n').split('\t')
+            index[phenopacket_id] = (int(offset), int(length))
+    return index
+
+
+def _rebuild_index(bundle_path: Path) -> None:
+    """Writes the sidecar index of a bundle by scanning the bundle"""
+    bundle_format = bundle_path.suffix.lstrip('.')
+    index_lines = []
+    with open(bundle_path, 'rb') as fh:
+        for offset, record in _iter_records(fh, bundle_format):
+            phenopacket_id = _parse_record(record, bundle_format).id
+            index_lines.append(f'{phenopacket_id}\t{offset}\t{len(record)}\n')
+    with open(index_path(bundle_path), 'wb') as fh:
+        fh.write(''.join(index_lines).encode('utf-8'))
+
+
+def _iter_records(fh, bundle_format: str) -> Iterator[Tuple[int, bytes]]:
+    """Yields the offset and the bytes of each serialized phenopacket of a bundle"""
+    offset = 0
+    if bundle_format == NDJSON:
+        for line in fh:
+            record = line.rstrip(b'\n')
+            if record.strip():
+                yield offset, record
+            offset += len(line)
+    else:
+        while True:
+            length = _read_varint(fh)
+            if length is None:
+                return
+            offset = fh.tell()
+            yield offset, _read_record(fh, length)
+
+
+def _read_record(fh, length: int) -> bytes:
+    """Reads a serialized phenopacket of `length` bytes from a binary file"""
+    record = fh.read(length)
+    # a protobuf message cut between two fields still parses, without the missing
+    # fields
+    if len(record) != length:
+        logger.error('Truncated record at the end of the bundle')
+        raise ValueError('Truncated record at the end of the bundle')
+    return record
+
+
+def _parse_record(record: bytes, bundle_format: str) -> Phenopacket:
+    """Parses a single serialized phenopacket of a bundle"""
+    if bundle_format == NDJSON:
+        phenopacket = Phenopacket()
+        Parse(record, phenopacket)
+        return phenopacket
+    return Phenopacket.FromString(record)
+
+
+def _encode_varint(value: int) -> bytes:
+    """Encodes a non-negative integer as a protobuf varint"""
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _read_varint(fh) -> Union[int, None]:
+    """Reads a protobuf varint from a binary file, returns None at the end of the
+    file"""
+    value = 0
+    shift = 0
+    while True:
+        byte = fh.read(1)
+        if not byte:
+            if shift:
+                logger.error('Truncated length prefix at the end of the bundle')
+                raise ValueError('Truncated length prefix at the end of the bundle')
+            return None
+        value |= (byte[0] & 0x7f) << shift
+        if not byte[0] & 0x80:
+            return value
+        shift += 7
+
+
+def _check_format(bundle_format: str) -> None:
+    if bundle_format not in BUNDLE_FORMATS:
+        logger.error(f'Bundle format {bundle_format} not supported, use one of '
+                     f'{BUNDLE_FORMATS}')
+        raise ValueError(f'Bundle format {bundle_format} not supported, use one of '
+                         f'{BUNDLE_FORMATS}')
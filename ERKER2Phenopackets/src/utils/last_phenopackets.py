@@ -1,9 +1,10 @@
-import configparser
 import os
 from pathlib import Path
 
 from loguru import logger
 
+from ERKER2Phenopackets.src.settings import load_settings
+
 
 def last_phenopackets_dir() -> Path:
     """Returns the path to the last created phenopackets directory.
@@ -13,12 +14,11 @@ def last_phenopackets_dir() -> Path:
     :return: Path to the last created phenopackets directory
     :rtype: Path
     """
-    config = configparser.ConfigParser()
-    config.read('ERKER2Phenopackets/data/config/config.cfg')
+    paths = load_settings().paths
 
     out_dirs = [
-        Path(config.get('Paths', 'phenopackets_out_script')),
-        Path(config.get('Paths', 'test_phenopackets_out_script'))
+        paths.phenopackets_out,
+        paths.test_phenopackets_out,
     ]
 
     return last_created_dir(*out_dirs)
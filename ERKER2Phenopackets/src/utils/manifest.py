@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+import polars as pl
+from loguru import logger
+
+from ERKER2Phenopackets.src.settings import Settings
+
+# hidden and without the .json suffix, so it is not read as a phenopacket
+MANIFEST_FILE_NAME = '.manifest'
+# bump when the content of the manifest or the row hashes change
+MANIFEST_VERSION = 2
+
+_NULL = '\u0000'
+_SEPARATOR = '\u001f'
+
+
+class Manifest(NamedTuple):
+    """Describes the phenopackets of an output directory
+
+    :ivar config_hash: Hash of the config the phenopackets were created with, see
+        `config_hash()`
+    :ivar code_version: Version of the code the phenopackets were created with, e.g.
+        `mapping_version()` of the pipeline
+    :ivar output_format: The output format of the pipeline, e.g. 'json'
+    :ivar row_hashes: Content hash of the source row of each phenopacket, by
+        phenopacket id, see `row_hashes()`
+    """
+    config_hash: str
+    code_version: str
+    output_format: str
+    row_hashes: Dict[str, str]
+
+
+def config_hash(settings: Settings) -> str:
+    """Returns the SHA-256 of all settings that affect the content of the
+    phenopackets
+
+    The paths are not hashed, moving the output or the log directory does not change
+    the phenopackets.
+
+    :param settings: The settings, see `load_settings()`
+    :type settings: Settings
+    :return: The hex digest
+    :rtype: str
+    """
+    content = {section: values._asdict()
+               for section, values in settings._asdict().items() if section != 'paths'}
+    return hashlib.sha256(
+        json.dumps([MANIFEST_VERSION, content], sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
+def row_hashes(df: pl.DataFrame, id_col: str,
+               exclude: Optional[List[str]] = None,
+               columns: Optional[List[str]] = None) -> Dict[str, str]:
+    """Returns the SHA-256 of the values of each row, by the id of the row
+
+    The `columns` (all columns by default) except `id_col` and `exclude` are hashed,
+    in the order of their names, so the hashes do not depend on the order of the
+    columns. A new or removed column changes the hash of every row.
+
+    :param df: The DataFrame
+    :type df: pl.DataFrame
+    :param id_col: The column with the ids of the rows
+    :type id_col: str
+    :param exclude: Columns that are not hashed, defaults to None
+    :type exclude: List[str], optional
+    :param columns: Columns that are hashed, defaults to all columns
+    :type columns: List[str], optional
+    :return: The hex digests by row id
+    :rtype: Dict[str, str]
+    """
+    exclude = set(exclude or []) | {id_col}
+    cols = sorted(col for col in (df.columns if columns is None else columns)
+                  if col not in exclude)
+    header = _SEPARATOR.join(cols) + '\n'
+    rows = df.select(
+        pl.col(id_col).cast(pl.Utf8),
+        pl.concat_str([pl.col(col).cast(pl.Utf8).fill_null(_NULL) for col in cols],
+                      separator=_SEPARATOR).alias('row'),
+    )
+    return {
+        row_id: hashlib.sha256((header + row).encode('utf-8')).hexdigest()
+        for row_id, row in rows.iter_rows()
+    }
+
+
+def diff_row_hashes(old: Dict[str, str],
+                    new: Dict[str, str]) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Compares the row hashes of two manifests
+
+    :param old: The row hashes of the previous run
+    :type old: Dict[str, str]
+    :param new: The row hashes of the current run
+    :type new: Dict[str, str]
+    :return: The ids of the new or changed rows, of the unchanged rows and of the
+        removed rows
+    :rtype: Tuple[Set[str], Set[str], Set[str]]
+    """
+    changed = {row_id for row_id, digest in new.items() if old.get(row_id) != digest}
+    unchanged = new.keys() - changed
+    removed = old.keys() - new.keys()
+    return changed, unchanged, removed
+
+
+def read_manifest(out_dir: Union[str, Path]) -> Optional[Manifest]:
+    """Reads the manifest of an output directory
+
+    :param out_dir: The output directory
+    :type out_dir: Union[str, Path]
+    :return: The manifest or None if the directory has no readable manifest
+    :rtype: Optional[Manifest]
+    """
+    path = Path(out_dir) / MANIFEST_FILE_NAME
+    if not path.is_file():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            content = json.load(fh)
+        if content.get('version') != MANIFEST_VERSION:
+            logger.warning(f'Manifest {path} has version {content.get("version")}, '
+                           f'expected {MANIFEST_VERSION}')
+            return None
+        return Manifest(content['config_hash'], content['code_version'],
+                        content['output_format'], content['row_hashes'])
+    except (ValueError, KeyError) as e:
+        logger.warning(f'Ignoring unreadable manifest {path}: {e}')
+        return None
+
+
+def write_manifest(out_dir: Union[str, Path], manifest: Manifest,
+                   fsync: bool = False) -> None:
+    """Writes the manifest of an output directory
+
+    :param out_dir: The output directory
+    :type out_dir: Union[str, Path]
+    :param manifest: The manifest
+    :type manifest: Manifest
+    :param fsync: Flush the manifest to the disk, defaults to False
+    :type fsync: bool, optional
+    """
+    content = {'version': MANIFEST_VERSION, **manifest._asdict()}
+    with open(Path(out_dir) / MANIFEST_FILE_NAME, 'w', encoding='utf-8') as fh:
+        json.dump(content, fh)
+        if fsync:
+            fh.flush()
+            os.fsync(fh.fileno())
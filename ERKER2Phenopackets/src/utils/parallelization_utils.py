@@ -1,6 +1,11 @@
+import io
+import sys
 from typing import List
 
 import polars as pl
+from loguru import logger
+
+EXECUTORS = ['thread', 'process']
 
 
 def calc_chunk_size(num_instances: int, num_chunks: int) -> List[int]:
@@ -49,3 +54,42 @@ def split_dataframe(df: pl.DataFrame, chunk_sizes: List[int]) -> List[pl.DataFra
         for i in range(len(chunk_sizes))
     ]
     return [df.slice(start, length) for (start, length) in chunk_intervals]
+
+
+def dataframe2ipc_bytes(df: pl.DataFrame) -> bytes:
+    """
+    Serialize a DataFrame to Arrow IPC bytes.
+
+    Used to ship chunks of a DataFrame to worker processes without pickling the
+    individual rows.
+    :param df: DataFrame
+    :type df: pl.DataFrame
+    :return: Arrow IPC representation of the DataFrame
+    :rtype: bytes
+    """
+    buffer = io.BytesIO()
+    df.write_ipc(buffer)
+    return buffer.getvalue()
+
+
+def ipc_bytes2dataframe(ipc_bytes: bytes) -> pl.DataFrame:
+    """
+    Deserialize Arrow IPC bytes created by `dataframe2ipc_bytes` to a DataFrame.
+    :param ipc_bytes: Arrow IPC representation of a DataFrame
+    :type ipc_bytes: bytes
+    :return: DataFrame
+    :rtype: pl.DataFrame
+    """
+    return pl.read_ipc(io.BytesIO(ipc_bytes))
+
+
+def init_worker_process() -> None:
+    """
+    Configures logging in a freshly spawned worker process.
+
+    Spawned processes do not inherit the sinks of the parent, only warnings and errors
+    of the workers are reported on stderr. Pass it as `initializer` to a
+    `ProcessPoolExecutor`.
+    """
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
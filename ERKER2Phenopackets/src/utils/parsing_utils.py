@@ -1,11 +1,17 @@
-import configparser
 from datetime import datetime
 from typing import Union
 
+import polars as pl
 from google.protobuf.timestamp_pb2 import Timestamp
 from google.protobuf import timestamp_pb2
 from loguru import logger
 
+from ERKER2Phenopackets.src.logging_ import trace_enabled
+from ERKER2Phenopackets.src.settings import load_settings
+
+# the part of "%Y-%m-%d" that datetime.strptime accepts, but chrono would not reject
+DATE_STRING_PATTERN = r'^\d{4}-\d{1,2}-\d{1,2}$'
+
 
 def parse_date_string_to_protobuf_timestamp(date_string: str) -> Timestamp:
     """ Parses a date string in format "YYYY-MM-DD" to a protobuf Timestamp object
@@ -15,7 +21,8 @@ def parse_date_string_to_protobuf_timestamp(date_string: str) -> Timestamp:
     :return: A protobuf Timestamp object
     :rtype: Timestamp
     """
-    logger.trace(f'Parsing date string {date_string} to protobuf timestamp')
+    if trace_enabled():
+        logger.trace(f'Parsing date string {date_string} to protobuf timestamp')
     iso8601_utc_timestamp = parse_date_string_to_iso8601_utc_timestamp(date_string)
     return parse_iso8601_utc_to_protobuf_timestamp(iso8601_utc_timestamp)
 
@@ -29,8 +36,9 @@ def parse_iso8601_utc_to_protobuf_timestamp(iso8601_utc_timestamp: str) -> Times
     :return: A protobuf Timestamp object
     :rtype: Timestamp
     """
-    logger.trace(f'Parsing iso8601 utc timestamp {iso8601_utc_timestamp} to protobuf '
-                 f'timestamp')
+    if trace_enabled():
+        logger.trace(f'Parsing iso8601 utc timestamp {iso8601_utc_timestamp} to '
+                     'protobuf timestamp')
     timestamp = timestamp_pb2.Timestamp()
     timestamp.FromJsonString(iso8601_utc_timestamp)
     return timestamp
@@ -46,12 +54,12 @@ def parse_date_string_to_iso8601_utc_timestamp(date_string: str) -> str:
     :return: a Timestamp object in iso8601 utc format
     :rtype: str
     """
-    logger.trace(f'Parsing date string {date_string} to iso8601 utc timestamp')
+    if trace_enabled():
+        logger.trace(f'Parsing date string {date_string} to iso8601 utc timestamp')
     if date_string is None or date_string == '':
-        logger.trace('No date string provided. using NO_DATE from config file')
-        config = configparser.ConfigParser()
-        config.read('../../data/config/config.cfg')
-        return config.get('NoValue', 'date')
+        if trace_enabled():
+            logger.trace('No date string provided. using NO_DATE from config file')
+        return load_settings().no_value.date
     try:
         stripped = datetime.strptime(date_string, "%Y-%m-%d")
         formatted = stripped.strftime("%Y-%m-%dT00:00:00.00Z")
@@ -63,6 +71,55 @@ def parse_date_string_to_iso8601_utc_timestamp(date_string: str) -> str:
                          f'{date_string}')
 
 
+def parse_date_string_to_iso8601_utc_timestamp_expr(date_col: str) -> pl.Expr:
+    """ Vectorized version of `parse_date_string_to_iso8601_utc_timestamp`
+
+    Returns a polars expression parsing a column of date strings in format
+    "YYYY-MM-DD" to ISO8601 UTC timestamps. Null values and empty strings evaluate to
+    null, so they can be filled with NO_DATE afterwards. Invalid dates also evaluate
+    to null, use `raise_on_invalid_date_strings` on the result to detect them.
+
+    :param date_col: Name of the column with date strings in format "YYYY-MM-DD"
+    :type date_col: str
+    :return: Expression evaluating to ISO8601 UTC timestamps
+    :rtype: pl.Expr
+    """
+    date_string = pl.col(date_col)
+    return pl.when(
+        date_string.str.contains(DATE_STRING_PATTERN)
+    ).then(
+        date_string
+        .str.strptime(pl.Date, '%Y-%m-%d', strict=False, exact=True)
+        .dt.strftime('%Y-%m-%dT00:00:00.00Z')
+    )
+
+
+def raise_on_invalid_date_strings(df: pl.DataFrame, date_col: str, parsed_col: str):
+    """ Raises the error of `parse_date_string_to_iso8601_utc_timestamp` for the first
+    date string that could not be parsed by
+    `parse_date_string_to_iso8601_utc_timestamp_expr`
+
+    :param df: DataFrame containing the date strings and the parsed timestamps
+    :type df: pl.DataFrame
+    :param date_col: Name of the column with date strings
+    :type date_col: str
+    :param parsed_col: Name of the column with the parsed timestamps
+    :type parsed_col: str
+    :raises ValueError: If a date string is not in "YYYY-MM-DD" format
+    """
+    invalid = df.select(date_col, parsed_col).filter(
+        pl.col(date_col).is_not_null()
+        & (pl.col(date_col) != '')
+        & pl.col(parsed_col).is_null()
+    )
+    if invalid.height:
+        date_string = invalid[date_col][0]
+        logger.error(f'Invalid date format. Please use YYYY-MM-DD format. Got'
+                     f' {date_string}')
+        raise ValueError(f'Invalid date format. Please use YYYY-MM-DD format. Got '
+                         f'{date_string}')
+
+
 def parse_year_month_day_to_protobuf_timestamp(
         year: Union[str, int],
         month: Union[str, int],
@@ -78,8 +135,9 @@ def parse_year_month_day_to_protobuf_timestamp(
     :return: A protobuf Timestamp object
     :rtype: Timestamp
     """
-    logger.trace(f'Parsing year {year}, month {month} and day {day} to protobuf '
-                 'timestamp')
+    if trace_enabled():
+        logger.trace(f'Parsing year {year}, month {month} and day {day} to protobuf '
+                     'timestamp')
     iso8601_utc_timestamp = parse_year_month_day_to_iso8601_utc_timestamp(
         year,
         month,
@@ -104,8 +162,9 @@ def parse_year_month_day_to_iso8601_utc_timestamp(
     :rtype: str
     :raises: ValueError: If month is not between 1 and 12 or day is not between 1 and 31
     """
-    logger.trace(f'Parsing year {year}, month {month} and day {day} to iso8601 utc '
-                 f'timestamp')
+    if trace_enabled():
+        logger.trace(f'Parsing year {year}, month {month} and day {day} to iso8601 utc '
+                     f'timestamp')
     if isinstance(year, str):
         year = int(year)
     if isinstance(month, str):
@@ -122,3 +181,20 @@ def parse_year_month_day_to_iso8601_utc_timestamp(
     formatted_date = f'{year:04d}-{month:02d}-{day:02d}T00:00:00.00Z'
 
     return formatted_date
+
+
+def parse_year_to_iso8601_utc_timestamp_expr(year_col: str) -> pl.Expr:
+    """ Returns a polars expression parsing a column of years to ISO8601 UTC
+    timestamps of the first of January of that year
+
+    Vectorized version of `parse_year_month_day_to_iso8601_utc_timestamp(year, 1, 1)`
+
+    :param year_col: Name of the column with years
+    :type year_col: str
+    :return: Expression evaluating to ISO8601 UTC timestamps
+    :rtype: pl.Expr
+    """
+    return pl.format(
+        '{}-01-01T00:00:00.00Z',
+        pl.col(year_col).cast(pl.Int64).cast(pl.Utf8).str.zfill(4)
+    )
@@ -1,4 +1,5 @@
-from typing import List, Union, Dict, Any, Callable, Type
+from typing import List, Union, Dict, Any, Callable, Type, Optional, NamedTuple, \
+    Tuple
 import warnings
 
 import polars as pl
@@ -78,6 +79,26 @@ def get_all_null_cols(df: pl.DataFrame) -> List[str]:
     ).select('variable').to_series().to_list()
 
 
+def scan_all_null_cols(lf: pl.LazyFrame) -> List[str]:
+    """
+    Get names of all columns that have only null values without loading the data
+
+    Streaming counterpart of `get_all_null_cols`, the LazyFrame is evaluated in
+    batches, so the data does not have to fit into memory.
+    :param lf: LazyFrame, e.g. created by `pl.scan_csv`
+    :type lf: pl.LazyFrame
+    :return: List of column names with only null values
+    :rtype: List[str]
+    """
+    return lf.select(
+        pl.all()
+        .is_null()
+        .all()
+    ).collect(streaming=True).melt().filter(
+        pl.col('value')  # == True
+    ).select('variable').to_series().to_list()
+
+
 def get_any_null_cols(df: pl.DataFrame) -> List[str]:
     """
     Get names of all columns that have any null values
@@ -129,7 +150,8 @@ def get_num_rows(df: pl.DataFrame) -> int:
 
 def add_id_col(df: pl.DataFrame,
                id_col_name: str,
-               id_prefix: str = None, id_suffix: str = None, id_datatype: Type = int
+               id_prefix: str = None, id_suffix: str = None, id_datatype: Type = int,
+               id_offset: int = 0
                ) -> pl.DataFrame:
     """
     Add id column to DataFrame
@@ -139,6 +161,9 @@ def add_id_col(df: pl.DataFrame,
     id_suffix = '_id'
     id_col = 'row_{i}_id' for i in range(0, df.height)
 
+    When a large DataFrame is processed in batches, `id_offset` can be set to the
+    number of rows of the previous batches to keep the ids unique.
+
     :param df: DataFrame
     :type df: pl.DataFrame
     :param id_col_name: Name of id column
@@ -150,28 +175,31 @@ def add_id_col(df: pl.DataFrame,
     :param id_datatype: the datatype of the id column, if id_suffix and id_prefix are 
         not specified
     :type id_datatype: Type
+    :param id_offset: the first id, defaults to 0
+    :type id_offset: int
     :return: DataFrame with id column
     :rtype: pl.DataFrame
     """
+    id_range = range(id_offset, id_offset + df.height)
     if not id_prefix and not id_suffix:
         if id_datatype == int:
-            df = df.with_columns((pl.Series(range(0, df.height))).alias(id_col_name))
+            df = df.with_columns((pl.Series(id_range)).alias(id_col_name))
         elif id_datatype == str:
-            ids = [str(i) for i in range(0, df.height)]
+            ids = [str(i) for i in id_range]
             df = df.with_columns((pl.Series(ids)).alias(id_col_name))
         else:
             raise ValueError(f'id_datatype has to be int or str, not {id_datatype}')
     elif id_prefix and not id_suffix:
         df = df.with_columns((pl.Series(
-            f'{id_prefix}{i}' for i in range(0, df.height)
+            f'{id_prefix}{i}' for i in id_range
         )).alias(id_col_name))
     elif not id_prefix and id_suffix:
         df = df.with_columns((pl.Series(
-            f'{i}{id_suffix}' for i in range(0, df.height)
+            f'{i}{id_suffix}' for i in id_range
         )).alias(id_col_name))
     else:
         df = df.with_columns((pl.Series(
-            f'{id_prefix}{i}{id_suffix}' for i in range(0, df.height)
+            f'{id_prefix}{i}{id_suffix}' for i in id_range
         )).alias(id_col_name))
 
     # move id column to front
@@ -183,7 +211,8 @@ def map_col(
         df: pl.DataFrame,
         map_from: Union[str, List[str]], map_to: str,
         mapping: Union[Dict[Any, Any], Callable[[...], Any]],
-        default: Any = None) -> pl.DataFrame:
+        default: Any = None,
+        return_dtype: Optional[pl.PolarsDataType] = None) -> pl.DataFrame:
     """
     Map values in column to new values using dictionary or mapping function
 
@@ -216,6 +245,9 @@ def map_col(
     :type mapping: Union[Dict[Any, Any], Callable[[...], Any]]
     :param default: the default value to use if no match is found in the dictionary
     :type default: Any
+    :param return_dtype: the datatype returned by a mapping function. Required if the
+        column may only contain null values, e.g. when mapping a batch of the data
+    :type return_dtype: Optional[pl.PolarsDataType]
     :return: the dataframe with the new column
     :rtype: pl.DataFrame
     :raises: ValueError: if map_from is a list and mapping is a dictionary
@@ -234,12 +266,12 @@ def map_col(
         if isinstance(map_from, str):  # one column
             return _map_col_function(df=df,
                                      col_name=map_from, new_col_name=map_to,
-                                     function=mapping
+                                     function=mapping, return_dtype=return_dtype
                                      )
         elif isinstance(map_from, list):  # multiple columns
             return _map_cols_function(df=df,
                                       col_names=map_from, new_col_name=map_to,
-                                      function=mapping
+                                      function=mapping, return_dtype=return_dtype
                                       )
 
 
@@ -271,7 +303,9 @@ def _map_col_dict(df: pl.DataFrame,
 
 def _map_col_function(df: pl.DataFrame,
                       col_name: str, new_col_name: str,
-                      function: Callable[[...], Any]) -> pl.DataFrame:
+                      function: Callable[[...], Any],
+                      return_dtype: Optional[pl.PolarsDataType] = None
+                      ) -> pl.DataFrame:
     """
     Map values in column to new values using function
 
@@ -285,17 +319,21 @@ def _map_col_function(df: pl.DataFrame,
     :type new_col_name: str
     :param function: a function to mapping with
     :type function: Callable[[...], Any]
+    :param return_dtype: the datatype returned by the function
+    :type return_dtype: Optional[pl.PolarsDataType]
     :return: the dataframe with the new column
     :rtype: pl.DataFrame
     """
     return df.with_columns(
-        pl.col(col_name).apply(function).alias(new_col_name)
+        pl.col(col_name).apply(function, return_dtype=return_dtype).alias(new_col_name)
     )
 
 
 def _map_cols_function(df: pl.DataFrame,
                        col_names: List[str], new_col_name: str,
-                       function: Callable[[...], Any]) -> pl.DataFrame:
+                       function: Callable[[...], Any],
+                       return_dtype: Optional[pl.PolarsDataType] = None
+                       ) -> pl.DataFrame:
     """
     Map values in multiple columns to new values using function
 
@@ -309,11 +347,14 @@ def _map_cols_function(df: pl.DataFrame,
     :type new_col_name: str
     :param function: a function to mapping with
     :type function: Callable[[...], Any]
+    :param return_dtype: the datatype returned by the function
+    :type return_dtype: Optional[pl.PolarsDataType]
     :return: the dataframe with the new column
     :rtype: pl.DataFrame
     """
     return df.with_columns(
-        pl.struct(col_names).apply(function).alias(new_col_name)
+        pl.struct(col_names).apply(function, return_dtype=return_dtype)
+        .alias(new_col_name)
     )
 
 
@@ -332,3 +373,142 @@ def fill_null_vals(df: pl.DataFrame, col: str, value: Any) -> pl.DataFrame:
     return df.with_columns(
         pl.col(col).fill_null(value=value)
     )
+
+
+class ColumnSpec(NamedTuple):
+    """
+    Declarative description of a single mapping or filling step of a preprocessing
+    plan, see `compile_column_specs` and `apply_column_specs`
+
+    Example:
+    ColumnSpec(source='sex', target='parsed_sex', mapping={'m': 'MALE'})
+    ColumnSpec(source='mutation', fill_value='NO_MUTATION', optional=True)
+
+    :ivar source: name of the column to map from
+    :ivar target: name of the column to create, defaults to `source` (in place)
+    :ivar mapping: a dictionary or a function returning a polars expression when
+        called with the name of the source column. If None, the values are kept
+    :ivar default: the default value to use if no match is found in the dictionary
+    :ivar fill_value: value to fill the null values of the target column with
+    :ivar optional: if True, the step is skipped when the source column is missing
+    :ivar check: function raising an error for invalid values. Called with the
+        resulting DataFrame, the name of the source column and the name of a column
+        containing the mapped values before filling null values
+    """
+    source: str
+    target: Optional[str] = None
+    mapping: Union[Dict[Any, Any], Callable[[str], pl.Expr], None] = None
+    default: Any = None
+    fill_value: Any = None
+    optional: bool = False
+    check: Optional[Callable[[pl.DataFrame, str, str], None]] = None
+
+
+def _unchecked_col_name(spec: ColumnSpec) -> str:
+    """
+    Get the name of the column holding the mapped values of a spec before filling
+    null values
+
+    Helper function for compile_column_specs
+
+    :param spec: the column spec
+    :type spec: ColumnSpec
+    :return: name of the column checked by `spec.check`
+    :rtype: str
+    """
+    target = spec.target or spec.source
+    if spec.check is not None and spec.fill_value is not None:
+        return f'__unchecked_{target}'
+    return target
+
+
+def compile_column_specs(lf: pl.LazyFrame, specs: List[ColumnSpec],
+                         columns: List[str]) -> Tuple[pl.LazyFrame, List[ColumnSpec]]:
+    """
+    Compile column specs into a single lazy query
+
+    Specs are grouped into as few `with_columns` stages as possible. A spec is only
+    put into a later stage if it reads or overwrites a column written by an earlier
+    spec, so the result is the same as applying the specs one after another. Within a
+    stage polars evaluates the expressions in parallel.
+
+    :param lf: LazyFrame to apply the specs to
+    :type lf: pl.LazyFrame
+    :param specs: the column specs in order of application
+    :type specs: List[ColumnSpec]
+    :param columns: the columns of the LazyFrame, used to skip optional specs
+    :type columns: List[str]
+    :return: the LazyFrame with the query plan and the specs that were not skipped
+    :rtype: Tuple[pl.LazyFrame, List[ColumnSpec]]
+    :raises: ValueError: if the source column of a required spec is missing
+    """
+    stages: List[List[pl.Expr]] = []
+    written_in: Dict[str, int] = {}  # column -> stage it was last written in
+    read_in: Dict[str, int] = {}  # column -> last stage it was read in
+    compiled = []
+    for spec in specs:
+        if spec.source not in columns and spec.source not in written_in:
+            if spec.optional:
+                logger.trace(f'Skipping optional column {spec.source}')
+                continue
+            logger.error(f'Required column {spec.source} is missing')
+            raise ValueError(f'Required column {spec.source} is missing')
+        target = spec.target or spec.source
+
+        unchecked = _unchecked_col_name(spec)
+
+        stage = max(written_in.get(spec.source, -1) + 1,
+                    written_in.get(target, -1) + 1,
+                    read_in.get(target, 0))
+        # the unchecked values are filled in the next stage to not map them twice
+        fill_stage = stage + 1 if unchecked != target else stage
+        written_in[target] = fill_stage
+        read_in[spec.source] = max(read_in.get(spec.source, 0), stage)
+        while len(stages) <= fill_stage:
+            stages.append([])
+
+        if isinstance(spec.mapping, dict):
+            expr = pl.col(spec.source).map_dict(spec.mapping, default=spec.default)
+        elif callable(spec.mapping):
+            expr = spec.mapping(spec.source)
+        else:
+            expr = pl.col(spec.source)
+
+        if unchecked != target:
+            stages[stage].append(expr.alias(unchecked))
+            expr = pl.col(unchecked)
+        if spec.fill_value is not None:
+            expr = expr.fill_null(value=spec.fill_value)
+        stages[fill_stage].append(expr.alias(target))
+        compiled.append(spec)
+
+    for exprs in stages:
+        lf = lf.with_columns(exprs)
+    return lf, compiled
+
+
+def apply_column_specs(df: pl.DataFrame, specs: List[ColumnSpec]) -> pl.DataFrame:
+    """
+    Apply column specs to a DataFrame as a single lazy query and run their checks
+
+    The checks are called in order of the specs after the query was collected.
+
+    :param df: The dataframe
+    :type df: pl.DataFrame
+    :param specs: the column specs in order of application
+    :type specs: List[ColumnSpec]
+    :return: the dataframe with the mapped columns
+    :rtype: pl.DataFrame
+    :raises: ValueError: if the source column of a required spec is missing
+    """
+    lf, specs = compile_column_specs(df.lazy(), specs, df.columns)
+    df = lf.collect()
+
+    unchecked_cols = []
+    for spec in specs:
+        if spec.check is not None:
+            unchecked = _unchecked_col_name(spec)
+            spec.check(df, spec.source, unchecked)
+            if unchecked != (spec.target or spec.source):
+                unchecked_cols.append(unchecked)
+    return df.drop(unchecked_cols)
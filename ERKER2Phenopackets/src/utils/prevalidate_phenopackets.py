@@ -0,0 +1,204 @@
+import multiprocessing
+import re
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.message import Message
+from loguru import logger
+from phenopackets import Phenopacket
+
+from .parallelization_utils import EXECUTORS, calc_chunk_size, init_worker_process
+
+# prefix, a colon and a local id without whitespace, e.g. HP:0001513
+CURIE_PATTERN = re.compile(r'^[A-Za-z][A-Za-z0-9_.-]*:\S+$')
+
+# 0001-01-01T00:00:00Z and 9999-12-31T23:59:59Z, the range of protobuf Timestamps
+MIN_TIMESTAMP_SECONDS = -62135596800
+MAX_TIMESTAMP_SECONDS = 253402300799
+
+ONTOLOGY_CLASS = 'org.phenopackets.schema.v2.core.OntologyClass'
+TIMESTAMP = 'google.protobuf.Timestamp'
+
+# fields the phenopacket schema marks as required, by message
+REQUIRED_FIELDS: Dict[str, List[str]] = {
+    'org.phenopackets.schema.v2.Phenopacket': ['id', 'meta_data'],
+    'org.phenopackets.schema.v2.core.Individual': ['id'],
+    'org.phenopackets.schema.v2.core.MetaData': [
+        'created', 'created_by', 'phenopacket_schema_version', 'resources'],
+    'org.phenopackets.schema.v2.core.Resource': [
+        'id', 'name', 'namespace_prefix', 'url', 'version', 'iri_prefix'],
+    'org.phenopackets.schema.v2.core.PhenotypicFeature': ['type'],
+    ONTOLOGY_CLASS: ['id', 'label'],
+    'org.phenopackets.schema.v2.core.Interpretation': ['id'],
+    'org.phenopackets.schema.v2.core.Diagnosis': ['disease'],
+    'org.phenopackets.schema.v2.core.GenomicInterpretation': [
+        'subject_or_biosample_id'],
+    'org.phenopackets.schema.v2.core.VariationDescriptor': ['id'],
+    'org.ga4gh.vrsatile.v1.Expression': ['syntax', 'value'],
+    'org.phenopackets.schema.v2.core.Disease': ['term'],
+}
+
+
+class _Rule(NamedTuple):
+    """Checks of a message type, compiled once per descriptor"""
+    required_messages: Tuple[str, ...]  # checked with HasField()
+    required_values: Tuple[str, ...]  # scalars and repeated fields, checked for truth
+    # fields that contain messages, (name, is repeated)
+    message_fields: Tuple[Tuple[str, bool], ...]
+
+
+def prevalidate(phenopacket: Phenopacket) -> Tuple[bool, str]:
+    """Checks the structure of a phenopacket in-process
+
+    A fast subset of the checks of `phenopacket-tools`, for phenopackets straight from
+    the mapping:
+    - fields the schema marks as required are set
+    - ids of ontology classes are CURIEs, whose prefix is a namespace prefix of the
+      resources in the metadata
+    - timestamps are within 0001-01-01 and 9999-12-31
+
+    :param phenopacket: The phenopacket
+    :type phenopacket: Phenopacket
+    :return: Tuple of a boolean and the error messages, in the shape returned by
+        `validate()`
+    :rtype: Tuple[bool, str]
+    """
+    prefixes = {resource.namespace_prefix
+                for resource in phenopacket.meta_data.resources}
+    errors = []
+    _check_message(phenopacket, '', prefixes, errors)
+    return not errors, ''.join(f'ERROR:{error}\n' for error in errors)
+
+
+def prevalidate_phenopackets(
+        phenopackets_list: List[Phenopacket],
+        num_workers: int = 1,
+        executor: str = 'thread',
+) -> List[Tuple[bool, str]]:
+    """Checks the structure of phenopackets in-process, see `prevalidate()`
+
+    The checks are pure Python, use `executor='process'` to use more than one core.
+    The phenopackets are shipped to the worker processes in the protobuf wire format.
+
+    :param phenopackets_list: The phenopackets
+    :type phenopackets_list: List[Phenopacket]
+    :param num_workers: Number of threads or processes, defaults to 1
+    :type num_workers: int, optional
+    :param executor: Either 'thread' or 'process', defaults to 'thread'
+    :type executor: str, optional
+    :return: Tuple of a boolean and the error messages per phenopacket, in the order
+        of `phenopackets_list`
+    :rtype: List[Tuple[bool, str]]
+    :raises ValueError: If executor is not 'thread' or 'process'
+    """
+    if executor not in EXECUTORS:
+        logger.error(f'Executor {executor} not supported, use one of {EXECUTORS}')
+        raise ValueError(f'Executor {executor} not supported, use one of {EXECUTORS}')
+    if not phenopackets_list:
+        return []
+
+    num_workers = max(1, min(num_workers, len(phenopackets_list)))
+    if num_workers == 1:
+        results = [prevalidate(phenopacket) for phenopacket in phenopackets_list]
+    else:
+        chunks = []
+        start = 0
+        for chunk_size in calc_chunk_size(num_instances=len(phenopackets_list),
+                                          num_chunks=num_workers):
+            chunks.append(phenopackets_list[start:start + chunk_size])
+            start += chunk_size
+
+        if executor == 'thread':
+            with ThreadPoolExecutor(max_workers=num_workers) as pool:
+                collected_results = list(pool.map(
+                    lambda chunk: [prevalidate(p) for p in chunk], chunks))
+        else:
+            serialized_chunks = [[p.SerializeToString() for p in chunk]
+                                 for chunk in chunks]
+            with ProcessPoolExecutor(
+                    max_workers=num_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker_process,
+            ) as pool:
+                collected_results = list(pool.map(_prevalidate_serialized_chunk,
+                                                  serialized_chunks))
+        results = [result for chunk_results in collected_results
+                   for result in chunk_results]
+
+    num_invalid = sum(not no_errors for no_errors, _ in results)
+    logger.debug(f'Prevalidated {len(results)} phenopackets, {num_invalid} invalid')
+    return results
+
+
+def _prevalidate_serialized_chunk(
+        serialized_phenopackets: List[bytes]) -> List[Tuple[bool, str]]:
+    """Executed in the worker processes of `prevalidate_phenopackets()`"""
+    return [prevalidate(Phenopacket.FromString(serialized_phenopacket))
+            for serialized_phenopacket in serialized_phenopackets]
+
+
+def _check_message(message: Message, path: str, prefixes: Set[str],
+                   errors: List[str]) -> None:
+    """Checks a message and all messages it contains"""
+    descriptor = message.DESCRIPTOR
+    rule = _compile_rule(descriptor)
+
+    for name in rule.required_messages:
+        if not message.HasField(name):
+            errors.append(f'{path}{name} is required')
+    for name in rule.required_values:
+        if not getattr(message, name):
+            errors.append(f'{path}{name} is required')
+
+    if descriptor.full_name == ONTOLOGY_CLASS:
+        _check_curie(message.id, f'{path}id', prefixes, errors)
+    elif descriptor.full_name == TIMESTAMP:
+        if not MIN_TIMESTAMP_SECONDS <= message.seconds <= MAX_TIMESTAMP_SECONDS or \
+                not 0 <= message.nanos < 10 ** 9:
+            errors.append(f'{path[:-1]} is not a valid timestamp: {message.seconds} s, '
+                          f'{message.nanos} ns')
+
+    for name, repeated in rule.message_fields:
+        if repeated:
+            for i, child in enumerate(getattr(message, name)):
+                _check_message(child, f'{path}{name}[{i}].', prefixes, errors)
+        elif message.HasField(name):
+            _check_message(getattr(message, name), f'{path}{name}.', prefixes, errors)
+
+
+def _check_curie(curie: str, path: str, prefixes: Set[str], errors: List[str]) -> None:
+    """Checks an id of an ontology class, empty ids are reported as missing"""
+    if not curie:
+        return
+    if not CURIE_PATTERN.match(curie):
+        errors.append(f'{path} is not a valid CURIE: {curie}')
+        return
+    prefix = curie.split(':', 1)[0]
+    if prefix not in prefixes:
+        errors.append(f'{path} uses prefix {prefix}, which is not a namespace prefix '
+                      'of the resources in meta_data')
+
+
+@lru_cache(maxsize=None)
+def _compile_rule(descriptor: Descriptor) -> _Rule:
+    """Compiles the checks of a message type, cached per descriptor"""
+    required = REQUIRED_FIELDS.get(descriptor.full_name, [])
+    required_messages = []
+    required_values = []
+    for name in required:
+        field = descriptor.fields_by_name[name]
+        if field.type == FieldDescriptor.TYPE_MESSAGE and \
+                field.label != FieldDescriptor.LABEL_REPEATED:
+            required_messages.append(name)
+        else:
+            required_values.append(name)
+
+    message_fields = tuple(
+        (field.name, field.label == FieldDescriptor.LABEL_REPEATED)
+        for field in descriptor.fields
+        if field.type == FieldDescriptor.TYPE_MESSAGE
+        and not field.message_type.GetOptions().map_entry
+    )
+    return _Rule(tuple(required_messages), tuple(required_values), message_fields)
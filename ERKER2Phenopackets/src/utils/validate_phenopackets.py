@@ -1,68 +1,193 @@
 import argparse
+import os
+import shlex
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, List, Union
-import configparser
+from typing import Dict, Iterator, Optional, Tuple, List, Union
 
 from ERKER2Phenopackets.src.logging_ import setup_logging
+from ERKER2Phenopackets.src.settings import load_settings
 from loguru import logger
 
 from . import last_phenopackets_dir
-
-
-def validate(path: Path = '') -> Union[Tuple[bool, str], List[Tuple[bool, str]]]:
+from .io import read_file, write_file, iter_bundle, BUNDLE_FORMATS
+from .prevalidate_phenopackets import prevalidate_phenopackets
+from .validation_cache import ValidationCache, file_digest, validator_version, \
+    DEFAULT_MAX_ENTRIES
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def validate(
+        path: Path = '',
+        num_workers: int = os.cpu_count(),
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        prevalidate: bool = False,
+        prevalidate_only: bool = False,
+        use_cache: bool = True,
+        cache_max_entries: int = DEFAULT_MAX_ENTRIES,
+) -> Union[Tuple[bool, str], List[Tuple[bool, str]]]:
     """Validates a phenopacket file or directory of phenopackets
 
     This function validates a phenopacket file or directory of phenopackets.
     It checks if the phenopacket file or all phenopackets in the directory
     are valid phenopackets using the `phenopacket-tools` CLI.
 
-    :param path: Path to a phenopacket file or directory of phenopackets
+    The files of a directory are validated in batches, one `phenopacket-tools` call
+    per batch, by `num_workers` concurrent calls, see `validate_files()`.
+
+    With `prevalidate` the phenopackets are additionally checked in-process by
+    `prevalidate_phenopackets()`, its errors are merged into the results.
+    `prevalidate_only` skips `phenopacket-tools`.
+
+    Bundles (`.ndjson` or `.pb`, see `write_bundle()`) are validated like a directory
+    of phenopackets: their phenopackets are written to `.json` files in a temporary
+    directory first, since `phenopacket-tools` only validates single files. The
+    path may be a bundle or a directory that contains bundles and no `.json` files.
+
+    The results of `phenopacket-tools` are cached by the SHA-256 of the files and the
+    version of the validator, see `ValidationCache`. Files whose results are cached
+    from an earlier run are not validated again.
+
+    :param path: Path to a phenopacket file, a bundle or a directory of phenopackets
     :type path: Path
+    :param num_workers: Maximum number of concurrent validator processes, defaults to
+        the number of CPUs
+    :type num_workers: int, optional
+    :param batch_size: Maximum number of files validated by one validator process,
+        defaults to 500
+    :type batch_size: int, optional
+    :param prevalidate: Also check the phenopackets in-process, defaults to False
+    :type prevalidate: bool, optional
+    :param prevalidate_only: Only check the phenopackets in-process, defaults to
+        False
+    :type prevalidate_only: bool, optional
+    :param use_cache: Reuse and store results in the validation cache, defaults to True
+    :type use_cache: bool, optional
+    :param cache_max_entries: Maximum number of results in the validation cache,
+        defaults to 100000
+    :type cache_max_entries: int, optional
     :return: Tuple of a boolean and an error message
     :rtype: Tuple[bool, str]
     :raises ValueError: If the path is not a file or directory
-    :raises ValueError: If the path is a file but not a json file
+    :raises ValueError: If the path is a file but not a json file or a bundle
     :raises ValueError: If the path is a directory but does not contain any json files
+        or bundles
     """
     logger.info('Validating phenopackets')
-    config = configparser.ConfigParser()
-    config.read('ERKER2Phenopackets/data/config/config.cfg')
+    settings = load_settings()
 
     if path == '':
         path = last_phenopackets_dir()
 
     logger.info(f'Reading from {path} ...')
 
-    jar_path = str(Path(config.get('Paths', 'jar_path')).resolve())
-    command = config.get('CLICommands', 'validate')
-
-    jar_path_placeholder = config.get('Placeholders', 'jar_path')
-    phenopacket_json_path_placeholder = \
-        config.get('Placeholders', 'phenopacket_json_path')
-
-    command = command.replace(jar_path_placeholder, jar_path)
+    jar_path = str(settings.paths.jar_path)
+    command = settings.cli_commands.validate
+
+    jar_path_placeholder = settings.placeholders.jar_path
+    phenopacket_json_path_placeholder = settings.placeholders.phenopacket_json_path
+
+    cache = None
+    if use_cache and not prevalidate_only:
+        cache = ValidationCache(
+            settings.paths.validation_cache,
+            validator_version(command, jar_path),
+            max_entries=cache_max_entries,
+        )
+
+    command = command.replace(jar_path_placeholder, shlex.quote(jar_path))
+    bundle_paths = _bundle_paths(Path(path))
+    try:
+        if not bundle_paths:
+            return _validate_path(Path(path), command,
+                                  phenopacket_json_path_placeholder, num_workers,
+                                  batch_size, prevalidate, prevalidate_only, cache)
+        with tempfile.TemporaryDirectory(prefix='validate_bundle_') as tmp_dir:
+            _unpack_bundles(bundle_paths, Path(tmp_dir))
+            return _validate_path(Path(tmp_dir), command,
+                                  phenopacket_json_path_placeholder, num_workers,
+                                  batch_size, prevalidate, prevalidate_only, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _bundle_paths(path: Path) -> List[Path]:
+    """Returns the bundles to validate, the path itself if it is a bundle or the
+    bundles of a directory without json files"""
+    suffixes = {f'.{bundle_format}' for bundle_format in BUNDLE_FORMATS}
+    if path.is_file():
+        return [path] if path.suffix in suffixes else []
+    if path.is_dir() and not any(file_path.suffix == '.json'
+                                 for file_path in path.iterdir()):
+        return sorted(file_path for file_path in path.iterdir()
+                      if file_path.suffix in suffixes)
+    return []
+
+
+def _unpack_bundles(bundle_paths: List[Path], out_dir: Path) -> None:
+    """Writes the phenopackets of bundles to json files, one at a time"""
+    num_phenopackets = 0
+    for bundle_path in bundle_paths:
+        logger.info(f'Unpacking bundle {bundle_path} for validation')
+        for phenopacket in iter_bundle(bundle_path):
+            write_file(phenopacket, out_dir)
+            num_phenopackets += 1
+    logger.info(f'Unpacked {num_phenopackets} phenopackets to {out_dir}')
+
+
+def _validate_path(
+        path: Path,
+        command: str,
+        phenopacket_json_path_placeholder: str,
+        num_workers: int,
+        batch_size: int,
+        prevalidate: bool,
+        prevalidate_only: bool,
+        cache: Optional[ValidationCache],
+) -> Union[Tuple[bool, str], List[Tuple[bool, str]]]:
+    """Validates a phenopacket file or directory of phenopackets, see `validate()`"""
     ret_list = []
     if path.is_file():
         if path.suffix == '.json':
-            return _validate_phenopacket(
-                path, command, phenopacket_json_path_placeholder
+            if prevalidate_only:
+                ret = _prevalidate_files([path], num_workers)[0]
+                _log_validation_output(path, ret)
+                return ret
+            ret = _validate_phenopacket(
+                path, command, phenopacket_json_path_placeholder, cache=cache
             )
+            if prevalidate:
+                ret = _merge_results(_prevalidate_files([path], num_workers)[0], ret)
+            return ret
         else:
             logger.error(f'File {path} is not a json file')
             raise ValueError(f'File {path} is not a json file')
     elif path.is_dir():
-        for file_path in path.iterdir():
-            if file_path.suffix == '.json':
-                cur_ret = _validate_phenopacket(
-                    file_path, command, phenopacket_json_path_placeholder
-                )
-                ret_list.append(cur_ret)
-
-        if not ret_list:
+        file_paths = [file_path for file_path in path.iterdir()
+                      if file_path.suffix == '.json']
+        if not file_paths:
             logger.error(f'Directory {path} does not contain any json files')
             raise ValueError(f'Directory {path} does not contain any json files')
 
+        if prevalidate or prevalidate_only:
+            prevalidation_results = _prevalidate_files(file_paths, num_workers)
+        if prevalidate_only:
+            ret_list = prevalidation_results
+            for file_path, ret in zip(file_paths, ret_list):
+                _log_validation_output(file_path, ret)
+        else:
+            ret_list = validate_files(
+                file_paths, command, phenopacket_json_path_placeholder,
+                num_workers=num_workers, batch_size=batch_size, cache=cache,
+            )
+            if prevalidate:
+                ret_list = [_merge_results(pre, ret) for pre, ret
+                            in zip(prevalidation_results, ret_list)]
+
         num_invalid = sum([not ret[0] for ret in ret_list])
         logger.info(f'Number of invalid phenopackets: {num_invalid}')
 
@@ -70,8 +195,107 @@ def validate(path: Path = '') -> Union[Tuple[bool, str], List[Tuple[bool, str]]]
     return ret_list
 
 
-def _validate_phenopacket(path: Path, command: str,
-                          phenopacket_json_path_placeholder: str) -> Tuple[bool, str]:
+def validate_files(
+        file_paths: List[Path],
+        command: str,
+        phenopacket_json_path_placeholder: str,
+        num_workers: int = os.cpu_count(),
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        cache: Optional[ValidationCache] = None,
+) -> List[Tuple[bool, str]]:
+    """Validates phenopacket files in batches on concurrent validator processes
+
+    Starting the validator (a JVM for `phenopacket-tools`) dominates the validation of
+    a single file. The files are therefore split into batches of at most `batch_size`
+    files, the placeholder in `command` is replaced by all paths of a batch and one
+    validator process validates the whole batch. Up to `num_workers` validator
+    processes run at the same time. Their output is parsed line by line while they
+    run.
+
+    The validator is expected to print one CSV line per issue, with the path of the
+    validated file in the first and the level (e.g. `ERROR`) in the second column, as
+    `phenopacket-tools validate` does. Lines that cannot be attributed to a file of
+    the batch, like headers and comments, are ignored, unless they report an error:
+    then every file of the batch is marked as invalid.
+
+    With a `cache`, only the files whose SHA-256 has no cached result are validated,
+    their results are added to the cache.
+
+    :param file_paths: Paths to the phenopacket files
+    :type file_paths: List[Path]
+    :param command: Command to validate phenopackets
+    :type command: str
+    :param phenopacket_json_path_placeholder: Placeholder for the paths to the
+        phenopacket files
+    :type phenopacket_json_path_placeholder: str
+    :param num_workers: Maximum number of concurrent validator processes, defaults to
+        the number of CPUs
+    :type num_workers: int, optional
+    :param batch_size: Maximum number of files validated by one validator process,
+        defaults to 500
+    :type batch_size: int, optional
+    :param cache: Cache of validation results, defaults to None
+    :type cache: ValidationCache, optional
+    :return: Tuple of a boolean and the validation output per file, in the order of
+        `file_paths`
+    :rtype: List[Tuple[bool, str]]
+    :raises ValueError: If num_workers or batch_size is smaller than 1
+    """
+    if num_workers < 1 or batch_size < 1:
+        logger.error('num_workers and batch_size must be greater than 0, got '
+                     f'{num_workers} and {batch_size}')
+        raise ValueError('num_workers and batch_size must be greater than 0, got '
+                         f'{num_workers} and {batch_size}')
+
+    cached = {}
+    to_validate = file_paths
+    if cache is not None:
+        digests = [file_digest(file_path) for file_path in file_paths]
+        cached = cache.get_many(digests)
+        to_validate = [file_path for file_path, digest in zip(file_paths, digests)
+                       if digest not in cached]
+        logger.info(f'Validation cache: {len(file_paths) - len(to_validate)} hits, '
+                    f'{len(to_validate)} misses')
+
+    batches = [to_validate[i:i + batch_size]
+               for i in range(0, len(to_validate), batch_size)]
+    if batches:
+        logger.info(f'Validating {len(to_validate)} files in {len(batches)} batches '
+                    f'on {min(num_workers, len(batches))} validator processes')
+
+    validated = {}
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        batch_results = executor.map(
+            lambda batch: _validate_batch(batch, command,
+                                          phenopacket_json_path_placeholder),
+            batches
+        )
+        for batch, batch_result in zip(batches, batch_results):
+            for file_path, ret in zip(batch, batch_result):
+                validated[file_path] = ret
+
+    results = []
+    new_entries = []
+    for i, file_path in enumerate(file_paths):
+        if cache is not None and digests[i] in cached:
+            ret = cached[digests[i]]
+        else:
+            ret = validated[file_path]
+            if cache is not None:
+                new_entries.append((digests[i], ret))
+        _log_validation_output(file_path, ret)
+        results.append(ret)
+    if new_entries:
+        cache.put_many(new_entries)
+    return results
+
+
+def _validate_phenopacket(
+        path: Path,
+        command: str,
+        phenopacket_json_path_placeholder: str,
+        cache: Optional[ValidationCache] = None,
+) -> Tuple[bool, str]:
     """Validates a single phenopacket
 
     This function validates a single phenopacket using the `phenopacket-tools`
@@ -84,44 +308,113 @@ def _validate_phenopacket(path: Path, command: str,
     :param phenopacket_json_path_placeholder: Placeholder for the path to the
         phenopacket file
     :type phenopacket_json_path_placeholder: str
+    :param cache: Cache of validation results, defaults to None
+    :type cache: ValidationCache, optional
     :return: Tuple of a boolean and an error message
     :rtype: Tuple[bool, str]
     """
+    return validate_files([path], command, phenopacket_json_path_placeholder,
+                          num_workers=1, batch_size=1, cache=cache)[0]
+
 
-    command = command.replace(phenopacket_json_path_placeholder, str(path.resolve()))
-    output = subprocess.check_output(command, shell=True, text=True)
-    outputs = output.split('\n')
+def _validate_batch(file_paths: List[Path], command: str,
+                    phenopacket_json_path_placeholder: str) -> List[Tuple[bool, str]]:
+    """Validates a batch of phenopackets with a single validator process
 
-    no_errors = True
-    validation_results = ''
-    printed_intro_for_file = False
+    :return: Tuple of a boolean and the validation output per file, in the order of
+        `file_paths`
+    :rtype: List[Tuple[bool, str]]
+    :raises subprocess.CalledProcessError: If the validator exits with an error
+    """
+    resolved_paths = [str(file_path.resolve()) for file_path in file_paths]
+    args = []
+    for arg in shlex.split(command):
+        if arg == phenopacket_json_path_placeholder:
+            args.extend(resolved_paths)
+        else:
+            args.append(arg)
+
+    # the validator may print the path as passed, or only the file name
+    lookup: Dict[str, int] = {}
+    for i, (file_path, resolved_path) in enumerate(zip(file_paths, resolved_paths)):
+        lookup[resolved_path] = lookup[str(file_path)] = lookup[file_path.name] = i
+    no_errors = [True] * len(file_paths)
+    outputs = [''] * len(file_paths)
+
+    with subprocess.Popen(args, stdout=subprocess.PIPE, text=True) as process:
+        for i, line, rest in _attribute_lines(process.stdout, lookup):
+            if i is None:
+                logger.error('Could not attribute an error of the validator to a file, '
+                             f'marking the batch as invalid: {line}')
+                for j in range(len(file_paths)):
+                    outputs[j] += f'ERROR:{line}\n'
+                    no_errors[j] = False
+                continue
+            level, _, details = rest.partition(',')
+            if level.strip() == 'ERROR':
+                outputs[i] += 'ERROR:' + ' '.join(details.split(',')) + '\n'
+                no_errors[i] = False
+            else:
+                outputs[i] += line + '\n'
+    if process.returncode:
+        logger.error(f'Validator exited with {process.returncode}: {args[:3]} ...')
+        raise subprocess.CalledProcessError(process.returncode, args)
+
+    return list(zip(no_errors, outputs))
+
+
+def _attribute_lines(
+        lines: Iterator[str],
+        lookup: Dict[str, int],
+) -> Iterator[Tuple[Optional[int], str, str]]:
+    """Yields the index of the validated file, the line and the rest of the line after
+    the path of the file for each output line that belongs to a file
+
+    A line belongs to the longest path it starts with, followed by a comma, so paths
+    that contain commas are attributed correctly. Lines that do not belong to a file
+    but report an error are yielded with the index None, other lines (e.g. headers)
+    are ignored.
+    """
+    paths = sorted(lookup, key=len, reverse=True)
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        path = next((path for path in paths if line.startswith(path + ',')), None)
+        if path is not None:
+            yield lookup[path], line, line[len(path) + 1:]
+        elif ',ERROR,' in line:
+            yield None, line, line
+        else:
+            logger.trace(f'Ignoring validator output {line}')
 
-    def intro_for_file(printed_yet: bool) -> bool:
-        if not printed_yet:
-            logger.info(f'Validation output of {path}:')
-            return True
-        return False
 
-    for line in outputs:
-        split_line = line.split(',')
+def _prevalidate_files(file_paths: List[Path],
+                       num_workers: int) -> List[Tuple[bool, str]]:
+    """Reads and prevalidates phenopacket files, see `prevalidate_phenopackets()`"""
+    phenopackets = [read_file(file_path) for file_path in file_paths]
+    return prevalidate_phenopackets(phenopackets, num_workers=num_workers,
+                                    executor='process' if num_workers > 1 else 'thread')
 
-        if line and split_line[1] == 'ERROR':
-            printed_intro_for_file = intro_for_file(printed_intro_for_file)
 
-            err = ' '.join(split_line[2:])
+def _merge_results(first: Tuple[bool, str],
+                   second: Tuple[bool, str]) -> Tuple[bool, str]:
+    """Merges two validation results of the same phenopacket"""
+    return first[0] and second[0], first[1] + second[1]
 
-            logger.error(err)
-            validation_results += 'ERROR:' + err + '\n'
-            no_errors = False
 
-        elif line:  # no errors
-            printed_intro_for_file = intro_for_file(printed_intro_for_file)
-            logger.info(line)
-            validation_results += line + '\n'
+def _log_validation_output(path: Path, ret: Tuple[bool, str]) -> None:
+    """Logs the validation output of a single file"""
+    no_errors, validation_results = ret
+    if not validation_results:
+        logger.trace(f'No errors found in {path.name}')
+        return
+    logger.info(f'Validation output of {path}:')
+    for line in validation_results.splitlines():
+        if line.startswith('ERROR:'):
+            logger.error(line[len('ERROR:'):])
         else:
-            logger.trace(f'No errors found in {path.name}')
-
-    return no_errors, validation_results
+            logger.info(line)
 
 
 def main():
@@ -135,7 +428,45 @@ def main():
         'path',
         nargs='?',
         default='',
-        help='Path to a phenopacket file or directory of phenopackets'
+        help='Path to a phenopacket file, a bundle (.ndjson or .pb) or a directory of '
+             'phenopackets'
+    )
+    arg_parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help='Number of concurrent validator processes, defaults to the number of CPUs'
+    )
+    arg_parser.add_argument(
+        '-b', '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Number of files validated by one validator process, defaults to '
+             f'{DEFAULT_BATCH_SIZE}'
+    )
+    arg_parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Validate all files again instead of reusing cached results'
+    )
+    arg_parser.add_argument(
+        '--cache-max-entries',
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help=f'Maximum number of results in the validation cache, defaults to '
+             f'{DEFAULT_MAX_ENTRIES}'
+    )
+    prevalidation_group = arg_parser.add_mutually_exclusive_group()
+    prevalidation_group.add_argument(
+        '--prevalidate',
+        action='store_true',
+        help='Also check the phenopackets with the in-process validator'
+    )
+    prevalidation_group.add_argument(
+        '--prevalidate-only',
+        action='store_true',
+        help='Only check the phenopackets with the in-process validator, without '
+             'phenopacket-tools'
     )
 
     args = arg_parser.parse_args()
@@ -151,4 +482,6 @@ def main():
         logger.debug('if args.path: in else')
         path = ''
 
-    validate(path)
+    validate(path, num_workers=args.workers, batch_size=args.batch_size,
+             prevalidate=args.prevalidate, prevalidate_only=args.prevalidate_only,
+             use_cache=not args.no_cache, cache_max_entries=args.cache_max_entries)
@@ -0,0 +1,164 @@
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    validator_version TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    no_errors INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (validator_version, digest)
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+'''
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """Returns the SHA-256 of the content of a file
+
+    :param path: Path to the file
+    :type path: Union[str, Path]
+    :return: The hex digest
+    :rtype: str
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        # in blocks, so that large files, e.g. the input of the pipeline, are not
+        # read into memory at once
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def validator_version(command: str, jar_path: Optional[Union[str, Path]] = None) -> str:
+    """Returns a version of the validator, that changes whenever its results may change
+
+    The version is the SHA-256 of the validation command (before its placeholders are
+    replaced) and of the content of the validator jar, if it exists.
+
+    :param command: The validation command
+    :type command: str
+    :param jar_path: Path to the validator jar, defaults to None
+    :type jar_path: Union[str, Path], optional
+    :return: The hex digest
+    :rtype: str
+    """
+    sha256 = hashlib.sha256(command.encode('utf-8'))
+    if jar_path is not None and Path(jar_path).is_file():
+        sha256.update(file_digest(jar_path).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+class ValidationCache:
+    """Persistent cache of validation results, keyed by the SHA-256 of the validated
+    file and the version of the validator.
+
+    The results are stored in a SQLite database. The cache holds at most
+    `max_entries` results, the least recently used results are evicted first. Results
+    of other validator versions are never returned and age out the same way.
+
+    Example:
+        >>> with ValidationCache('cache.sqlite', validator_version(command)) as cache:
+        ...     results = validate_files(file_paths, command, placeholder, cache=cache)
+
+    :param path: Path to the database, created if it does not exist
+    :type path: Union[str, Path]
+    :param version: The version of the validator, see `validator_version()`
+    :type version: str
+    :param max_entries: Maximum number of cached results, defaults to 100000
+    :type max_entries: int, optional
+    :raises ValueError: If max_entries is smaller than 1
+    """
+
+    def __init__(self, path: Union[str, Path], version: str,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            logger.error(f'max_entries must be greater than 0, got {max_entries}')
+            raise ValueError(f'max_entries must be greater than 0, got {max_entries}')
+        self.path = Path(path)
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path)
+        self._connection.executescript(_SCHEMA)
+
+    def get_many(self, digests: List[str]) -> Dict[str, Tuple[bool, str]]:
+        """Returns the cached results of the given digests and marks them as used
+
+        :param digests: SHA-256 of the validated files
+        :type digests: List[str]
+        :return: The cached results by digest, digests without a result are missing
+        :rtype: Dict[str, Tuple[bool, str]]
+        """
+        found = {}
+        unique_digests = list(dict.fromkeys(digests))
+        # stay below the maximum number of parameters of a SQLite statement
+        for i in range(0, len(unique_digests), 500):
+            chunk = unique_digests[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._connection.execute(
+                'SELECT digest, no_errors, output FROM results '
+                f'WHERE validator_version = ? AND digest IN ({placeholders})',
+                [self.version, *chunk],
+            )
+            for digest, no_errors, output in rows:
+                found[digest] = (bool(no_errors), output)
+
+        with self._connection:
+            self._connection.executemany(
+                'UPDATE results SET last_used = ? '
+                'WHERE validator_version = ? AND digest = ?',
+                [(time.time_ns(), self.version, digest) for digest in found],
+            )
+        num_hits = sum(digest in found for digest in digests)
+        self.hits += num_hits
+        self.misses += len(digests) - num_hits
+        return found
+
+    def put_many(self, results: Iterable[Tuple[str, Tuple[bool, str]]]) -> None:
+        """Stores validation results and evicts the least recently used results above
+        `max_entries`
+
+        :param results: Pairs of the SHA-256 of a validated file and its result
+        :type results: Iterable[Tuple[str, Tuple[bool, str]]]
+        """
+        now = time.time_ns()
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                [(self.version, digest, int(no_errors), output, now)
+                 for digest, (no_errors, output) in results],
+            )
+            num_entries, = self._connection.execute(
+                'SELECT COUNT(*) FROM results').fetchone()
+            if num_entries > self.max_entries:
+                logger.debug(f'Evicting {num_entries - self.max_entries} results '
+                             f'from the validation cache {self.path}')
+                self._connection.execute(
+                    'DELETE FROM results WHERE rowid IN '
+                    '(SELECT rowid FROM results ORDER BY last_used LIMIT ?)',
+                    (num_entries - self.max_entries,),
+                )
+
+    def __len__(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'ValidationCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
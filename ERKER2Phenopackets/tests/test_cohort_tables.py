@@ -0,0 +1,124 @@
+from datetime import datetime, timezone
+
+import polars as pl
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+from phenopackets import Phenopacket, Individual, PhenotypicFeature, OntologyClass, \
+    Disease, TimeElement, Age, Interpretation, Diagnosis, GenomicInterpretation, \
+    VariantInterpretation, VariationDescriptor, Expression
+
+from ERKER2Phenopackets.src.analysis import flatten_phenopackets, \
+    write_cohort_tables, scan_cohort_tables, phenotypic_feature_counts
+from ERKER2Phenopackets.src.analysis.cohort_tables import SCHEMAS, TABLES
+
+
+def _phenopacket(i, sex='FEMALE'):
+    phenopacket_id = f'p{i}'
+    return Phenopacket(
+        id=phenopacket_id,
+        subject=Individual(id=phenopacket_id, sex=sex,
+                           date_of_birth=Timestamp(seconds=1696118400)),
+        phenotypic_features=[
+            PhenotypicFeature(type=OntologyClass(id='HP:1', label='a'),
+                              onset=TimeElement(age=Age(iso8601duration='P1Y'))),
+            PhenotypicFeature(type=OntologyClass(id='HP:2', label='b'),
+                              excluded=True),
+        ],
+        diseases=[Disease(term=OntologyClass(id='OMIM:1', label='c'))],
+        interpretations=[Interpretation(
+            id=f'i{i}', progress_status='SOLVED',
+            diagnosis=Diagnosis(
+                disease=OntologyClass(id='OMIM:1', label='c'),
+                genomic_interpretations=[GenomicInterpretation(
+                    subject_or_biosample_id=phenopacket_id,
+                    interpretation_status='CAUSATIVE',
+                    variant_interpretation=VariantInterpretation(
+                        acmg_pathogenicity_classification='PATHOGENIC',
+                        variation_descriptor=VariationDescriptor(
+                            id=f'v{i}',
+                            expressions=[Expression(syntax='hgvs', value='c.1A>G')],
+                            allelic_state=OntologyClass(id='GENO:1', label='d'),
+                        ),
+                    ),
+                )],
+            ),
+        )],
+    )
+
+
+def test_flatten_phenopackets():
+    tables = flatten_phenopackets([_phenopacket(0), _phenopacket(1, sex='MALE')])
+
+    for table in TABLES:
+        assert getattr(tables, table).schema == SCHEMAS[table]
+    assert tables.subjects['sex'].to_list() == ['FEMALE', 'MALE']
+    assert tables.subjects['date_of_birth'][0] == \
+        datetime(2023, 10, 1, tzinfo=timezone.utc)
+    assert tables.phenotypic_features.height == 4
+    assert tables.phenotypic_features['onset_age'].to_list() == \
+        ['P1Y', None, 'P1Y', None]
+    assert tables.diseases['interpretation_id'].to_list() == [None, 'i0', None, 'i1']
+    assert tables.variants.row(0, named=True) == {
+        'phenopacket_id': 'p0',
+        'interpretation_id': 'i0',
+        'progress_status': 'SOLVED',
+        'subject_or_biosample_id': 'p0',
+        'interpretation_status': 'CAUSATIVE',
+        'gene_symbol': None,
+        'variant_id': 'v0',
+        'hgvs': ['c.1A>G'],
+        'allelic_state_id': 'GENO:1',
+        'allelic_state_label': 'd',
+        'acmg_pathogenicity_classification': 'PATHOGENIC',
+        'therapeutic_actionability': 'UNKNOWN_ACTIONABILITY',
+    }
+
+
+def test_write_and_scan_cohort_tables(tmp_path):
+    phenopackets = [_phenopacket(i) for i in range(20)]
+    out_dir = tmp_path / 'cohort'
+
+    assert write_cohort_tables(phenopackets, out_dir, num_buckets=4,
+                               chunk_size=7) == 20
+
+    tables = scan_cohort_tables(out_dir)
+    subjects = tables.subjects.collect()
+    assert sorted(subjects['phenopacket_id']) == sorted(p.id for p in phenopackets)
+    assert set(subjects['bucket']) <= {0, 1, 2, 3}
+    assert tables.phenotypic_features.collect().height == 40
+    # the rows of a phenopacket are in the same bucket of every table
+    buckets = subjects.select('phenopacket_id', 'bucket')
+    variants = tables.variants.collect().join(buckets, on='phenopacket_id')
+    assert (variants['bucket'] == variants['bucket_right']).all()
+
+    bucket = subjects['bucket'][0]
+    assert tables.subjects.filter(pl.col('bucket') == bucket).collect().height == \
+        (subjects['bucket'] == bucket).sum()
+
+
+def test_write_cohort_tables_empty_tables(tmp_path):
+    out_dir = tmp_path / 'cohort'
+    write_cohort_tables([Phenopacket(id='p0', subject=Individual(id='p0'))], out_dir)
+
+    tables = scan_cohort_tables(out_dir)
+    assert tables.subjects.collect().height == 1
+    variants = tables.variants.collect()
+    assert variants.is_empty()
+    assert variants.drop('bucket').schema == SCHEMAS['variants']
+
+
+def test_phenotypic_feature_counts():
+    tables = flatten_phenopackets([_phenopacket(0), _phenopacket(1),
+                                   _phenopacket(2, sex='MALE')])
+    counts = phenotypic_feature_counts(tables).collect()
+    assert counts.rows() == [
+        ('HP:1', 'a', 'FEMALE', 2, 0),
+        ('HP:1', 'a', 'MALE', 1, 0),
+        ('HP:2', 'b', 'FEMALE', 0, 2),
+        ('HP:2', 'b', 'MALE', 0, 1),
+    ]
+
+
+def test_write_cohort_tables_invalid_buckets(tmp_path):
+    with pytest.raises(ValueError):
+        write_cohort_tables([], tmp_path / 'cohort', num_buckets=0)
@@ -0,0 +1,80 @@
+import itertools
+
+import pytest
+
+from ERKER2Phenopackets.src.analysis.tree_comparison.corpus import compare_corpus, \
+    corpus_features, lower_bound
+from ERKER2Phenopackets.src.analysis.tree_comparison.edit_dist import edit_distance
+
+CORPUS = [
+    {'id': 'p0', 'sex': 'F', 'features': [{'type': 'a'}, {'type': 'b'}]},
+    {'id': 'p0', 'sex': 'F', 'features': [{'type': 'a'}, {'type': 'b'}]},
+    {'id': 'p2', 'sex': 'F', 'features': [{'type': 'a'}, {'type': 'c'}]},
+    {'id': 'p3', 'sex': 'M', 'features': [{'type': 'a'}]},
+    {'id': 'p4', 'sex': 'M', 'features': [{'type': 'x', 'onset': 3}], 'extra': [1, 2]},
+    {'id': 'p5', 'sex': 'F', 'features': []},
+]
+IDS = [f'd{i}' for i in range(len(CORPUS))]
+
+
+def _brute_force():
+    return sorted(
+        (edit_distance(CORPUS[i], CORPUS[j], subtree_substitution_cost=0),
+         IDS[i], IDS[j])
+        for i, j in itertools.combinations(range(len(CORPUS)), 2)
+    )
+
+
+def _rows(df):
+    return sorted(zip(df['distance'], df['id1'], df['id2']))
+
+
+def test_lower_bound():
+    features = [corpus_features(d) for d in CORPUS]
+    for (i, f1), (j, f2) in itertools.combinations(enumerate(features), 2):
+        assert lower_bound(f1, f2) <= \
+            edit_distance(CORPUS[i], CORPUS[j], subtree_substitution_cost=0)
+    assert lower_bound(features[0], features[1]) == 0
+
+
+def test_compare_corpus_all_pairs():
+    assert _rows(compare_corpus(CORPUS, ids=IDS)) == _brute_force()
+
+
+def test_compare_corpus_max_distance():
+    expected = [row for row in _brute_force() if row[0] <= 3]
+    df = compare_corpus(CORPUS, ids=IDS, max_distance=3)
+    assert _rows(df) == expected
+    assert df['distance'].to_list() == sorted(df['distance'].to_list())
+
+
+def test_compare_corpus_top_k():
+    expected = _brute_force()
+    df = compare_corpus(CORPUS, ids=IDS, top_k=3)
+    assert df['distance'].to_list() == [row[0] for row in expected[:3]]
+    assert df.row(0) == ('d0', 'd1', 0)
+
+
+def test_compare_corpus_block_key():
+    df = compare_corpus(CORPUS, ids=IDS, block_key=lambda d: d['sex'])
+    sex = dict(zip(IDS, (d['sex'] for d in CORPUS)))
+    assert all(sex[id1] == sex[id2] for id1, id2 in zip(df['id1'], df['id2']))
+    assert len(df) == 6 + 1
+
+
+def test_compare_corpus_process_pool():
+    df = compare_corpus(CORPUS, ids=IDS, num_workers=2, executor='process',
+                        chunk_size=2)
+    assert _rows(df) == _brute_force()
+
+
+def test_compare_corpus_colliding_python_hashes():
+    df = compare_corpus([{'a': -1, 'b': 0}, {'a': -2, 'b': 0}])
+    assert df['distance'].to_list() == [1]
+
+
+def test_compare_corpus_invalid_arguments():
+    with pytest.raises(ValueError):
+        compare_corpus(CORPUS, executor='gpu')
+    with pytest.raises(ValueError):
+        compare_corpus(CORPUS, ids=['only one'])
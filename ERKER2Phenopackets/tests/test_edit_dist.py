@@ -1,3 +1,5 @@
+import pytest
+
 from ERKER2Phenopackets.src.analysis.tree_comparison.edit_dist import edit_distance
 
 
@@ -9,16 +11,56 @@ def test_same():
     assert edit_distance(d2, d2) == 0
 
 
-# def test_insertion():
-#     d1 = {'a': {'b': {'c': 2}, 'd': {'e': 3}}}
-#     d2 = {'a': {'b': {'c': 2}}}
-#     assert edit_distance(d1, d2, subtree_substitution_cost=0) == x
+def test_insertion():
+    d1 = {'a': {'b': {'c': 2}, 'd': {'e': 3}}}
+    d2 = {'a': {'b': {'c': 2}}}
+    # the keys d and e and the value 3
+    assert edit_distance(d1, d2, subtree_substitution_cost=0) == 3
+
+
+def test_substitution():
+    d1 = {'a': {'b': {'c': 2}, 'd': {'e': 3}}}
+    d2 = {'a': {'b': {'c': 2}, 'd': {'e': 4}}}
+    assert edit_distance(d1, d2, subtree_substitution_cost=0) == 1
+
+
+def test_colliding_python_hashes():
+    # hash(-1) == hash(-2) in CPython
+    assert edit_distance({'a': -1, 'b': 0}, {'a': -2, 'b': 0},
+                         subtree_substitution_cost=0) == 1
+
+
+def test_none_values():
+    assert edit_distance({'a': None}, {'a': 1}, subtree_substitution_cost=0) == 1
+    assert edit_distance({'a': [None]}, {'a': [None]}) == 0
+
+
+def test_inserted_key_does_not_misalign_siblings():
+    d1 = {'a': 1, 'b': {'c': [1, 2]}, 'd': 'x'}
+    d2 = {'a': 1, 'new': 5, 'b': {'c': [1, 2]}, 'd': 'x'}
+    assert edit_distance(d1, d2, subtree_substitution_cost=0) == 2
+    assert edit_distance(d2, d1, subtree_substitution_cost=0) == 2
+
+
+def test_custom_costs():
+    def substitution_cost(label1, label2):
+        # labels are keys or values of any type
+        if isinstance(label1, int) and isinstance(label2, int):
+            return abs(label1 - label2)
+        return 10
+
+    d1 = {'a': [1, 2, 3]}
+    d2 = {'a': [1, 5]}
+    assert edit_distance(
+        d1, d2, subtree_substitution_cost=0,
+        insertion_cost=10, deletion_cost=lambda label: 2,
+        val_substitution_cost=substitution_cost,
+    ) == 4  # 2 -> 5 and deleting 3, or deleting 2 and 3 -> 5
 
 
-# def test_substitution():
-#     d1 = {'a': {'b': {'c': 2}, 'd': {'e': 3}}}
-#     d2 = {'a': {'b': {'c': 2}, 'd': {'e': 4}}}
-#     assert edit_distance(d1, d2, subtree_substitution_cost=0) == 1
+def test_invalid_cost():
+    with pytest.raises(ValueError):
+        edit_distance({'a': 1}, {'a': 2}, val_substitution_cost=-1)
 
 
 def test_subtree_substitution():
@@ -0,0 +1,80 @@
+import os
+
+import polars as pl
+import pytest
+
+from ERKER2Phenopackets.src.mc4r import pipeline
+from ERKER2Phenopackets.src.utils import FrameCache, frame_cache_key
+from ERKER2Phenopackets.src.settings import load_settings
+
+DATA_PATH = 'ERKER2Phenopackets/data/sdv_synthetic_data.csv'
+
+
+@pytest.fixture
+def settings():
+    return load_settings()
+
+
+def _df(num_rows):
+    return pl.DataFrame({'a': list(range(num_rows)),
+                         'b': [str(i) for i in range(num_rows)]})
+
+
+def test_frame_cache_round_trip(tmp_path):
+    cache = FrameCache(tmp_path / 'frames')
+    key = frame_cache_key('data', 'config', 'code')
+
+    assert cache.get(key) is None
+    cache.put(key, _df(10))
+
+    assert cache.get(key).equals(_df(10))
+    assert cache.get(frame_cache_key('data', 'other config', 'code')) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert len(cache) == 1
+
+
+def test_frame_cache_evicts_least_recently_used(tmp_path):
+    cache = FrameCache(tmp_path / 'frames')
+    for key in ('a', 'b', 'c'):
+        cache.put(key, _df(1000))
+    size = cache.size() // 3
+    # 'a' is used last, 'b' is used least recently
+    for i, key in enumerate(('b', 'c', 'a')):
+        os.utime(cache.path / f'{key}.arrow', ns=(i, i))
+
+    cache.max_bytes = 2 * size
+    cache.put('d', _df(1000))
+
+    assert cache.get('b') is None
+    assert cache.get('c') is None
+    assert cache.get('a') is not None
+    assert cache.get('d') is not None
+    assert cache.size() <= cache.max_bytes
+
+
+def test_frame_cache_invalid_max_bytes(tmp_path):
+    with pytest.raises(ValueError):
+        FrameCache(tmp_path / 'frames', max_bytes=0)
+
+
+def test_read_preprocessed_uses_cache(tmp_path, settings, monkeypatch):
+    data_path = tmp_path / 'data.csv'
+    pl.read_csv(DATA_PATH).head(20).write_csv(data_path)
+    cache = FrameCache(tmp_path / 'frames')
+
+    df = pipeline._read_preprocessed(str(data_path), settings, cache)
+    assert len(cache) == 1
+
+    def fail(*_):
+        raise AssertionError('preprocessed again')
+
+    monkeypatch.setattr(pipeline, 'preprocess', fail)
+    cached = pipeline._read_preprocessed(str(data_path), settings, cache)
+    assert cached.equals(df, null_equal=True)
+    assert cache.hits == 1
+
+    # changed settings are a cache miss
+    settings = settings._replace(
+        no_value=settings.no_value._replace(date='NO_DATE_CHANGED'))
+    with pytest.raises(AssertionError):
+        pipeline._read_preprocessed(str(data_path), settings, cache)
@@ -0,0 +1,56 @@
+import pytest
+from phenopackets import Phenopacket, Individual
+
+from ERKER2Phenopackets.src.utils.io import write_files, read_files, iter_files
+
+
+@pytest.fixture
+def phenopackets_dir(tmp_path):
+    phenopackets = [Phenopacket(id=str(i), subject=Individual(id=str(i)))
+                    for i in range(12)]
+    write_files(phenopackets, tmp_path)
+    (tmp_path / 'notes.txt').write_text('not a phenopacket')
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    ('num_workers', 'executor', 'prefetch'),
+    (
+        (1, 'thread', None),
+        (3, 'thread', 1),
+        (3, 'thread', None),
+        (2, 'process', 3),
+    )
+)
+def test_iter_files_numeric_order(phenopackets_dir, num_workers, executor, prefetch):
+    result = iter_files(phenopackets_dir, num_workers=num_workers, executor=executor,
+                        prefetch=prefetch)
+
+    assert [p.id for p in result] == [str(i) for i in range(12)]
+
+
+def test_iter_files_filters_before_parsing(phenopackets_dir):
+    (phenopackets_dir / 'broken.json').write_text('{')
+
+    by_id = iter_files(phenopackets_dir, ids=['3', '10', 'missing'])
+    by_name = iter_files(phenopackets_dir, num_workers=2,
+                         file_filter=lambda name: name.startswith('1'))
+
+    assert [p.id for p in by_id] == ['3', '10']
+    assert [p.id for p in by_name] == ['1', '10', '11']
+
+
+def test_iter_files_stops_early(phenopackets_dir):
+    result = iter_files(phenopackets_dir, num_workers=2, prefetch=2)
+
+    assert next(result).id == '0'
+    result.close()
+
+
+def test_read_files(phenopackets_dir):
+    assert [p.id for p in read_files(phenopackets_dir)] == [str(i) for i in range(12)]
+
+
+def test_iter_files_invalid_prefetch(phenopackets_dir):
+    with pytest.raises(ValueError):
+        next(iter_files(phenopackets_dir, prefetch=-1))
@@ -0,0 +1,42 @@
+import pytest
+from loguru import logger
+
+from ERKER2Phenopackets.src import logging_
+from ERKER2Phenopackets.src.logging_ import setup_logging, trace_enabled, \
+    set_trace_enabled
+from ERKER2Phenopackets.src.settings import load_settings
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    settings = load_settings()
+    settings = settings._replace(paths=settings.paths._replace(log_path=tmp_path))
+    monkeypatch.setattr(logging_.logging_, 'load_settings', lambda: settings)
+    yield tmp_path
+    logger.remove()
+    set_trace_enabled(False)
+
+
+def _log_file_content(log_path):
+    logger.remove()  # closes the log file
+    log_file, = log_path.glob('*/pipeline.log')
+    return log_file.read_text()
+
+
+def test_setup_logging_info_keeps_debug_in_file(log_path):
+    setup_logging(level='INFO')
+    assert not trace_enabled()
+
+    logger.debug('a debug message')
+    logger.trace('a trace message')
+    content = _log_file_content(log_path)
+    assert 'a debug message' in content
+    assert 'a trace message' not in content
+
+
+def test_setup_logging_trace(log_path):
+    setup_logging(level='TRACE')
+    assert trace_enabled()
+
+    logger.trace('a trace message')
+    assert 'a trace message' in _log_file_content(log_path)
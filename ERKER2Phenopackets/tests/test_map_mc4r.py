@@ -0,0 +1,17 @@
+from phenopackets import Phenopacket, Individual
+
+from ERKER2Phenopackets.src.mc4r.map_mc4r import meta_data_template, \
+    serialized_meta_data_field
+
+
+def test_serialized_meta_data_field_appends_to_serialized_phenopacket():
+    phenopacket = Phenopacket(id='0', subject=Individual(id='0', sex='FEMALE'))
+    expected = Phenopacket()
+    expected.CopyFrom(phenopacket)
+    expected.meta_data.CopyFrom(meta_data_template('2023-10-01'))
+
+    serialized = phenopacket.SerializeToString() + \
+        serialized_meta_data_field('2023-10-01')
+
+    assert serialized == expected.SerializeToString()
+    assert Phenopacket.FromString(serialized) == expected
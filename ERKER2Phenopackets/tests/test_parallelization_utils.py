@@ -2,7 +2,7 @@ import pytest
 import polars as pl
 
 from ERKER2Phenopackets.src.utils.parallelization_utils import calc_chunk_size, \
-    split_dataframe
+    split_dataframe, dataframe2ipc_bytes, ipc_bytes2dataframe
 
 
 @pytest.mark.parametrize(
@@ -66,3 +66,17 @@ def test_split_dataframe(df, num_chunks):
 
     for i, df_sub in enumerate(result): # correct chunk sizes
         assert df_sub.height == chunk_sizes[i]
+
+
+def test_ipc_bytes_round_trip():
+    df = pl.DataFrame(
+        {
+            "a": [1, 2, None],
+            "b": ["x", None, "z"],
+        }
+    )
+
+    result = ipc_bytes2dataframe(dataframe2ipc_bytes(df))
+
+    assert result.frame_equal(df)
+    assert result.schema == df.schema
@@ -1,8 +1,11 @@
+import polars as pl
 import pytest
 
 from ERKER2Phenopackets.src.mc4r.parse_mc4r import \
     parse_year_of_birth, parse_sex, parse_phenotyping_date, parse_date_of_diagnosis, \
-    parse_zygosity, parse_omim
+    parse_zygosity, parse_omim, parse_year_of_birth_expr, \
+    raise_on_invalid_years_of_birth, parse_omim_cols, collect_invalid_omims, \
+    raise_on_invalid_omims
 
 
 def test_parse_year_of_birth():
@@ -12,6 +15,17 @@ def test_parse_year_of_birth():
     assert parse_year_of_birth(example_yob) == expected_ret
 
 
+def test_parse_year_of_birth_expr():
+    df = pl.DataFrame({'yob': [2000, 1900, 2023, 1899]}).with_columns(
+        parse_year_of_birth_expr('yob').alias('parsed')
+    )
+    assert df['parsed'].to_list() == [parse_year_of_birth(2000),
+                                      parse_year_of_birth(1900),
+                                      parse_year_of_birth(2023), None]
+    with pytest.raises(ValueError, match='1899'):
+        raise_on_invalid_years_of_birth(df, 'yob')
+
+
 def test_parse_date_of_diagnosis():
     example_date = "2018-04-12"
     expected_ret = "2018-04-12T00:00:00.00Z"
@@ -60,3 +74,24 @@ def test_parse_zygosity(inp, expected):
 )
 def test_parse_omim(inp, expected):
     assert parse_omim(inp) == expected
+
+
+def test_parse_omim_cols():
+    df = pl.DataFrame({
+        'omim_1': ['"155541.0024"', '"nan"', None, '"155541"'],
+        'omim_2': ['155541.0021', 'nan', 'ABC', '12345'],
+    })
+    omim_cols = {'omim_1': 'parsed_omim_1', 'omim_2': 'parsed_omim_2'}
+    df = parse_omim_cols(df, omim_cols, 'NO_OMIM')
+
+    assert df['parsed_omim_1'].to_list() == [
+        parse_omim('"155541.0024"'), 'NO_OMIM', 'NO_OMIM', parse_omim('"155541"')
+    ]
+    assert df['parsed_omim_2'].to_list() == [
+        parse_omim('155541.0021'), 'NO_OMIM', None, None
+    ]
+
+    invalid_omims = collect_invalid_omims(df, omim_cols)
+    assert invalid_omims.rows() == [(2, 'omim_2', 'ABC'), (3, 'omim_2', '12345')]
+    with pytest.raises(ValueError, match='Received: ABC'):
+        raise_on_invalid_omims(invalid_omims)
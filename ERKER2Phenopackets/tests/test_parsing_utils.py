@@ -1,8 +1,10 @@
+import polars as pl
 import pytest
 
 from ERKER2Phenopackets.src.utils.parsing_utils import \
     parse_date_string_to_iso8601_utc_timestamp, \
-    parse_year_month_day_to_iso8601_utc_timestamp
+    parse_year_month_day_to_iso8601_utc_timestamp, \
+    parse_date_string_to_iso8601_utc_timestamp_expr, raise_on_invalid_date_strings
 
 
 @pytest.mark.parametrize(
@@ -29,3 +31,18 @@ def test_parse_year_month_day_to_iso8601_utc_timestamp(inp_year, inp_month, inp_
                                                        exp):
     assert parse_year_month_day_to_iso8601_utc_timestamp(
         inp_year, inp_month, inp_day) == exp
+
+
+def test_parse_date_string_to_iso8601_utc_timestamp_expr():
+    dates = ['1998-06-27', '2000-1-1', None, '', '18-04-05', '2023-13-01']
+    df = pl.DataFrame({'date': dates}).with_columns(
+        parse_date_string_to_iso8601_utc_timestamp_expr('date').alias('parsed')
+    )
+    assert df['parsed'].to_list() == [
+        '1998-06-27T00:00:00.00Z', '2000-01-01T00:00:00.00Z', None, None, None, None
+    ]
+    assert df['parsed'][0] == parse_date_string_to_iso8601_utc_timestamp(dates[0])
+
+    with pytest.raises(ValueError, match='Got 18-04-05'):
+        raise_on_invalid_date_strings(df, 'date', 'parsed')
+    raise_on_invalid_date_strings(df.head(4), 'date', 'parsed')
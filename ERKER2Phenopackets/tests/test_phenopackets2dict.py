@@ -0,0 +1,74 @@
+from json import loads
+
+import pytest
+from google.protobuf.json_format import MessageToJson
+from google.protobuf.timestamp_pb2 import Timestamp
+from phenopackets import Phenopacket, Individual, MetaData, Measurement, Value, \
+    Quantity, OntologyClass, File, PhenotypicFeature, ReferenceRange
+
+from ERKER2Phenopackets.src.analysis.tree_comparison.edit_dist import edit_distance
+from ERKER2Phenopackets.src.analysis.tree_comparison.structure import \
+    compare_structure, list_differences
+from ERKER2Phenopackets.src.analysis.tree_comparison.traverse import \
+    first_mismatch, traverse
+from ERKER2Phenopackets.src.utils.io import phenopacket2dict, message_fields
+
+
+def _phenopacket(value=1.5, sex='FEMALE'):
+    return Phenopacket(
+        id='0',
+        subject=Individual(id='0', sex=sex),
+        phenotypic_features=[
+            PhenotypicFeature(type=OntologyClass(id='HP:1', label='a')),
+            PhenotypicFeature(type=OntologyClass(id='HP:2', label='b'),
+                              excluded=True),
+        ],
+        measurements=[Measurement(
+            assay=OntologyClass(id='LOINC:1', label='c'),
+            value=Value(quantity=Quantity(
+                unit=OntologyClass(id='UCUM:1', label='d'), value=value,
+                reference_range=ReferenceRange(low=0, high=10),
+            )),
+        )],
+        files=[File(uri='file://a', file_attributes={'x': 'y', 'z': 'w'})],
+        meta_data=MetaData(created=Timestamp(seconds=1696118400, nanos=5),
+                           created_by='someone'),
+    )
+
+
+@pytest.mark.parametrize('value', [1.5, 0.1, 2 ** 60, float('nan'), float('inf')])
+def test_phenopacket2dict_matches_json(value):
+    phenopacket = _phenopacket(value)
+    assert phenopacket2dict(phenopacket) == loads(MessageToJson(phenopacket))
+
+
+def test_phenopacket2dict_returns_independent_dicts():
+    phenopacket = _phenopacket()
+    d = phenopacket2dict(phenopacket)
+    d['metaData']['created'] = 'changed'
+    assert phenopacket2dict(phenopacket)['metaData']['created'] == \
+        '2023-10-01T00:00:00.000000005Z'
+
+
+def test_message_fields():
+    phenopacket = _phenopacket()
+    fields = message_fields(phenopacket)
+    assert fields['id'] == '0'
+    assert fields['subject'] is phenopacket.subject
+    assert message_fields(fields['subject']) == {'id': '0', 'sex': 'FEMALE'}
+    assert message_fields(phenopacket.meta_data.created) == \
+        '2023-10-01T00:00:00.000000005Z'
+
+
+def test_tree_comparison_of_phenopackets():
+    p1, p2 = _phenopacket(), _phenopacket(value=2.5, sex='MALE')
+    d1, d2 = phenopacket2dict(p1), phenopacket2dict(p2)
+
+    assert traverse(p1, 'dfs') == traverse(d1, 'dfs')
+    assert traverse(p1, 'bfs') == traverse(d1, 'bfs')
+    assert compare_structure(p1, p2, construct_diff_tree=False)
+    assert first_mismatch(p1, p2, include_vals=True) == \
+        first_mismatch(d1, d2, include_vals=True)
+    assert first_mismatch(p1, p2, include_vals=True).path == ('subject', 'sex')
+    assert list_differences(p1, p2) == list_differences(d1, d2)
+    assert edit_distance(p1, p2, subtree_substitution_cost=0) == 2
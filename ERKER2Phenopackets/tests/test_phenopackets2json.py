@@ -0,0 +1,83 @@
+import pytest
+from phenopackets import Phenopacket, Individual
+
+from ERKER2Phenopackets.src.utils.io import write_files, read_files, \
+    atomic_output_dir
+
+
+def _phenopackets(n):
+    return [Phenopacket(id=str(i), subject=Individual(id=str(i), sex='FEMALE'))
+            for i in range(n)]
+
+
+@pytest.mark.parametrize(
+    ('num_workers', 'executor'),
+    (
+        (1, 'thread'),
+        (3, 'thread'),
+        (2, 'process'),
+    )
+)
+def test_write_files(tmp_path, num_workers, executor):
+    phenopackets = _phenopackets(7)
+
+    write_files(phenopackets, tmp_path, num_workers=num_workers, executor=executor)
+
+    assert sorted(read_files(tmp_path), key=lambda p: int(p.id)) == phenopackets
+
+
+def test_write_files_invalid_executor(tmp_path):
+    with pytest.raises(ValueError):
+        write_files(_phenopackets(1), tmp_path, executor='fiber')
+
+
+def test_atomic_output_dir(tmp_path):
+    out_dir = tmp_path / 'run'
+
+    with atomic_output_dir(out_dir) as tmp_dir:
+        write_files(_phenopackets(2), tmp_dir, fsync=True)
+        assert not out_dir.exists()
+
+    assert sorted(p.name for p in out_dir.iterdir()) == ['0.json', '1.json']
+    assert [p.name for p in tmp_path.iterdir()] == ['run']
+
+
+def test_atomic_output_dir_replaces_existing_dir(tmp_path):
+    out_dir = tmp_path / 'run'
+    out_dir.mkdir()
+    (out_dir / 'old.json').write_text('{}')
+
+    with atomic_output_dir(out_dir) as tmp_dir:
+        write_files(_phenopackets(1), tmp_dir)
+
+    assert [p.name for p in out_dir.iterdir()] == ['0.json']
+    assert [p.name for p in tmp_path.iterdir()] == ['run']
+
+
+def test_atomic_output_dir_merges_into_existing_dir(tmp_path):
+    out_dir = tmp_path / 'run'
+    out_dir.mkdir()
+    (out_dir / 'old.json').write_text('{}')
+    (out_dir / '0.json').write_text('{}')
+
+    with atomic_output_dir(out_dir, fsync=True, merge=True) as tmp_dir:
+        write_files(_phenopackets(2), tmp_dir)
+
+    assert sorted(p.name for p in out_dir.iterdir()) == \
+        ['0.json', '1.json', 'old.json']
+    assert (out_dir / '0.json').read_text() != '{}'
+    assert [p.name for p in tmp_path.iterdir()] == ['run']
+
+
+def test_atomic_output_dir_failure_keeps_existing_dir(tmp_path):
+    out_dir = tmp_path / 'run'
+    out_dir.mkdir()
+    (out_dir / 'old.json').write_text('{}')
+
+    with pytest.raises(RuntimeError):
+        with atomic_output_dir(out_dir) as tmp_dir:
+            write_files(_phenopackets(1), tmp_dir)
+            raise RuntimeError('mapping failed')
+
+    assert [p.name for p in out_dir.iterdir()] == ['old.json']
+    assert [p.name for p in tmp_path.iterdir()] == ['run']
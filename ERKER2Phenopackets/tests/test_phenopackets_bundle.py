@@ -0,0 +1,72 @@
+import pytest
+from phenopackets import Phenopacket, Individual
+
+from ERKER2Phenopackets.src.utils.io import write_bundle, read_bundle, \
+    PhenopacketBundle, bundle_file_name
+from ERKER2Phenopackets.src.utils.io.phenopackets_bundle import index_path
+
+
+def _phenopackets(ids):
+    return [Phenopacket(id=i, subject=Individual(id=i, sex='MALE')) for i in ids]
+
+
+@pytest.mark.parametrize('bundle_format', ('ndjson', 'pb'))
+def test_write_and_read_bundle(tmp_path, bundle_format):
+    phenopackets = _phenopackets(['a', 'b', 'c'])
+    path = tmp_path / bundle_file_name(bundle_format)
+
+    assert write_bundle(phenopackets[:2], path) == 2
+    assert write_bundle(phenopackets[2:], path, append=True) == 1
+
+    assert read_bundle(path) == phenopackets
+
+
+@pytest.mark.parametrize('bundle_format', ('ndjson', 'pb'))
+def test_phenopacket_bundle_random_access(tmp_path, bundle_format):
+    # more than 127 bytes per message to cover multi-byte length prefixes
+    phenopackets = _phenopackets([str(i) * 200 for i in range(5)])
+    path = tmp_path / bundle_file_name(bundle_format)
+    write_bundle(phenopackets[:3], path)
+    write_bundle(phenopackets[3:], path, append=True)
+
+    with PhenopacketBundle(path) as bundle:
+        assert len(bundle) == 5
+        assert bundle.ids() == [p.id for p in phenopackets]
+        assert bundle['3' * 200] == phenopackets[3]
+        assert bundle['1' * 200] == phenopackets[1]
+        assert 'missing' not in bundle
+        assert list(bundle) == phenopackets
+
+
+@pytest.mark.parametrize('bundle_format', ('ndjson', 'pb'))
+def test_phenopacket_bundle_rebuilds_missing_index(tmp_path, bundle_format):
+    phenopackets = _phenopackets(['a', 'b'])
+    path = tmp_path / bundle_file_name(bundle_format)
+    write_bundle(phenopackets, path)
+    expected_index = index_path(path).read_bytes()
+    index_path(path).unlink()
+
+    with PhenopacketBundle(path) as bundle:
+        assert bundle['b'] == phenopackets[1]
+    assert index_path(path).read_bytes() == expected_index
+
+
+def test_truncated_pb_bundle(tmp_path):
+    phenopackets = _phenopackets(['a', 'b'])
+    path = tmp_path / bundle_file_name('pb')
+    write_bundle(phenopackets, path)
+    # cut the last record after its id field, the rest of it still parses
+    subject = len(phenopackets[-1].SerializeToString()) - \
+        len(Phenopacket(id='b').SerializeToString())
+    path.write_bytes(path.read_bytes()[:-subject])
+
+    with pytest.raises(ValueError, match='Truncated record'):
+        read_bundle(path)
+    with PhenopacketBundle(path) as bundle, \
+            pytest.raises(ValueError, match='Truncated record'):
+        bundle['b']
+
+
+def test_bundle_file_name_invalid_format():
+    with pytest.raises(ValueError):
+        bundle_file_name('xml')
@@ -0,0 +1,83 @@
+import polars as pl
+import pytest
+
+from ERKER2Phenopackets.src.mc4r import pipeline
+from ERKER2Phenopackets.src.mc4r.pipeline import _pipeline_incremental
+from ERKER2Phenopackets.src.utils.manifest import MANIFEST_FILE_NAME, read_manifest
+from ERKER2Phenopackets.src.settings import load_settings
+
+DATA_PATH = 'ERKER2Phenopackets/data/sdv_synthetic_data.csv'
+
+
+@pytest.fixture
+def settings():
+    return load_settings()
+
+
+def _run(data, tmp_path, settings):
+    data_path = tmp_path / 'data.csv'
+    data.write_csv(data_path)
+    return _pipeline_incremental(
+        data_path=str(data_path), settings=settings,
+        phenopackets_out_dir=tmp_path / 'out', cur_time='2023-10-01-1200',
+        debug=True, executor='thread', num_workers=1,
+    )
+
+
+def test_pipeline_incremental_maps_only_changed_rows(tmp_path, settings):
+    data = pl.read_csv(DATA_PATH)
+    out_dir = tmp_path / 'out'
+
+    assert _run(data.head(10), tmp_path, settings) == 10
+    unchanged_inode = (out_dir / '0.json').stat().st_ino
+
+    assert _run(data.head(10), tmp_path, settings) == 0
+    assert (out_dir / '0.json').stat().st_ino == unchanged_inode
+
+    # row 3 changes, rows 10 and 11 are added
+    other_sex = {'sct_248152002': 'sct_248153007', 'sct_248153007': 'sct_248152002'}
+    changed = data.head(12).with_columns(
+        pl.when(pl.arange(0, 12) == 3)
+        .then(pl.col('sct_281053000').map_dict(other_sex))
+        .otherwise(pl.col('sct_281053000'))
+        .alias('sct_281053000')
+    )
+    old_row_3 = (out_dir / '3.json').read_text()
+    assert _run(changed, tmp_path, settings) == 3
+    assert (out_dir / '0.json').stat().st_ino == unchanged_inode
+    assert (out_dir / '3.json').read_text() != old_row_3
+    assert len(list(out_dir.glob('*.json'))) == 12
+
+    # rows 10 and 11 are removed again
+    assert _run(changed.head(10), tmp_path, settings) == 0
+    assert sorted(int(path.stem) for path in out_dir.glob('*.json')) == \
+        list(range(10))
+    assert len(read_manifest(out_dir).row_hashes) == 10
+
+
+def test_pipeline_incremental_remaps_all_rows_if_config_changed(tmp_path, settings):
+    data = pl.read_csv(DATA_PATH).head(5)
+    _run(data, tmp_path, settings)
+
+    settings = settings._replace(
+        constants=settings.constants._replace(creator_tag='someone else'))
+    assert _run(data, tmp_path, settings) == 5
+    assert (tmp_path / 'out' / MANIFEST_FILE_NAME).is_file()
+
+
+def test_pipeline_incremental_remaps_all_rows_if_code_changed(tmp_path, settings,
+                                                              monkeypatch):
+    data = pl.read_csv(DATA_PATH).head(5)
+    _run(data, tmp_path, settings)
+
+    monkeypatch.setattr(pipeline, 'mapping_version', lambda: 'other code')
+    assert _run(data, tmp_path, settings) == 5
+    assert _run(data, tmp_path, settings) == 0
+
+
+def test_pipeline_incremental_ignores_unused_columns(tmp_path, settings):
+    data = pl.read_csv(DATA_PATH).head(5)
+    _run(data, tmp_path, settings)
+
+    data = data.with_columns(pl.lit('changed').alias('not_mapped'))
+    assert _run(data, tmp_path, settings) == 0
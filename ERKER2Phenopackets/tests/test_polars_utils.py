@@ -0,0 +1,73 @@
+import polars as pl
+import pytest
+
+from ERKER2Phenopackets.src.utils.polars_utils import add_id_col, \
+    scan_all_null_cols, ColumnSpec, apply_column_specs, map_col, fill_null_vals
+
+
+def test_add_id_col_offset():
+    df = pl.DataFrame({'a': [1, 2, 3]})
+
+    result = add_id_col(df, id_col_name='id', id_datatype=str, id_offset=10)
+
+    assert result.columns == ['id', 'a']
+    assert result['id'].to_list() == ['10', '11', '12']
+
+
+def test_scan_all_null_cols():
+    lf = pl.DataFrame(
+        {
+            'a': [1, None, 3],
+            'b': [None, None, None],
+            'c': ['x', 'y', 'z'],
+        },
+        schema={'a': pl.Int64, 'b': pl.Utf8, 'c': pl.Utf8}
+    ).lazy()
+
+    assert scan_all_null_cols(lf) == ['b']
+
+
+def test_apply_column_specs_matches_sequential_calls():
+    df = pl.DataFrame({'a': ['x', None, 'y'], 'b': [None, 'z', 'z']})
+    mapping = {'x': 'X', 'FILLED': 'F'}
+    specs = [
+        ColumnSpec('a', 'mapped_a', mapping=mapping),
+        ColumnSpec('a', fill_value='FILLED'),
+        ColumnSpec('a', 'mapped_filled_a', mapping=mapping),
+        ColumnSpec('b', 'upper_b', mapping=lambda col: pl.col(col).str.to_uppercase(),
+                   fill_value='-'),
+        ColumnSpec('c', 'mapped_c', mapping=mapping, optional=True),
+    ]
+
+    expected = map_col(df, map_from='a', map_to='mapped_a', mapping=mapping)
+    expected = fill_null_vals(expected, 'a', 'FILLED')
+    expected = map_col(expected, map_from='a', map_to='mapped_filled_a',
+                       mapping=mapping)
+    expected = expected.with_columns(
+        pl.col('b').str.to_uppercase().fill_null('-').alias('upper_b'))
+
+    result = apply_column_specs(df, specs)
+
+    assert result.select(expected.columns).frame_equal(expected, null_equal=True)
+    assert sorted(result.columns) == sorted(expected.columns)
+
+
+def test_apply_column_specs_checks():
+    df = pl.DataFrame({'a': ['1', 'x', None]})
+    checked = []
+
+    def check(checked_df, source, unchecked):
+        checked.append(checked_df[unchecked].to_list())
+
+    result = apply_column_specs(df, [
+        ColumnSpec('a', 'b', mapping=lambda col: pl.col(col).cast(pl.Int64,
+                                                                   strict=False),
+                   fill_value=0, check=check)
+    ])
+
+    assert checked == [[1, None, None]]
+    assert result.columns == ['a', 'b']
+    assert result['b'].to_list() == [1, 0, 0]
+
+    with pytest.raises(ValueError):
+        apply_column_specs(df, [ColumnSpec('missing', fill_value=0)])
@@ -0,0 +1,68 @@
+from google.protobuf.json_format import MessageToJson
+from phenopackets import Phenopacket, Individual, OntologyClass, PhenotypicFeature
+
+from ERKER2Phenopackets.src.mc4r.map_mc4r import meta_data_template
+from ERKER2Phenopackets.src.utils import prevalidate, prevalidate_phenopackets
+from ERKER2Phenopackets.src.utils.validate_phenopackets import validate
+
+
+def _phenopacket(phenopacket_id='0', feature_id='HP:0001513', label='Obesity'):
+    phenopacket = Phenopacket(
+        id=phenopacket_id,
+        subject=Individual(id=phenopacket_id, sex='FEMALE'),
+        phenotypic_features=[
+            PhenotypicFeature(type=OntologyClass(id=feature_id, label=label))],
+    )
+    phenopacket.meta_data.CopyFrom(meta_data_template('2023-10-01'))
+    return phenopacket
+
+
+def test_prevalidate_valid_phenopacket():
+    assert prevalidate(_phenopacket()) == (True, '')
+
+
+def test_prevalidate_reports_missing_fields():
+    phenopacket = _phenopacket(label='')
+    phenopacket.ClearField('meta_data')
+
+    no_errors, errors = prevalidate(phenopacket)
+
+    assert not no_errors
+    assert errors == 'ERROR:meta_data is required\n' \
+        'ERROR:phenotypic_features[0].type.label is required\n' \
+        'ERROR:phenotypic_features[0].type.id uses prefix HP, which is not a ' \
+        'namespace prefix of the resources in meta_data\n'
+
+
+def test_prevalidate_reports_invalid_curies_and_timestamps():
+    phenopacket = _phenopacket(feature_id='HP 0001513')
+    phenopacket.meta_data.created.seconds = -62135596801
+
+    no_errors, errors = prevalidate(phenopacket)
+
+    assert not no_errors
+    assert 'ERROR:meta_data.created is not a valid timestamp' in errors
+    assert 'ERROR:phenotypic_features[0].type.id is not a valid CURIE: HP 0001513\n' \
+        in errors
+
+
+def test_prevalidate_phenopackets_keeps_order():
+    phenopackets = [_phenopacket(str(i), label='' if i == 3 else 'Obesity')
+                    for i in range(6)]
+
+    for executor in ('thread', 'process'):
+        results = prevalidate_phenopackets(phenopackets, num_workers=2,
+                                           executor=executor)
+        assert [no_errors for no_errors, _ in results] == \
+            [True, True, True, False, True, True]
+
+
+def test_validate_prevalidate_only_skips_validator(tmp_path):
+    for i in range(3):
+        phenopacket = _phenopacket(str(i), label='' if i == 1 else 'Obesity')
+        (tmp_path / f'{i}.json').write_text(MessageToJson(phenopacket))
+
+    # no phenopacket-tools jar is needed
+    results = validate(tmp_path, num_workers=1, prevalidate_only=True)
+
+    assert sorted(no_errors for no_errors, _ in results) == [False, True, True]
@@ -0,0 +1,95 @@
+import polars as pl
+import pytest
+
+from ERKER2Phenopackets.src.mc4r import map_chunk
+from ERKER2Phenopackets.src.mc4r.column_specs import mc4r_column_specs
+from ERKER2Phenopackets.src.mc4r.map_mc4r import MAPPED_COLS
+from ERKER2Phenopackets.src.mc4r.pipeline import preprocess
+from ERKER2Phenopackets.src.mc4r.read_erker import ERKER_DTYPES, read_erker, \
+    scan_erker, iter_erker_batches
+from ERKER2Phenopackets.src.settings import load_settings
+
+DATA_PATH = 'ERKER2Phenopackets/data/sdv_synthetic_data.csv'
+
+
+@pytest.fixture
+def settings():
+    return load_settings()
+
+
+def _write(df, path):
+    if path.suffix == '.csv':
+        df.write_csv(path)
+    elif path.suffix == '.parquet':
+        df.write_parquet(path, row_group_size=7)
+    else:
+        df.write_ipc(path)
+    return path
+
+
+def test_erker_dtypes_cover_mapped_columns(settings):
+    sources = {spec.source for spec in mc4r_column_specs(settings)}
+    raw_mapped_cols = {col for col in MAPPED_COLS if col in pl.read_csv(
+        DATA_PATH, n_rows=0).columns}
+    assert sources | raw_mapped_cols <= set(ERKER_DTYPES)
+
+
+@pytest.mark.parametrize('suffix', ('.csv', '.parquet', '.arrow'))
+def test_read_erker_projects_mapped_columns(tmp_path, suffix):
+    data = pl.read_csv(DATA_PATH)
+    df = read_erker(_write(data, tmp_path / f'data{suffix}'))
+
+    assert set(df.columns) == set(ERKER_DTYPES)
+    assert df.width < data.width
+    assert df.schema == {col: ERKER_DTYPES[col] for col in df.columns}
+    expected = data.select(df.columns).with_columns(pl.col('record_id').cast(pl.Utf8))
+    assert df.equals(expected, null_equal=True)
+
+
+@pytest.mark.parametrize('suffix', ('.csv', '.parquet', '.arrow'))
+def test_iter_erker_batches(tmp_path, suffix):
+    path = _write(pl.read_csv(DATA_PATH), tmp_path / f'data{suffix}')
+    batches = list(iter_erker_batches(path, batch_size=20))
+
+    assert len(batches) > 1
+    assert pl.concat(batches).equals(read_erker(path), null_equal=True)
+
+
+@pytest.mark.parametrize('batch_size', (1, 7, 1000))
+def test_iter_erker_batches_size(tmp_path, batch_size):
+    data = pl.concat([pl.read_csv(DATA_PATH)] * 30)
+    path = _write(data, tmp_path / 'data.csv')
+    sizes = [len(batch) for batch in iter_erker_batches(path, batch_size)]
+
+    assert max(sizes) <= batch_size
+    assert all(size == batch_size for size in sizes[:-1])
+    assert sum(sizes) == read_erker(path).height
+
+
+def test_read_erker_skips_missing_columns(tmp_path):
+    data = pl.read_csv(DATA_PATH).drop('ln_48007_9_3', 'sct_8116006_5_date')
+    df = read_erker(_write(data, tmp_path / 'data.csv'))
+    assert 'ln_48007_9_3' not in df.columns
+    assert 'sct_8116006_5_date' not in df.columns
+
+
+def test_scan_erker_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        scan_erker(tmp_path / 'data.xlsx')
+
+
+def test_parquet_input_maps_like_csv(tmp_path, settings):
+    data = pl.read_csv(DATA_PATH).head(20)
+    from_csv = preprocess(pl.read_csv(_write(data, tmp_path / 'data.csv')), settings)
+    from_parquet = preprocess(read_erker(_write(data, tmp_path / 'data.parquet')),
+                              settings)
+    assert _without_interpretation_ids(map_chunk(from_parquet, '2023-10-01')) == \
+        _without_interpretation_ids(map_chunk(from_csv, '2023-10-01'))
+
+
+def _without_interpretation_ids(phenopackets):
+    # the ids of the interpretations are random
+    for phenopacket in phenopackets:
+        for interpretation in phenopacket.interpretations:
+            interpretation.id = ''
+    return phenopackets
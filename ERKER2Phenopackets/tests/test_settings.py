@@ -0,0 +1,54 @@
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+from ERKER2Phenopackets.src.settings import load_settings, PACKAGE_DIR
+from ERKER2Phenopackets.src.utils.manifest import config_hash
+
+
+def test_load_settings():
+    settings = load_settings()
+
+    assert settings.no_value.omim == 'NO_OMIM'
+    assert settings.constants.variant_descriptor_ids == ('id:A', ' id:B', ' id:C')
+    assert len(settings.resources.formal_names) == \
+        len(settings.resources.namespace_prefixes)
+    assert settings.paths.phenopackets_out == \
+        PACKAGE_DIR / 'data' / 'out' / 'phenopackets'
+    assert settings.paths.log_path == PACKAGE_DIR / 'logs'
+    assert settings.paths.jar_path.is_relative_to(PACKAGE_DIR / 'submodules')
+
+
+def test_load_settings_is_read_once():
+    assert load_settings() is load_settings()
+
+
+def test_settings_are_immutable_and_hashable():
+    settings = load_settings()
+
+    with pytest.raises(AttributeError):
+        settings.constants.creator_tag = 'someone else'
+    assert hash(settings) == hash(pickle.loads(pickle.dumps(settings)))
+
+    changed = settings._replace(
+        constants=settings.constants._replace(creator_tag='someone else'))
+    assert config_hash(changed) != config_hash(settings)
+    moved = settings._replace(
+        paths=settings.paths._replace(log_path=PACKAGE_DIR / 'other_logs'))
+    assert config_hash(moved) == config_hash(settings)
+
+
+def test_load_settings_independent_of_working_directory(tmp_path):
+    code = ('from ERKER2Phenopackets.src.settings import load_settings; '
+            'print(load_settings().paths.test_phenopackets_out)')
+    out = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, check=True,
+                         capture_output=True, text=True,
+                         env={'PYTHONPATH': str(PACKAGE_DIR.parent)}).stdout
+    assert out.strip() == str(load_settings().paths.test_phenopackets_out)
+
+
+def test_load_settings_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_settings(tmp_path / 'config.cfg')
@@ -1,5 +1,7 @@
 from ERKER2Phenopackets.src.analysis.tree_comparison.structure import assign_dict_at, \
-    create_difference_tree, compare_structure
+    create_difference_tree, compare_structure, list_differences, Difference
+from ERKER2Phenopackets.src.analysis.tree_comparison.traverse import MISSING
+from ERKER2Phenopackets.src.analysis.tree_comparison.merkle import MerkleTree
 
 
 def test_assign_dict_at():
@@ -69,3 +71,68 @@ def test_compare_structure():
     expected = {'a': {'b': {'c': {6: [2, {'d': 3}, [4]], 7: [3, [4]]}}}}
     assert not equals
     assert diff == expected
+
+
+def test_compare_structure_with_merkle_trees():
+    t1 = MerkleTree({'a': {'b': [1, {'c': 2}]}, 'd': 'x'})
+    t2 = MerkleTree({'a': {'b': [1, {'c': 3}]}, 'd': 'x'})
+    t3 = MerkleTree({'a': {'b': [1, {'e': 2}]}, 'd': 'x'})
+
+    assert compare_structure(t1, t2, construct_diff_tree=False)
+    assert not compare_structure(t1, t2, include_vals=True, construct_diff_tree=False)
+    assert not compare_structure(t1, t3, construct_diff_tree=False)
+    assert t1.fingerprint(t1.root['a']).structure == \
+        t2.fingerprint(t2.root['a']).structure
+
+
+def test_create_difference_tree_skips_identical_subtrees():
+    d1 = {'a': {'b': {'c': 2}}, 'same': {'x': [1, 2, 3]}}
+    d2 = {'a': {'b': {'c': 3}}, 'same': {'x': [1, 2, 3]}}
+    diff = create_difference_tree(d1, d2, 1, 2)
+    assert diff == {'a': {'b': {'c': {1: 2, 2: 3}}}}
+
+    assert create_difference_tree(d1, d1, 1, 2) == {}
+
+
+def test_create_difference_tree_collects_all_key_differences():
+    d1 = {'a': {'b': 1, 'c': 2, 'same': 0, 'e': 4}}
+    d2 = {'a': {'x': 1, 'y': 2, 'same': 0}}
+    diff = create_difference_tree(d1, d2, 1, 2)
+    assert diff == {'a': {1: {'b': 1, 'c': 2, 'e': 4}, 2: {'x': 1, 'y': 2}}}
+
+
+def test_list_differences():
+    d1 = {'a': {'b': {'c': 2}}, 'l': [1, 2], 'only1': 1, 'same': {'x': 1}}
+    d2 = {'a': {'b': {'c': 3}}, 'l': [1, 3], 'only2': 2, 'same': {'x': 1}}
+    assert list_differences(d1, d2) == [
+        Difference(('l',), [1, 2], [1, 3]),
+        Difference(('only1',), 1, MISSING),
+        Difference(('only2',), MISSING, 2),
+        Difference(('a', 'b', 'c'), 2, 3),
+    ]
+    assert list_differences(d1, d1) == []
+
+
+def test_difference_tree_of_deep_dictionaries():
+    depth = 5_000
+    d1, d2 = {'leaf': 1}, {'leaf': 2}
+    for _ in range(depth):
+        d1, d2 = {'child': d1, 'same': 0}, {'child': d2, 'same': 0}
+
+    assert list_differences(d1, d2) == \
+        [Difference(('child',) * depth + ('leaf',), 1, 2)]
+    diff = create_difference_tree(d1, d2, 1, 2)
+    for _ in range(depth):
+        diff = diff['child']
+    assert diff == {'leaf': {1: 1, 2: 2}}
+
+
+def test_none_values():
+    d1 = {'a': None, 'b': [None, {'c': None}]}
+    d2 = {'a': 1, 'b': [None, {'c': None}]}
+    t1 = MerkleTree(d1)
+    assert t1.fingerprint(None) != t1.fingerprint()
+
+    assert list_differences(d1, d2) == [Difference(('a',), None, 1)]
+    assert create_difference_tree(d1, d2, 1, 2) == {'a': {1: None, 2: 1}}
+    assert compare_structure(d1, d2, construct_diff_tree=False)
@@ -0,0 +1,57 @@
+import itertools
+
+from ERKER2Phenopackets.src.analysis.tree_comparison.traverse import MISSING, \
+    Mismatch, first_mismatch, iter_traverse, traverse
+
+TREE = {'A': {'B': {'D': {}, 'E': {}}, 'C': {'F': {}, 'G': [1, {'H': 2}]}}}
+
+
+def test_traverse():
+    assert traverse(TREE) == \
+        ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'type: <list>', 1, 'H', 2]
+    assert traverse(TREE, 'dfs') == \
+        ['A', 'C', 'B', 'E', 'D', 'G', 'F', 'type: <list>', 1, 'H', 2]
+    assert traverse(TREE, 'dfs', include_vals=False) == \
+        ['A', 'C', 'B', 'E', 'D', 'G', 'F', 'type: <list>', 'H']
+
+
+def test_iter_traverse_is_lazy():
+    wide = {str(i): {'x': i} for i in range(100_000)}
+    assert list(itertools.islice(iter_traverse(wide, 'bfs'), 3)) == ['0', '1', '2']
+    assert list(itertools.islice(iter_traverse(wide, 'dfs'), 1)) == ['99999']
+
+
+def test_first_mismatch():
+    assert first_mismatch(TREE, TREE, include_vals=True) is None
+
+    d1 = {'a': {'b': [1, {'c': 2}]}, 'd': 'x'}
+    assert first_mismatch(d1, {'a': {'b': [1, {'c': 3}]}, 'd': 'x'}) is None
+    assert first_mismatch(d1, {'a': {'b': [1, {'c': 3}]}, 'd': 'x'},
+                          include_vals=True) == Mismatch(('a', 'b', 1, 'c'), 2, 3)
+    assert first_mismatch(d1, {'a': {'b': [1, {'e': 2}]}, 'd': 'x'}) == \
+        Mismatch(('a', 'b', 1), 'c', 'e')
+    assert first_mismatch(d1, {'a': {'b': [1]}, 'd': 'x'}) == \
+        Mismatch(('a', 'b', 1), {'c': 2}, MISSING)
+    assert first_mismatch(d1, {'a': {'b': [1, {'c': 2}]}}) == \
+        Mismatch((), 'd', MISSING)
+    # a value has the structure of an empty dictionary, but not of a list
+    assert first_mismatch({'a': 1}, {'a': {}}) is None
+    assert first_mismatch({'a': 1}, {'a': []}) == Mismatch(('a',), 1, [])
+    assert first_mismatch({'a': 1}, {'a': True}, include_vals=True) == \
+        Mismatch(('a',), 1, True)
+
+
+def test_first_mismatch_deep_tree():
+    depth = 50_000
+    d1, d2 = {}, {}
+    for _ in range(depth):
+        d1, d2 = {'a': d1}, {'a': d2}
+    assert first_mismatch(d1, d2, include_vals=True) is None
+
+    leaf = d2
+    for _ in range(depth - 1):
+        leaf = leaf['a']
+    leaf['a'] = {'b': 1}
+    mismatch = first_mismatch(d1, d2)
+    assert mismatch.path == ('a',) * depth
+    assert (mismatch.value1, mismatch.value2) == (MISSING, 'b')
@@ -0,0 +1,169 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from phenopackets import Phenopacket
+
+from ERKER2Phenopackets.src.settings import load_settings
+from ERKER2Phenopackets.src.utils import validate_phenopackets, write_bundle, \
+    bundle_file_name
+from ERKER2Phenopackets.src.utils.validate_phenopackets import validate, \
+    validate_files, _validate_phenopacket
+from ERKER2Phenopackets.src.utils.validation_cache import ValidationCache
+
+# stands in for `java -jar phenopacket-tools.jar validate`, counts its invocations
+STUB_VALIDATOR = '''
+import json
+import sys
+from pathlib import Path
+
+with open(sys.argv[1], 'a') as fh:
+    fh.write('call\\n')
+print('#phenopacket-tools stub')
+print('INPUT,LEVEL,VALIDATOR_ID,CATEGORY,MESSAGE')
+for path in sys.argv[3:]:
+    if not Path(path).exists():
+        sys.exit(2)
+    if 'id' not in json.loads(Path(path).read_text()):
+        print(f'{path},ERROR,BaseValidator,required,missing id, subject')
+    else:
+        print(f'{Path(path).name},INFO,BaseValidator,ok,looks fine')
+'''
+
+
+@pytest.fixture
+def stub_command(tmp_path):
+    stub = tmp_path / 'stub_validator.py'
+    stub.write_text(STUB_VALIDATOR)
+    calls = tmp_path / 'calls.txt'
+    calls.touch()
+    return f'{sys.executable} {stub} {calls} validate JSON_PATH', calls
+
+
+def _write_phenopackets(dir_path: Path, num: int, invalid=()):
+    paths = []
+    for i in range(num):
+        path = dir_path / f'{i}.json'
+        path.write_text('{}' if i in invalid else f'{{"id": "{i}"}}')
+        paths.append(path)
+    return paths
+
+
+def test_validate_files_in_batches(tmp_path, stub_command):
+    command, calls = stub_command
+    paths = _write_phenopackets(tmp_path, 7, invalid=(2, 5))
+
+    results = validate_files(paths, command, 'JSON_PATH', num_workers=2,
+                             batch_size=3)
+
+    assert [no_errors for no_errors, _ in results] == \
+        [True, True, False, True, True, False, True]
+    assert results[2][1] == 'ERROR:BaseValidator required missing id  subject\n'
+    assert results[0][1] == '0.json,INFO,BaseValidator,ok,looks fine\n'
+    assert len(calls.read_text().splitlines()) == 3
+
+
+def test_validate_files_comma_in_path(tmp_path, stub_command):
+    command, _ = stub_command
+    out_dir = tmp_path / 'run,2'
+    out_dir.mkdir()
+    paths = _write_phenopackets(out_dir, 2, invalid=(0,))
+
+    results = validate_files(paths, command, 'JSON_PATH')
+
+    assert results[0] == \
+        (False, 'ERROR:BaseValidator required missing id  subject\n')
+    assert results[1][0]
+
+
+def test_validate_files_unattributed_error(tmp_path):
+    stub = tmp_path / 'stub_validator.py'
+    stub.write_text("print('elsewhere.json,ERROR,BaseValidator,required,missing id')")
+    paths = _write_phenopackets(tmp_path, 2)
+
+    results = validate_files(paths, f'{sys.executable} {stub} JSON_PATH',
+                             'JSON_PATH')
+
+    assert not any(no_errors for no_errors, _ in results)
+    assert results[0][1] == \
+        'ERROR:elsewhere.json,ERROR,BaseValidator,required,missing id\n'
+
+
+def test_validate_single_phenopacket(tmp_path, stub_command):
+    command, calls = stub_command
+    path, = _write_phenopackets(tmp_path, 1, invalid=(0,))
+
+    no_errors, output = _validate_phenopacket(path, command, 'JSON_PATH')
+
+    assert not no_errors
+    assert output == 'ERROR:BaseValidator required missing id  subject\n'
+
+
+def test_validate_files_validator_failure(tmp_path, stub_command):
+    command, _ = stub_command
+
+    with pytest.raises(subprocess.CalledProcessError):
+        validate_files([tmp_path / 'missing.json'], command, 'JSON_PATH')
+
+
+def test_validate_files_invalid_batch_size(tmp_path, stub_command):
+    command, _ = stub_command
+
+    with pytest.raises(ValueError):
+        validate_files([], command, 'JSON_PATH', batch_size=0)
+
+
+def test_validate_files_reuses_cached_results(tmp_path, stub_command):
+    command, calls = stub_command
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    paths = _write_phenopackets(out_dir, 4, invalid=(1,))
+
+    with ValidationCache(tmp_path / 'cache.sqlite', 'v1') as cache:
+        first = validate_files(paths, command, 'JSON_PATH', batch_size=2, cache=cache)
+        assert len(calls.read_text().splitlines()) == 2
+
+        paths[3].write_text('{"subject": {}}')
+        second = validate_files(paths, command, 'JSON_PATH', batch_size=2,
+                                cache=cache)
+        # only the changed file is validated again
+        assert len(calls.read_text().splitlines()) == 3
+        assert (cache.hits, cache.misses) == (3, 5)
+
+    assert second[:3] == first[:3]
+    assert not second[3][0]
+
+    with ValidationCache(tmp_path / 'cache.sqlite', 'v2') as cache:
+        validate_files(paths, command, 'JSON_PATH', batch_size=4, cache=cache)
+        assert cache.hits == 0
+
+
+@pytest.mark.parametrize('bundle_format', ('ndjson', 'pb'))
+def test_validate_bundle(tmp_path, stub_command, monkeypatch, bundle_format):
+    command, calls = stub_command
+    settings = load_settings()
+    settings = settings._replace(
+        cli_commands=settings.cli_commands._replace(validate=command))
+    monkeypatch.setattr(validate_phenopackets, 'load_settings', lambda: settings)
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    bundle_path = out_dir / bundle_file_name(bundle_format)
+    write_bundle([Phenopacket(id=f'p{i}') for i in range(5)], bundle_path)
+
+    for path in (bundle_path, out_dir):
+        results = validate(path, num_workers=1, batch_size=2, use_cache=False)
+        assert len(results) == 5
+        assert all(no_errors for no_errors, _ in results)
+    assert len(calls.read_text().splitlines()) == 6
+
+
+def test_validation_cache_evicts_least_recently_used(tmp_path):
+    with ValidationCache(tmp_path / 'cache.sqlite', 'v1', max_entries=2) as cache:
+        cache.put_many([('a', (True, '')), ('b', (True, ''))])
+        cache.get_many(['a'])
+        cache.put_many([('c', (False, 'ERROR:x\n'))])
+
+        assert len(cache) == 2
+        assert cache.get_many(['a', 'b', 'c']) == \
+            {'a': (True, ''), 'c': (False, 'ERROR:x\n')}